@@ -5,6 +5,7 @@
 
 #include "algorithm.h"
 #include "network.h"
+#include "network_index.h"
 #include "results.h"
 
 #define INF numeric_limits<u32>::max()
@@ -23,20 +24,13 @@ namespace CSA {
         u32 arr_time;
         u32 trip;
         u32 index;  // Index in the original network data.
-        Conn *prev;
-    };
-
-    struct Path {
-        u32 dep_stop;
-        u32 arr_stop;
-        u32 dur;
-        u32 index;  // Index in the original network data.
     };
 
     struct JourneyLeg {
         Conn *first_conn;
         Conn *last_conn;
-        Path *path;
+        const JB::Footpath *path;
+        u32 path_stop;  // Stop at the start of the path.
     };
 
 
@@ -44,10 +38,10 @@ namespace CSA {
         u32 conn_count = 0;
         u32 stop_count = 0;
         u32 trip_count = 0;
-        u32 *path_count = nullptr;
 
         Conn *conns = nullptr;
-        Path **paths = nullptr;
+        const JB::Network *network = nullptr;
+        const JB::NetworkIndex *index = nullptr;
 
         /* Runtime data. */
         u32 *stops = nullptr;
@@ -55,25 +49,20 @@ namespace CSA {
         JourneyLeg *journeys = nullptr;
 
         bool initialized = false;
+        bool shared = false;  // Connections are owned by another instance, or are in a snapshot.
 
 
-        int init(JB::Network *network) override {
+        int init(JB::Network *network, const JB::NetworkIndex *index) override {
             assert(!initialized);
 
             conn_count = network->conns.size();
             stop_count = network->nodes.size();
             trip_count = network->trips.size();
-            path_count = new u32[stop_count]();
-            fill_n(path_count, stop_count, 0);
-
-            conns = new Conn[conn_count]();
-            paths = new Path*[stop_count]();
-            fill_n(paths, stop_count, nullptr);
-
-            Conn *prev_conn[trip_count];
-            fill_n(prev_conn, trip_count, nullptr);
+            this->network = network;
+            this->index = index;
 
             /* Load the connections. */
+            conns = new Conn[conn_count]();
             for (u32 i = 0; i < conn_count; i++) {
                 JB::Conn n_conn = network->conns[i];
                 conns[i] = {
@@ -82,35 +71,6 @@ namespace CSA {
                         n_conn.departure_time,
                         n_conn.arrival_time,
                         n_conn.trip_id,
-                        i,
-                        prev_conn[n_conn.trip_id]
-                };
-                prev_conn[n_conn.trip_id] = &conns[i];
-            }
-
-            /* Load the (bidirectional) paths. */
-            for (u32 i = 0; i < network->paths.size(); i++) {
-                JB::Path n_path = network->paths[i];
-                path_count[n_path.node_a_id]++;
-                path_count[n_path.node_b_id]++;
-            }
-            u32 path_count_tmp[stop_count];
-            fill_n(path_count_tmp, stop_count, 0);
-            for (u32 i = 0; i < stop_count; i++) {
-                paths[i] = new Path[path_count[i]]();
-            }
-            for (u32 i = 0; i < network->paths.size(); i++) {
-                JB::Path n_path = network->paths[i];
-                paths[n_path.node_a_id][path_count_tmp[n_path.node_a_id]++] = {
-                        n_path.node_a_id,
-                        n_path.node_b_id,
-                        n_path.duration,
-                        i
-                };
-                paths[n_path.node_b_id][path_count_tmp[n_path.node_b_id]++] = {
-                        n_path.node_b_id,
-                        n_path.node_a_id,
-                        n_path.duration,
                         i
                 };
             }
@@ -123,39 +83,80 @@ namespace CSA {
             return 0;
         }
 
-        JB::Journey *__query(u32 from_stop_id, u32 to_stop_id, u32 departure_time) {
+        int save_state(FILE *file) override {
+            assert(initialized);
+            return fwrite(conns, sizeof(Conn), conn_count, file) == conn_count ? 0 : -1;
+        }
+
+        int load_state(JB::Network *network, const JB::NetworkIndex *index, const u8 *data, u64 size) override {
+            assert(!initialized);
+            if (size != network->conns.size() * sizeof(Conn)) { return -1; }
+
+            conn_count = network->conns.size();
+            stop_count = network->nodes.size();
+            trip_count = network->trips.size();
+            this->network = network;
+            this->index = index;
+
+            /* Use the connections directly from the snapshot. */
+            conns = (Conn *) data;
+            shared = true;
+
+            stops = new u32[stop_count]();
+            trips = new Conn*[trip_count]();
+            journeys = new JourneyLeg[stop_count]();
+
+            initialized = true;
+            return 0;
+        }
+
+        JB::AlgorithmBase *clone() override {
             assert(initialized);
-            assert(from_stop_id < stop_count && to_stop_id < stop_count);
 
+            /* Share the connections, but allocate new runtime data. */
+            CSAAlgorithm *instance = new CSAAlgorithm(*this);
+            instance->shared = true;
+            instance->stops = new u32[stop_count]();
+            instance->trips = new Conn*[trip_count]();
+            instance->journeys = new JourneyLeg[stop_count]();
+            return instance;
+        }
+
+        ~CSAAlgorithm() override {
+            if (!shared && initialized) {
+                delete[] conns;
+            }
+            delete[] stops;
+            delete[] trips;
+            delete[] journeys;
+        }
+
+        /* Find the earliest arrival time at the targets, departing from `from_stop_id` at `departure_time`. */
+        void scan(u32 from_stop_id, u32 departure_time, const u32 *target_stop_ids, u32 target_count) {
             /* Clear the runtime datastructures. */
             fill_n(stops, stop_count, INF);
             fill_n(trips, trip_count, nullptr);
-            fill_n(journeys, stop_count, (JourneyLeg) {nullptr, nullptr, nullptr});
+            fill_n(journeys, stop_count, (JourneyLeg) {nullptr, nullptr, nullptr, EMPTY});
 
             /* Set the initial state. */
             stops[from_stop_id] = departure_time;
-            for (u32 i = 0; i < path_count[from_stop_id]; i++) {
-                stops[paths[from_stop_id][i].arr_stop] = departure_time + paths[from_stop_id][i].dur;
-                journeys[paths[from_stop_id][i].arr_stop].path = &paths[from_stop_id][i];
-            }
-
-            /* Do a binary search. */
-            u32 l = 0, r = conn_count - 1, m = 0;
-            while (l != r) {
-                m = (l + r) / 2;
-                if (conns[m].dep_time <= departure_time) {
-                    l = m + 1;
-                } else {
-                    r = m;
-                }
+            for (u32 i = index->footpath_offsets[from_stop_id]; i < index->footpath_offsets[from_stop_id + 1]; i++) {
+                const JB::Footpath *path = &index->footpaths[i];
+                stops[path->node_id] = departure_time + path->duration;
+                journeys[path->node_id].path = path;
+                journeys[path->node_id].path_stop = from_stop_id;
             }
 
-            /* Run the search by walking through all connections. */
-            for (u32 i = m; i < conn_count; i++) {
+            /* Run the search by walking through all connections that depart at or after the departure time. */
+            u32 settled = 0;  // The targets before this one are reached before the current connection departs.
+            for (u32 i = index->first_departure(network->conns, departure_time); i < conn_count; i++) {
                 Conn conn = conns[i];
 
-                /* Early return if the solution is already found! */
-                if (stops[to_stop_id] <= conn.dep_time) {
+                /* Early return if the solution is already found for all targets! */
+                while (settled < target_count && stops[target_stop_ids[settled]] <= conn.dep_time) {
+                    settled++;
+                }
+                if (settled == target_count) {
                     break;
                 }
 
@@ -172,24 +173,33 @@ namespace CSA {
                         journeys[conn.arr_stop] = {
                                 trips[conn.trip],
                                 &conns[i],
-                                nullptr
+                                nullptr,
+                                EMPTY
                         };
 
                         /* Check for improvements on each outgoing path. */
-                        for (u32 j = 0; j < path_count[conn.arr_stop]; j++) {
-                            Path path = paths[conn.arr_stop][j];
-                            if (conn.arr_time + path.dur < stops[path.arr_stop]) {
-                                stops[path.arr_stop] = conn.arr_time + path.dur;
-                                journeys[path.arr_stop] = {
+                        for (u32 j = index->footpath_offsets[conn.arr_stop]; j < index->footpath_offsets[conn.arr_stop + 1]; j++) {
+                            const JB::Footpath *path = &index->footpaths[j];
+                            if (conn.arr_time + path->duration < stops[path->node_id]) {
+                                stops[path->node_id] = conn.arr_time + path->duration;
+                                journeys[path->node_id] = {
                                         trips[conn.trip],
                                         &conns[i],
-                                        &paths[conn.arr_stop][j]
+                                        path,
+                                        conn.arr_stop
                                 };
                             }
                         }
                     }
                 }
             }
+        }
+
+        JB::Journey *__query(u32 from_stop_id, u32 to_stop_id, u32 departure_time) {
+            assert(initialized);
+            assert(from_stop_id < stop_count && to_stop_id < stop_count);
+
+            scan(from_stop_id, departure_time, &to_stop_id, 1);
 
             /* Early return if no solution was found. */
             if (stops[to_stop_id] == INF) { return nullptr; }
@@ -199,17 +209,19 @@ namespace CSA {
             while (to_stop_id != from_stop_id) {
                 /* First: add the path if one is referenced, and update stop ID. */
                 if (leg->path != nullptr) {
-                    journey->add_prev_path(leg->path->index);
-                    to_stop_id = leg->path->dep_stop;
+                    journey->add_prev_path(leg->path->path_id);
+                    to_stop_id = leg->path_stop;
                 }
 
                 /* Second: add the connections if they exist, and update stop ID. */
                 if (leg->first_conn != nullptr) {
                     assert(leg->last_conn != nullptr);
 
-                    /* Add each connection in the range from first to last. */
-                    for (Conn *conn = leg->last_conn; conn != leg->first_conn->prev; conn = conn->prev) {
-                        journey->add_prev_conn(conn->index);
+                    /* Add each connection of the trip in the range from first to last. */
+                    const u32 *trip_conns = &index->trip_conns[index->trip_offsets[leg->last_conn->trip]];
+                    u32 first = index->conn_positions[leg->first_conn->index];
+                    for (u32 p = index->conn_positions[leg->last_conn->index] + 1; p-- > first;) {
+                        journey->add_prev_conn(trip_conns[p]);
                     }
                     to_stop_id = leg->first_conn->dep_stop;
                 }
@@ -237,6 +249,21 @@ namespace CSA {
             return result;
         }
 
+        bool supports_one_to_many_queries() override { return true; }
+
+        int arrival_times(u32 from_stop_id, u32 departure_time, const u32 *target_stop_ids, u32 target_count,
+                          u32 *arrival_times) override {
+            assert(initialized);
+            assert(from_stop_id < stop_count);
+
+            /* A single scan finds the arrival time at all targets, unreachable stops keep `INF`, which is `NO_ARRIVAL`. */
+            scan(from_stop_id, departure_time, target_stop_ids, target_count);
+            for (u32 i = 0; i < target_count; i++) {
+                arrival_times[i] = stops[target_stop_ids[i]];
+            }
+            return 0;
+        }
+
     };
 
 }
@@ -0,0 +1,266 @@
+#include <cassert>
+
+#include <algorithm>
+#include <limits>
+
+#include "algorithm.h"
+#include "network.h"
+#include "network_index.h"
+#include "results.h"
+
+#define INF numeric_limits<u32>::max()
+#define EMPTY numeric_limits<u32>::max()
+
+using namespace std;
+namespace JB = JourneyBench;
+
+
+namespace CSAProfile {
+
+    /* Journey that boards a trip at a stop, in the profile of that stop. */
+    struct Entry {
+        u32 dep_time;
+        u32 arr_time;  // At the target.
+        u32 enter_conn;
+        u32 exit_conn;
+        u32 path;  // Footpath (in the network index) taken after the exit connection, or EMPTY.
+        u32 next_stop;  // Stop of the next entry, or EMPTY if the journey reaches the target.
+        u32 next_entry;  // Index of the next entry in the profile of the next stop.
+    };
+
+    /* Best way to continue from a trip, over the connections scanned so far. */
+    struct TripState {
+        u32 arr_time;  // At the target.
+        u32 exit_conn;
+        u32 path;
+        u32 next_stop;
+        u32 next_entry;
+    };
+
+    /* Journey from the origin, before it is checked for dominance. */
+    struct Candidate {
+        u32 dep_time;
+        u32 arr_time;
+        u32 path;  // Footpath (in the network index) from the origin to the first stop, or EMPTY.
+        u32 stop;
+        u32 entry;
+    };
+
+
+    /* Profile Connection Scan: a single backward scan over the connections, from the last connection down to the
+     * first connection that departs within the interval, builds the profile of every stop to the target. The
+     * profile of a stop only contains journeys that board a trip there, in order of decreasing departure and
+     * strictly decreasing arrival, so the best journey departing at or after a time is found by a binary search.
+     * Footpaths are taken after alighting and before boarding at the origin, as in `csa`. */
+    class CSAProfileAlgorithm : public JB::AlgorithmBase {
+        u32 conn_count = 0;
+        u32 stop_count = 0;
+        u32 trip_count = 0;
+
+        const JB::Network *network = nullptr;
+        const JB::NetworkIndex *index = nullptr;
+
+        /* Runtime data. */
+        vector <vector<Entry>> profiles;
+        vector <TripState> trips;
+        vector <u32> walk_times;  // Walking time from each stop to the target, over at most one footpath.
+        vector <u32> walk_paths;
+
+        bool initialized = false;
+
+
+        int init(JB::Network *network, const JB::NetworkIndex *index) override {
+            assert(!initialized);
+
+            conn_count = network->conns.size();
+            stop_count = network->nodes.size();
+            trip_count = network->trips.size();
+            this->network = network;
+            this->index = index;
+
+            profiles.resize(stop_count);
+            trips.resize(trip_count);
+            walk_times.resize(stop_count);
+            walk_paths.resize(stop_count);
+
+            initialized = true;
+            return 0;
+        }
+
+        JB::AlgorithmBase *clone() override {
+            assert(initialized);
+
+            /* The network and index are shared, the runtime data is copied. */
+            return new CSAProfileAlgorithm(*this);
+        }
+
+        /* Continue from a trip by alighting from `conn_id` and boarding at `stop` at or after `time`, if that
+         * arrives earlier than the current way to continue from the trip. */
+        void transfer(TripState &trip, u32 conn_id, u32 stop, u32 time, u32 path) {
+            const vector <Entry> &profile = profiles[stop];
+            u32 k = partition_point(profile.begin(), profile.end(), [&](const Entry &entry) {
+                return entry.dep_time >= time;
+            }) - profile.begin();
+            if (k > 0 && profile[k - 1].arr_time < trip.arr_time) {
+                trip = {profile[k - 1].arr_time, conn_id, path, stop, k - 1};
+            }
+        }
+
+        /* Build the profiles of all stops to the target, for journeys departing at or after `min_departure_time`. */
+        void scan(u32 to_stop_id, u32 min_departure_time) {
+            /* Clear the runtime datastructures. */
+            for (vector <Entry> &profile : profiles) { profile.clear(); }
+            fill(trips.begin(), trips.end(), (TripState) {INF, EMPTY, EMPTY, EMPTY, EMPTY});
+            fill(walk_times.begin(), walk_times.end(), INF);
+            fill(walk_paths.begin(), walk_paths.end(), EMPTY);
+
+            walk_times[to_stop_id] = 0;
+            for (u32 i = index->footpath_offsets[to_stop_id]; i < index->footpath_offsets[to_stop_id + 1]; i++) {
+                const JB::Footpath &path = index->footpaths[i];
+                if (path.duration < walk_times[path.node_id]) {
+                    walk_times[path.node_id] = path.duration;
+                    walk_paths[path.node_id] = i;
+                }
+            }
+
+            /* Run the search by walking backwards through all connections that depart at or after the start. */
+            u32 first_conn = index->first_departure(network->conns, min_departure_time);
+            for (u32 i = conn_count; i-- > first_conn;) {
+                const JB::Conn &conn = network->conns[i];
+                TripState &trip = trips[conn.trip_id];
+
+                /* Alight and walk to the target. */
+                if (walk_times[conn.to_node_id] != INF && conn.arrival_time + walk_times[conn.to_node_id] < trip.arr_time) {
+                    trip = {conn.arrival_time + walk_times[conn.to_node_id], i, walk_paths[conn.to_node_id], EMPTY, EMPTY};
+                }
+
+                /* Alight and board another trip, at the same stop or after a footpath. */
+                transfer(trip, i, conn.to_node_id, conn.arrival_time, EMPTY);
+                for (u32 j = index->footpath_offsets[conn.to_node_id]; j < index->footpath_offsets[conn.to_node_id + 1]; j++) {
+                    const JB::Footpath &path = index->footpaths[j];
+                    transfer(trip, i, path.node_id, conn.arrival_time + path.duration, j);
+                }
+
+                if (trip.arr_time == INF) { continue; }
+
+                /* Board the trip at the departure stop if that improves its profile. */
+                vector <Entry> &profile = profiles[conn.from_node_id];
+                if (profile.empty() || trip.arr_time < profile.back().arr_time) {
+                    profile.push_back({conn.departure_time, trip.arr_time, i, trip.exit_conn, trip.path,
+                                       trip.next_stop, trip.next_entry});
+                }
+            }
+        }
+
+        /* Collect the journeys from the origin, directly or after a footpath, that depart at or after
+         * `min_departure_time` and arrive earlier than walking directly to the target. */
+        vector <Candidate> candidates(u32 from_stop_id, u32 min_departure_time) {
+            vector <Candidate> result;
+            auto add = [&](u32 stop, u32 duration, u32 path) {
+                const vector <Entry> &profile = profiles[stop];
+                for (u32 k = 0; k < profile.size(); k++) {
+                    if (profile[k].dep_time < duration) { continue; }
+                    u32 dep_time = profile[k].dep_time - duration;
+                    if (dep_time < min_departure_time) { continue; }
+                    if (walk_times[from_stop_id] != INF && profile[k].arr_time >= (u64) dep_time + walk_times[from_stop_id]) { continue; }
+                    result.push_back({dep_time, profile[k].arr_time, path, stop, k});
+                }
+            };
+            add(from_stop_id, 0, EMPTY);
+            for (u32 i = index->footpath_offsets[from_stop_id]; i < index->footpath_offsets[from_stop_id + 1]; i++) {
+                add(index->footpaths[i].node_id, index->footpaths[i].duration, i);
+            }
+            return result;
+        }
+
+        JB::Journey journey(const Candidate &candidate) {
+            JB::Journey journey;
+            if (candidate.path != EMPTY) { journey.add_next_path(index->footpaths[candidate.path].path_id); }
+
+            u32 stop = candidate.stop, k = candidate.entry;
+            while (stop != EMPTY) {
+                const Entry &entry = profiles[stop][k];
+
+                /* Add each connection of the trip in the range from enter to exit. */
+                const u32 *trip_conns = &index->trip_conns[index->trip_offsets[network->conns[entry.enter_conn].trip_id]];
+                u32 last = index->conn_positions[entry.exit_conn];
+                for (u32 p = index->conn_positions[entry.enter_conn]; p <= last; p++) {
+                    journey.add_next_conn(trip_conns[p]);
+                }
+                if (entry.path != EMPTY) { journey.add_next_path(index->footpaths[entry.path].path_id); }
+
+                stop = entry.next_stop;
+                k = entry.next_entry;
+            }
+            return journey;
+        }
+
+        vector <JB::Journey> *query(u32 from_stop_id, u32 to_stop_id, u32 departure_time) override {
+            assert(initialized);
+            assert(from_stop_id < stop_count && to_stop_id < stop_count);
+
+            vector <JB::Journey> *result = new vector<JB::Journey>;
+            if (from_stop_id == to_stop_id) {
+                result->push_back(JB::Journey());
+                return result;
+            }
+
+            /* The earliest arrival is the journey with the earliest arrival of the whole profile. */
+            scan(to_stop_id, departure_time);
+            vector <Candidate> journeys = candidates(from_stop_id, departure_time);
+            auto best = min_element(journeys.begin(), journeys.end(), [](const Candidate &a, const Candidate &b) {
+                return a.arr_time < b.arr_time;
+            });
+            bool walk_best = walk_times[from_stop_id] != INF
+                             && (best == journeys.end() || (u64) departure_time + walk_times[from_stop_id] <= best->arr_time);
+            if (walk_best) {
+                JB::Journey walk;
+                walk.add_next_path(index->footpaths[walk_paths[from_stop_id]].path_id);
+                result->push_back(walk);
+            } else if (best != journeys.end()) {
+                result->push_back(journey(*best));
+            }
+            return result;
+        }
+
+        bool supports_profile_queries() override { return true; }
+
+        vector <JB::Journey> *profile_query(u32 from_stop_id, u32 to_stop_id,
+                                            u32 min_departure_time, u32 max_departure_time) override {
+            assert(initialized);
+            assert(from_stop_id < stop_count && to_stop_id < stop_count);
+
+            vector <JB::Journey> *result = new vector<JB::Journey>;
+            if (from_stop_id == to_stop_id) {
+                result->push_back(JB::Journey());
+                return result;
+            }
+
+            scan(to_stop_id, min_departure_time);
+            vector <Candidate> journeys = candidates(from_stop_id, min_departure_time);
+
+            /* Keep the journeys that arrive earlier than all journeys that depart at the same time or later,
+             * including those that depart after the interval, as those are the earliest arrival journeys. */
+            sort(journeys.begin(), journeys.end(), [](const Candidate &a, const Candidate &b) {
+                return a.dep_time > b.dep_time || (a.dep_time == b.dep_time && a.arr_time < b.arr_time);
+            });
+            u32 best = INF;
+            for (const Candidate &candidate : journeys) {
+                if (candidate.arr_time < best) {
+                    best = candidate.arr_time;
+                    if (candidate.dep_time <= max_departure_time) { result->push_back(journey(candidate)); }
+                }
+            }
+            reverse(result->begin(), result->end());
+            return result;
+        }
+
+    };
+
+}
+
+using namespace CSAProfile;
+
+extern "C" CSAProfileAlgorithm* createInstance() {
+    return new CSAProfileAlgorithm();
+}
@@ -1,5 +1,6 @@
 #include "algorithm.h"
 #include "network.h"
+#include "network_index.h"
 #include "results.h"
 #include "types.h"
 
@@ -8,10 +9,11 @@ namespace JB = JourneyBench;
 
 class Algorithm : public JB::AlgorithmBase {
 
-    int init(JB::Network *network) override {
+    int init(JB::Network *network, const JB::NetworkIndex *index) override {
 
         /* Prepare the algorithm specific datastructure.
-         * If needed, you should also do the preprocessing here. */
+         * If needed, you should also do the preprocessing here. The index provides the footpaths of each
+         * node, the connections of each trip and each node, and the first connection after a time. */
 
         return 0;
     }
@@ -24,6 +26,14 @@ class Algorithm : public JB::AlgorithmBase {
         return nullptr;
     }
 
+    JB::AlgorithmBase *clone() override {
+
+        /* Optional: return a new instance that shares the preprocessed data with this instance,
+         * but has its own query state, to answer queries on multiple threads. */
+
+        return nullptr;
+    }
+
 };
 
 
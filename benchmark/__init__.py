@@ -1,7 +1,10 @@
 from .benchmark import Benchmark
+from .cache import NetworkCache
 from .network import Network
+from .oracle import ReferenceArrivals
 from .queries import Queries
 from .results import Results
 
 from .benchmark_core import Node, Conn, Path, Query, \
-    JourneyPartType, JourneyPart, Journey, QueryResult, PreprocessingResult
+    JourneyPartType, JourneyPart, Journey, QueryResult, PreprocessingResult, LoadResult, Counters, MemoryUsage, \
+    Verdict, Validation, NO_ARRIVAL
@@ -1,31 +1,216 @@
-from .benchmark_core import Benchmark as BenchmarkCore
+import hashlib
+import pathlib
+
+from statistics import median
+from typing import List, Optional, Union
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .benchmark_core import Benchmark as BenchmarkCore, LoadResult, one_to_many_targets
+from .cache import file_hash, network_hash
 from .network import Network
 from .queries import Queries
-from .results import Results
+from .results import RECORD_SIZE, BatchResult, QueryBatch, Results
+
+
+REPETITION_ORDERS = ['interleaved', 'blocked']
+
+# Maximum number of queries that run as a single batch, and are streamed to the results at once.
+BATCH_SIZE = RECORD_SIZE
 
 
 class Benchmark(BenchmarkCore):
-    def __init__(self, network: Network, queries: Queries, algorithm: str):
+    snapshot_filepath: Optional[pathlib.Path]
+    snapshot_key: Optional[bytes]
+
+    def __init__(
+            self,
+            network: Network,
+            queries: Queries,
+            algorithm: str,
+            counters: bool = False,
+            snapshot_dir: Optional[Union[str, pathlib.Path]] = None,
+            window: Optional[int] = None,
+            one_to_many: bool = False,
+    ):
+        """
+        :param network: network to run the algorithm on
+        :param queries: queries to run
+        :param algorithm: name of the algorithm in the `algorithms` directory
+        :param counters: measure hardware performance counters around each preprocessing run and query
+        :param snapshot_dir: directory to store the preprocessed state of the algorithm in, which
+                             is restored instead of preprocessing while the algorithm and network are unchanged
+        :param window: run profile queries instead, for all departures from the departure time of each query
+                       up to this many seconds later
+        :param one_to_many: run one-to-many queries instead, from the origin of each query
+                            to the targets of the queries (or all stops if there are none)
+        """
         super().__init__()
 
         super().set_network(network)
+        super().set_counters(counters)
+        self.network = network
         self.queries = queries
+        self.window = window
+        self.one_to_many = one_to_many
+        if window is not None and one_to_many:
+            raise Exception("Profile queries can not be one-to-many queries!")
 
         algorithm = algorithm.lower()
         shared_object_filename = f'algorithms/{algorithm}/{algorithm}.so'
         if super().set_algorithm(shared_object_filename) != 0:
             raise Exception(f"Could not load algorithm '{algorithm}' from shared object file '{shared_object_filename}'!")
+        if window is not None and not super().supports_profile_queries():
+            raise Exception(f"Algorithm '{algorithm}' does not support profile queries!")
+        if one_to_many and not super().supports_one_to_many_queries():
+            raise Exception(f"Algorithm '{algorithm}' does not support one-to-many queries!")
+
+        # Snapshots are identified by the hashes of the shared object file and the network.
+        self.snapshot_filepath, self.snapshot_key = None, None
+        if snapshot_dir is not None:
+            self.snapshot_key = file_hash(shared_object_filename) + network_hash(network)
+            name = hashlib.blake2b(self.snapshot_key, digest_size=8).hexdigest()
+            self.snapshot_filepath = pathlib.Path(snapshot_dir) / f'{algorithm}-{name}.snapshot'
+
+    def run_benchmark(
+            self,
+            results: Results,
+            threads: int = 1,
+            repetitions: int = 1,
+            warmup: int = 0,
+            order: str = 'interleaved',
+    ) -> Results:
+        """
+        Run the preprocessing and all queries, and add the measurements to the results.
+        :param results: results to add the measurements to
+        :param threads: number of threads to run the queries on
+        :param repetitions: number of times to run the preprocessing and each query
+        :param warmup: number of unrecorded queries to run before the measurements
+        :param order: 'interleaved' runs the whole query set once per repetition,
+                      'blocked' runs all repetitions of a query back to back on the same thread
+        :return: the results
+        """
+        if order not in REPETITION_ORDERS:
+            raise Exception(f"Unknown repetition order '{order}'!")
 
-    def run_benchmark(self, results: Results) -> Results:
-        # Run the preprocessing for the algorithm.
-        preprocessing_result = self.run_preprocessing()
-        if not preprocessing_result:
-            raise Exception("Preprocessing failed!")
-        results.add_preprocessing_result(preprocessing_result)
+        # Restore the preprocessed state of an earlier run if possible, otherwise run the preprocessing
+        # for the algorithm, each repetition starts from a fresh instance.
+        load_result = self.load_snapshot()
+        if load_result:
+            results.add_load_result(load_result)
+        else:
+            preprocessing_results = []
+            for _ in range(repetitions):
+                preprocessing_result = self.run_preprocessing()
+                if not preprocessing_result:
+                    raise Exception("Preprocessing failed!")
+                results.add_preprocessing_result(preprocessing_result)
+                preprocessing_results.append(preprocessing_result)
+            if preprocessing_results:
+                self.save_snapshot(int(median(result.runtime_ns for result in preprocessing_results)))
 
-        # Run each query once with the available query functions.
-        for query_id, query in enumerate(self.queries.queries):
-            query_result = self.run_query(query.from_node_id, query.to_node_id, query.departure_time)
-            results.add_query_result(query_id, query_result)
+        # Warm up the caches and branch predictors with queries that are not recorded.
+        if warmup > 0 and len(self.queries.queries) > 0:
+            query_ids = np.arange(warmup) % len(self.queries.queries)
+            if not self.run_batch(self.queries.subset(query_ids), threads):
+                raise Exception("Query failed!")
+
+        # Run each query once per repetition, spread over the given number of threads.
+        query_ids = np.arange(len(self.queries.queries), dtype=np.uint32)
+        if order == 'interleaved':
+            for _ in range(repetitions):
+                self.run_query_batch(results, threads, query_ids)
+        else:
+            self.run_query_batch(results, threads, np.repeat(query_ids, repetitions), repetitions)
 
         return results
+
+    def load_snapshot(self) -> Optional[LoadResult]:
+        """
+        Restore the preprocessed state of the algorithm from its snapshot, instead of running the preprocessing.
+        :return: the measurement of the restore, or None if there is no snapshot (or the algorithm does not support it)
+        """
+        if self.snapshot_filepath is None or not self.snapshot_filepath.exists():
+            return None
+        return super().load_snapshot(str(self.snapshot_filepath), self.snapshot_key)
+
+    def save_snapshot(self, preprocessing_runtime_ns: int) -> bool:
+        """
+        Store the preprocessed state of the algorithm in its snapshot, after the preprocessing.
+        :param preprocessing_runtime_ns: runtime of the preprocessing, which is reported when the snapshot is restored
+        :return: whether a snapshot was stored, which requires a snapshot directory and support of the algorithm
+        """
+        if self.snapshot_filepath is None:
+            return False
+        self.snapshot_filepath.parent.mkdir(parents=True, exist_ok=True)
+        status = super().save_snapshot(str(self.snapshot_filepath), self.snapshot_key, preprocessing_runtime_ns)
+        if status < 0:
+            raise Exception(f"Could not write snapshot '{self.snapshot_filepath}'!")
+        return status == 0
+
+    def run_query_batch(
+            self,
+            results: Results,
+            threads: int = 1,
+            query_ids: Optional[ArrayLike] = None,
+            block: int = 1,
+    ) -> List[QueryBatch]:
+        """
+        Run queries in batches of at most `BATCH_SIZE` queries, and add the measurements of each batch to the
+        results as soon as it finishes, so if the benchmark crashes only the queries of the current batch are lost.
+        :param results: results to add the measurements to
+        :param threads: number of threads to run the queries on
+        :param query_ids: queries to run in the given order, by default all queries once
+        :param block: number of consecutive queries that a thread runs at a time, which stay in the same batch
+        :return: the results of the batches
+        """
+        if query_ids is None:
+            query_ids = np.arange(len(self.queries.queries), dtype=np.uint32)
+        else:
+            query_ids = np.asarray(query_ids, dtype=np.uint32)
+
+        batch_size = max(BATCH_SIZE // block, 1) * block
+        query_batches = []
+        for start in range(0, len(query_ids), batch_size):
+            batch_query_ids = query_ids[start:start + batch_size]
+            batch_result = self.run_batch(self.queries.subset(batch_query_ids), threads, block)
+            if not batch_result:
+                raise Exception("Query failed!")
+
+            query_batch = QueryBatch(
+                batch_query_ids,
+                batch_result.query_runtime_ns,
+                batch_result.journey_offsets,
+                batch_result.part_offsets,
+                batch_result.part_types,
+                batch_result.part_ids,
+                batch_result.query_counters if len(batch_result.query_counters) > 0 else None,
+                batch_result.arrival_offsets if self.one_to_many else None,
+                batch_result.arrival_times if self.one_to_many else None,
+            )
+            results.add_query_batch(query_batch)
+            results.add_batch_result(BatchResult(batch_result.threads, len(query_batch), batch_result.runtime_ns,
+                                                 batch_result.memory, self.window, self.target_count()))
+            query_batches.append(query_batch)
+        return query_batches
+
+    def run_batch(self, queries: Queries, threads: int, block: int = 1):
+        """
+        Run queries natively, as profile queries if the benchmark has a window, or as one-to-many queries.
+        :param block: number of consecutive queries that a thread runs at a time
+        :return: the core batch result, or None if a query failed
+        """
+        if self.one_to_many:
+            return super().run_one_to_many_queries(queries, threads, block)
+        if self.window is None:
+            return super().run_queries(queries, threads, block)
+        return super().run_profile_queries(queries, self.window, threads, block)
+
+    def target_count(self) -> Optional[int]:
+        """
+        Get the number of targets of the one-to-many queries, or None for other queries.
+        """
+        if not self.one_to_many:
+            return None
+        return len(one_to_many_targets(self.network, self.queries))
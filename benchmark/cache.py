@@ -0,0 +1,209 @@
+import hashlib
+import os
+import pathlib
+import struct
+
+from typing import Optional, Tuple, TypeVar, Union
+
+import numpy as np
+
+from .benchmark_core import node_dtype, conn_dtype, path_dtype
+
+
+Self = TypeVar("Self", bound="NetworkCache")
+
+PAGE_SIZE = 4096
+
+CACHE_MAGIC = b'JBNETCACHE'
+CACHE_VERSION = 1
+
+# Header: magic, version, source size, source mtime, source hash, end time, trip count,
+# followed by (item size, count, offset) for the nodes, conns and paths columns.
+HEADER = struct.Struct('<10sIQQ32sII' + 'QQQ' * 3)
+HEADER_MTIME_OFFSET = struct.calcsize('<10sIQ')
+
+
+def file_hash(filepath: Union[str, pathlib.Path]) -> bytes:
+    """
+    Calculate the BLAKE2b content hash of a file.
+    :param filepath: path of the file to hash
+    :return: 32 byte digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(filepath, 'rb') as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def network_hash(network) -> bytes:
+    """
+    Calculate the BLAKE2b hash of the content of a network: its end time, trip count, nodes, conns and paths.
+    The arrays are hashed per field, so the padding in their records does not affect the hash.
+    :param network: the network
+    :return: 32 byte digest of the network
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(struct.pack('<qQ', -1 if network.end is None else network.end, len(network.trips)))
+    for array in (network.nodes_array(), network.conns_array(), network.paths_array()):
+        digest.update(struct.pack('<Q', len(array)))
+        for name in array.dtype.names:
+            digest.update(np.ascontiguousarray(array[name]))
+    return digest.digest()
+
+
+def source_matches(
+        filepath: Union[str, pathlib.Path], size: int, mtime_ns: int, hash: bytes,
+        sidecar_filepath: Optional[Union[str, pathlib.Path]] = None, mtime_offset: Optional[int] = None,
+) -> bool:
+    """
+    Check whether a file is the source a sidecar was created from. The content hash
+    is only calculated when the size or modification time of the file has changed.
+    When the hash matches a changed modification time, the new modification time is
+    written into the sidecar (if possible), so the file is not hashed again next time.
+    :param filepath: path of the file
+    :param size: size of the source in bytes
+    :param mtime_ns: modification time of the source
+    :param hash: content hash of the source, see `file_hash`
+    :param sidecar_filepath: path of the sidecar
+    :param mtime_offset: offset of the modification time (u64) of the source in the sidecar
+    """
+    stat = os.stat(filepath)
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime_ns:
+        return True
+    if file_hash(filepath) != hash:
+        return False
+    if sidecar_filepath is not None and mtime_offset is not None:
+        try:
+            with open(sidecar_filepath, 'r+b') as file:
+                file.seek(mtime_offset)
+                file.write(struct.pack('<Q', stat.st_mtime_ns))
+        except OSError:
+            pass
+    return True
+
+
+def page_align(offset: int) -> int:
+    """
+    Round a file offset up to a multiple of the page size, so an array at the offset can be memory-mapped.
+    """
+    return (offset + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+
+class NetworkCache:
+    """
+    Uncompressed sidecar of a `.network` file, which can be memory-mapped.
+
+    The file starts with a header page that identifies the source `.network`
+    file by its size, modification time and content hash. The nodes, conns and
+    paths follow as page-aligned arrays with the same layout as the network columns,
+    which view them directly instead of copying them.
+    Mapping the file is (almost) free, and multiple processes that map the
+    same cache share the pages in the page cache.
+    """
+    filepath: pathlib.Path
+    source_size: int
+    source_mtime_ns: int
+    source_hash: bytes
+    end: int
+    trip_count: int
+
+    nodes: np.ndarray
+    conns: np.ndarray
+    paths: np.ndarray
+
+    def __init__(self, filepath: Union[str, pathlib.Path]):
+        self.filepath = pathlib.Path(filepath)
+        with open(self.filepath, 'rb') as file:
+            header = HEADER.unpack(file.read(HEADER.size))
+
+        magic, version, self.source_size, self.source_mtime_ns, self.source_hash, self.end, self.trip_count = header[:7]
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise Exception(f"File '{filepath}' is not a valid network cache!")
+
+        columns = []
+        for i, dtype in enumerate([node_dtype, conn_dtype, path_dtype]):
+            itemsize, count, offset = header[7 + 3 * i:10 + 3 * i]
+            if itemsize != dtype.itemsize:
+                raise Exception(f"Network cache '{filepath}' has an incompatible layout!")
+            if count == 0:
+                columns.append(np.empty(0, dtype=dtype))
+            else:
+                columns.append(np.memmap(self.filepath, dtype=dtype, mode='r', offset=offset, shape=(count,)))
+        self.nodes, self.conns, self.paths = columns
+
+    def __repr__(self):
+        return (f"NetworkCache(trips: {self.trip_count}, conns: {len(self.conns)}, "
+                f"nodes: {len(self.nodes)}, paths: {len(self.paths)})")
+
+    @staticmethod
+    def path(network_filepath: Union[str, pathlib.Path]) -> pathlib.Path:
+        """
+        Get the path of the sidecar cache for a `.network` file.
+        """
+        return pathlib.Path(f'{network_filepath}.cache')
+
+    @classmethod
+    def open(cls, network_filepath: Union[str, pathlib.Path]) -> Optional[Self]:
+        """
+        Open the sidecar cache of a `.network` file if it exists and matches the file.
+        :param network_filepath: path of the `.network` file
+        :return: the cache, or None if there is no (up-to-date) cache
+        """
+        try:
+            cache = NetworkCache(cls.path(network_filepath))
+        except Exception:
+            return None
+        return cache if cache.matches(network_filepath) else None
+
+    @classmethod
+    def write(
+            cls,
+            network_filepath: Union[str, pathlib.Path],
+            end: int,
+            trip_count: int,
+            nodes: np.ndarray, conns: np.ndarray, paths: np.ndarray,
+    ) -> pathlib.Path:
+        """
+        Write the sidecar cache of a `.network` file from the arrays of the network that was read from it.
+        The cache is written to a temporary file first, so concurrent readers never see a partial cache.
+        Raises an OSError if the cache cannot be written, e.g. in a read-only directory.
+        :return: path of the written cache
+        """
+        filepath = cls.path(network_filepath)
+        stat = os.stat(network_filepath)
+        source_hash = file_hash(network_filepath)
+
+        columns: Tuple[np.ndarray, ...] = (nodes, conns, paths)
+        offsets, offset = [], PAGE_SIZE
+        for column in columns:
+            offsets.append(offset)
+            offset = page_align(offset + column.nbytes)
+
+        header = HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_size, stat.st_mtime_ns, source_hash,
+                             end, trip_count,
+                             *[v for column, offset in zip(columns, offsets)
+                               for v in (column.dtype.itemsize, len(column), offset)])
+
+        tmp_filepath = filepath.with_name(f'{filepath.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_filepath, 'wb') as file:
+                file.write(header)
+                for column, offset in zip(columns, offsets):
+                    file.seek(offset)
+                    column.tofile(file)
+                file.truncate(page_align(file.tell()))
+            os.replace(tmp_filepath, filepath)
+        except OSError:
+            tmp_filepath.unlink(missing_ok=True)
+            raise
+        return filepath
+
+    def matches(self, network_filepath: Union[str, pathlib.Path]) -> bool:
+        """
+        Check whether this cache was created from the given `.network` file.
+        """
+        return source_matches(network_filepath, self.source_size, self.source_mtime_ns, self.source_hash,
+                              self.filepath, HEADER_MTIME_OFFSET)
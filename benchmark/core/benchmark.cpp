@@ -1,10 +1,26 @@
 #include <dlfcn.h>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
+#include <algorithm>
+#include <atomic>
 #include <chrono>
+#include <cstdio>
+#include <cstring>
 #include <iostream>
+#include <string>
+#include <thread>
 
 #include "algorithm.h"
+#include "counters.h"
+#include "indexer.h"
+#include "memory.h"
 #include "network.h"
+#include "network_index.h"
+#include "queries.h"
+#include "results.h"
 #include "types.h"
 
 #include "benchmark.h"
@@ -12,8 +28,56 @@
 using namespace std;
 using namespace JourneyBench;
 
+namespace {
+
+    const char SNAPSHOT_MAGIC[12] = "JBSNAPSHOT";
+    const u32 SNAPSHOT_VERSION = 1;
+
+    /* The data of the algorithm starts on the page after the header. */
+    const u64 SNAPSHOT_DATA_OFFSET = 4096;
+
+    struct SnapshotHeader {
+        char magic[12];
+        u32 version;
+        u8 key[SNAPSHOT_KEY_SIZE];
+        u64 preprocessing_runtime_ns;
+        u64 size;  // Size of the data of the algorithm.
+    };
+
+}
+
 namespace JourneyBench {
 
+    Benchmark::~Benchmark() {
+        delete algorithm;
+        if (snapshot != nullptr) { munmap(snapshot, snapshot_size); }
+        delete index;
+    }
+
+    void Benchmark::reset_algorithm() {
+        delete algorithm;
+        algorithm = create();
+        initialized = false;
+        /* The previous instance may have referred to the snapshot. */
+        if (snapshot != nullptr) {
+            munmap(snapshot, snapshot_size);
+            snapshot = nullptr;
+            snapshot_size = 0;
+        }
+    }
+
+    int Benchmark::build_index() {
+        /* The index is shared by all runs on the network, and not part of the measurements. */
+        if (index != nullptr) { return 0; }
+        index = new NetworkIndex();
+        if (build_network_index(network, index) != 0) {
+            delete index;
+            index = nullptr;
+            return -1;
+        }
+        return 0;
+    }
+
     int Benchmark::set_algorithm(char *filepath) {
         /* Load the shared object file corresponding to the algorithm. */
         void *algorithmHandle = dlopen(filepath, RTLD_NOW);
@@ -21,45 +85,277 @@ namespace JourneyBench {
 
         /* Find the `createInstance` function. */
         using CreateFn = AlgorithmBase *(*)();
-        CreateFn create = reinterpret_cast<CreateFn>(dlsym(algorithmHandle, "createInstance"));
+        create = reinterpret_cast<CreateFn>(dlsym(algorithmHandle, "createInstance"));
         if (!create) { return -1; }
 
         /* Create an instance of the AlgorithmBase class implementation. */
-        algorithm = create();
+        reset_algorithm();
         return 0;
     }
 
+    bool Benchmark::supports_profile_queries() {
+        return algorithm != nullptr && algorithm->supports_profile_queries();
+    }
+
+    bool Benchmark::supports_one_to_many_queries() {
+        return algorithm != nullptr && algorithm->supports_one_to_many_queries();
+    }
+
     int Benchmark::set_network(Network *network) {
+        /* An initialized instance refers to the index of the previous network. */
+        if (initialized) { reset_algorithm(); }
+        delete index;
+        index = nullptr;
         this->network = network;
         return 0;
     }
 
+    void Benchmark::set_counters(bool enabled) {
+        counters = enabled;
+    }
+
     PreprocessingResult *Benchmark::run_preprocessing() {
         if (algorithm == nullptr || network == nullptr) { return nullptr; }
 
+        /* Repeated preprocessing starts from a fresh instance, without reloading the shared object. */
+        if (initialized) { reset_algorithm(); }
+        initialized = true;
+        if (build_index() != 0) { return nullptr; }
+
+        /* The counters are started before and stopped after the clock, so the clock excludes their overhead. */
+        PerfCounters *perf = counters ? new PerfCounters() : nullptr;
+        MemoryMeter meter;
+        meter.start();
+        if (perf) { perf->start(); }
         auto start = chrono::steady_clock::now();
         /* Call the algorithm's initialization method. */
-        int status = algorithm->init(network);
+        int status = algorithm->init(network, index);
         auto end = chrono::steady_clock::now();
+        Counters preprocessing_counters;
+        if (perf) { perf->stop(preprocessing_counters); }
+        MemoryUsage memory;
+        meter.stop(memory);
+        delete perf;
         auto runtime_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
 
         if (status != 0) { return nullptr; }
-        return new PreprocessingResult(runtime_ns);
+        auto result = new PreprocessingResult(runtime_ns);
+        result->counters = preprocessing_counters;
+        result->memory = memory;
+        return result;
+    }
+
+    int Benchmark::save_snapshot(const char *filepath, const string &key, u64 preprocessing_runtime_ns) {
+        if (algorithm == nullptr || !initialized || key.size() != SNAPSHOT_KEY_SIZE) { return -1; }
+
+        /* Write to a temporary file first, so an interrupted write never leaves a partial snapshot. */
+        string tmp_filepath = string(filepath) + "." + to_string(getpid()) + ".tmp";
+        FILE *file = fopen(tmp_filepath.c_str(), "wb");
+        if (file == nullptr) { return -1; }
+
+        SnapshotHeader header = {};
+        memcpy(header.magic, SNAPSHOT_MAGIC, sizeof(header.magic));
+        header.version = SNAPSHOT_VERSION;
+        memcpy(header.key, key.data(), SNAPSHOT_KEY_SIZE);
+        header.preprocessing_runtime_ns = preprocessing_runtime_ns;
+
+        /* Call the algorithm's save method, which reports that snapshots are not supported by failing. */
+        bool supported = true, ok = fseek(file, SNAPSHOT_DATA_OFFSET, SEEK_SET) == 0;
+        if (ok) { supported = ok = algorithm->save_state(file) == 0; }
+        if (ok) {
+            header.size = ftell(file) - SNAPSHOT_DATA_OFFSET;
+            ok = fseek(file, 0, SEEK_SET) == 0 && fwrite(&header, sizeof(header), 1, file) == 1;
+        }
+        ok = fclose(file) == 0 && ok;
+        if (ok && rename(tmp_filepath.c_str(), filepath) == 0) { return 0; }
+
+        remove(tmp_filepath.c_str());
+        return supported ? -1 : 1;
+    }
+
+    LoadResult *Benchmark::load_snapshot(const char *filepath, const string &key) {
+        if (algorithm == nullptr || network == nullptr || key.size() != SNAPSHOT_KEY_SIZE) { return nullptr; }
+
+        /* Restoring starts from a fresh instance, just like preprocessing. */
+        reset_algorithm();
+        if (build_index() != 0) { return nullptr; }
+
+        MemoryMeter meter;
+        meter.start();
+        auto start = chrono::steady_clock::now();
+
+        int fd = open(filepath, O_RDONLY);
+        if (fd < 0) { return nullptr; }
+        struct stat file_stat;
+        SnapshotHeader header;
+        bool ok = fstat(fd, &file_stat) == 0 && read(fd, &header, sizeof(header)) == sizeof(header)
+                  && memcmp(header.magic, SNAPSHOT_MAGIC, sizeof(header.magic)) == 0
+                  && header.version == SNAPSHOT_VERSION
+                  && memcmp(header.key, key.data(), SNAPSHOT_KEY_SIZE) == 0
+                  && (u64) file_stat.st_size >= SNAPSHOT_DATA_OFFSET + header.size;
+        if (ok) {
+            snapshot_size = SNAPSHOT_DATA_OFFSET + header.size;
+            void *mapping = mmap(nullptr, snapshot_size, PROT_READ, MAP_PRIVATE, fd, 0);
+            snapshot = mapping != MAP_FAILED ? (u8 *) mapping : nullptr;
+        }
+        close(fd);
+        if (snapshot == nullptr) {
+            snapshot_size = 0;
+            return nullptr;
+        }
+
+        /* Call the algorithm's restore method. */
+        int status = algorithm->load_state(network, index, snapshot + SNAPSHOT_DATA_OFFSET, header.size);
+        auto end = chrono::steady_clock::now();
+        MemoryUsage memory;
+        meter.stop(memory);
+        auto runtime_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
+
+        if (status != 0) {
+            reset_algorithm();
+            return nullptr;
+        }
+        initialized = true;
+        auto result = new LoadResult(runtime_ns, header.preprocessing_runtime_ns);
+        result->memory = memory;
+        return result;
     }
 
     QueryResult *Benchmark::run_query(u32 from_node_id, u32 to_node_id, u32 departure_time) {
         if (algorithm == nullptr || network == nullptr) { return nullptr; }
 
+        PerfCounters *perf = counters ? new PerfCounters() : nullptr;
+        if (perf) { perf->start(); }
         auto start = chrono::steady_clock::now();
         /* Call the algorithm's query method. */
         vector <Journey> *journeys = algorithm->query(from_node_id, to_node_id, departure_time);
         auto end = chrono::steady_clock::now();
+        Counters query_counters;
+        if (perf) { perf->stop(query_counters); }
+        delete perf;
         auto runtime_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
 
         if (journeys == nullptr) { return nullptr; }
         auto result = new QueryResult(runtime_ns, *journeys);
+        result->counters = query_counters;
         delete journeys;
         return result;
     }
 
+    QueryBatchResult *Benchmark::run_queries(Queries *queries, u32 threads, u32 block) {
+        return run_batch(queries, threads, block, EARLIEST_ARRIVAL, 0);
+    }
+
+    QueryBatchResult *Benchmark::run_profile_queries(Queries *queries, u32 window, u32 threads, u32 block) {
+        return run_batch(queries, threads, block, PROFILE, window);
+    }
+
+    QueryBatchResult *Benchmark::run_one_to_many_queries(Queries *queries, u32 threads, u32 block) {
+        return run_batch(queries, threads, block, ONE_TO_MANY, 0);
+    }
+
+    QueryBatchResult *Benchmark::run_batch(Queries *queries, u32 threads, u32 block, BatchType type, u32 window) {
+        if (algorithm == nullptr || network == nullptr) { return nullptr; }
+        u64 query_count = queries->queries.size();
+
+        /* One-to-many queries without targets target all stops. */
+        vector <u32> targets;
+        if (type == ONE_TO_MANY && !one_to_many_targets(network, queries, &targets)) { return nullptr; }
+        u64 target_count = targets.size();
+
+        MemoryMeter meter;
+        meter.start();
+
+        /* Each thread needs its own instance, the first thread uses the initialized instance. */
+        vector<AlgorithmBase *> instances = {algorithm};
+        while (instances.size() < max(threads, 1u)) {
+            AlgorithmBase *instance = algorithm->clone();
+            if (instance == nullptr) { break; }  // Concurrent queries are not supported.
+            instances.push_back(instance);
+        }
+
+        vector<u64> query_runtime_ns(query_count);
+        vector<Counters> query_counters(counters ? query_count : 0);
+        vector<vector <Journey> *> query_journeys(query_count, nullptr);
+        vector<u32> arrival_times(query_count * target_count);
+        block = max(block, 1u);
+        atomic<u64> next_block(0);
+        atomic<bool> failed(false);
+        auto worker = [&](AlgorithmBase *instance) {
+            /* Counters only count the thread that opened them, so each worker opens its own. */
+            PerfCounters *perf = counters ? new PerfCounters() : nullptr;
+            for (u64 b = next_block++; b * block < query_count && !failed; b = next_block++) {
+                for (u64 i = b * block; i < min<u64>((b + 1) * block, query_count) && !failed; i++) {
+                    Query &query = queries->queries[i];
+
+                    if (perf) { perf->start(); }
+                    auto start = chrono::steady_clock::now();
+                    /* Call the algorithm's query method. */
+                    vector <Journey> *journeys = nullptr;
+                    int status = 0;
+                    if (type == PROFILE) {
+                        journeys = instance->profile_query(query.from_node_id, query.to_node_id, query.departure_time,
+                                                           (u32) min<u64>((u64) query.departure_time + window, ~0u));
+                    } else if (type == ONE_TO_MANY) {
+                        status = instance->arrival_times(query.from_node_id, query.departure_time, targets.data(),
+                                                         target_count, arrival_times.data() + i * target_count);
+                    } else {
+                        journeys = instance->query(query.from_node_id, query.to_node_id, query.departure_time);
+                    }
+                    auto end = chrono::steady_clock::now();
+                    if (perf) { perf->stop(query_counters[i]); }
+
+                    if (type == ONE_TO_MANY ? status != 0 : journeys == nullptr) { failed = true; }
+                    query_runtime_ns[i] = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
+                    query_journeys[i] = journeys;
+                }
+            }
+            delete perf;
+        };
+
+        auto start = chrono::steady_clock::now();
+        vector<thread> workers;
+        for (size_t i = 1; i < instances.size(); i++) {
+            workers.emplace_back(worker, instances[i]);
+        }
+        worker(instances[0]);
+        for (thread &t : workers) { t.join(); }
+        auto end = chrono::steady_clock::now();
+        auto runtime_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
+        MemoryUsage memory;
+        meter.stop(memory);
+
+        for (size_t i = 1; i < instances.size(); i++) { delete instances[i]; }
+
+        /* Flatten the journeys of all queries into the compact encoding. */
+        auto result = new QueryBatchResult(runtime_ns, instances.size());
+        result->memory = memory;
+        result->query_runtime_ns = std::move(query_runtime_ns);
+        result->query_counters = std::move(query_counters);
+        result->arrival_times = std::move(arrival_times);
+        result->arrival_offsets.resize(query_count + 1);
+        for (u64 i = 0; i <= query_count; i++) { result->arrival_offsets[i] = i * target_count; }
+        result->journey_offsets.reserve(query_count + 1);
+        result->part_offsets.push_back(0);
+        for (vector <Journey> *journeys : query_journeys) {
+            result->journey_offsets.push_back(result->part_offsets.size() - 1);
+            if (journeys == nullptr) { continue; }
+            for (Journey &journey : *journeys) {
+                for (JourneyPart &part : journey.parts) {
+                    result->part_types.push_back(part.type);
+                    result->part_ids.push_back(part.id);
+                }
+                result->part_offsets.push_back(result->part_ids.size());
+            }
+            delete journeys;
+        }
+        result->journey_offsets.push_back(result->part_offsets.size() - 1);
+
+        if (failed) {
+            delete result;
+            return nullptr;
+        }
+        return result;
+    }
+
 }
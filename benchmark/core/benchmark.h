@@ -1,27 +1,82 @@
 #ifndef BENCHMARK_H
 #define BENCHMARK_H
 
+#include <string>
+
 #include "algorithm.h"
 #include "network.h"
+#include "network_index.h"
 #include "queries.h"
 #include "results.h"
 #include "types.h"
 
 namespace JourneyBench {
 
+    /* Size of the key that identifies a snapshot. */
+    const u64 SNAPSHOT_KEY_SIZE = 64;
+
     class Benchmark {
     public:
+        ~Benchmark();
+
         int set_algorithm(char *filepath);
 
+        /* Set the network, of which the index is built by the next preprocessing run. */
         int set_network(Network *network);
 
+        /* Enable or disable the hardware performance counters around `init` and `query`. */
+        void set_counters(bool enabled);
+
         PreprocessingResult *run_preprocessing();
 
+        /* Write the preprocessed state of the algorithm to a snapshot file, identified by a key of
+         * `SNAPSHOT_KEY_SIZE` bytes, e.g. the hashes of the algorithm and the network.
+         * Returns 0 on success, 1 if the algorithm does not support snapshots, or -1 on error. */
+        int save_snapshot(const char *filepath, const std::string &key, u64 preprocessing_runtime_ns);
+
+        /* Restore the preprocessed state of the algorithm from a memory-mapped snapshot file with the same key,
+         * instead of preprocessing. Returns nullptr if there is no such snapshot, or it could not be restored. */
+        LoadResult *load_snapshot(const char *filepath, const std::string &key);
+
+        /* Whether the algorithm supports profile and one-to-many queries. */
+        bool supports_profile_queries();
+        bool supports_one_to_many_queries();
+
         QueryResult *run_query(u32 from_node_id, u32 to_node_id, u32 departure_time);
 
+        /* Run a batch of queries on `threads` threads. Each thread takes `block` consecutive queries at a time,
+         * so e.g. the repetitions of a query run back to back on the same thread. */
+        QueryBatchResult *run_queries(Queries *queries, u32 threads, u32 block = 1);
+
+        /* Run profile queries, of which the departure times range from the departure time of the query up to
+         * and including `window` seconds later (see `AlgorithmBase::profile_query`). */
+        QueryBatchResult *run_profile_queries(Queries *queries, u32 window, u32 threads, u32 block = 1);
+
+        /* Run one-to-many queries, from the origin of each query to all targets of the queries, or to all stops
+         * if the queries have no targets (see `AlgorithmBase::arrival_times`). Returns nullptr if a target does
+         * not exist, or a query failed. */
+        QueryBatchResult *run_one_to_many_queries(Queries *queries, u32 threads, u32 block = 1);
+
     private:
-        AlgorithmBase *algorithm;
-        JourneyBench::Network *network;
+        AlgorithmBase *(*create)() = nullptr;
+        AlgorithmBase *algorithm = nullptr;
+        bool initialized = false;
+        bool counters = false;
+        JourneyBench::Network *network = nullptr;
+        NetworkIndex *index = nullptr;  // Shared by the algorithm instances, built once per network.
+        u8 *snapshot = nullptr;  // Mapped snapshot that the algorithm was restored from.
+        u64 snapshot_size = 0;
+
+        /* Replace the algorithm by a fresh instance. */
+        void reset_algorithm();
+
+        int build_index();
+
+        enum BatchType {
+            EARLIEST_ARRIVAL, PROFILE, ONE_TO_MANY
+        };
+
+        QueryBatchResult *run_batch(Queries *queries, u32 threads, u32 block, BatchType type, u32 window);
     };
 
 }
@@ -1,12 +1,17 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 #include <pybind11/stl_bind.h>
 
 #include "benchmark.h"
+#include "footpaths.h"
+#include "loader.h"
 #include "network.h"
+#include "oracle.h"
 #include "queries.h"
 #include "results.h"
 #include "types.h"
+#include "validator.h"
 
 using namespace JourneyBench;
 
@@ -24,9 +29,89 @@ struct {
 
 namespace py = pybind11;
 
-PYBIND11_MAKE_OPAQUE(std::vector<Node>);
-PYBIND11_MAKE_OPAQUE(std::vector<Conn>);
-PYBIND11_MAKE_OPAQUE(std::vector<Path>);
+/* Create a read-only NumPy view on the elements of a vector, without copying.
+ * The view keeps `base` alive, but is invalidated when the vector reallocates. */
+template<typename T>
+py::array readonly_view(std::vector<T> &vector, py::handle base) {
+    py::array_t<T> array({vector.size()}, {sizeof(T)}, vector.data(), base);
+    array.attr("setflags")(py::arg("write") = false);
+    return array;
+}
+
+/* Create a read-only NumPy view on the elements of a network column, without copying.
+ * The view keeps `base` alive, but is invalidated when the column is modified. */
+template<typename T>
+py::array readonly_view(const Column<T> &column, py::handle base) {
+    py::array_t<T> array({column.size()}, {sizeof(T)}, column.data(), base);
+    array.attr("setflags")(py::arg("write") = false);
+    return array;
+}
+
+/* Append the elements of a contiguous NumPy array to a network column with a single copy.
+ * Returns the index of the first appended element. */
+template<typename T>
+size_t extend(Column<T> &column, py::array_t<T, py::array::c_style | py::array::forcecast> array) {
+    size_t first = column.size();
+    const T *data = array.data();
+    size_t count = array.size();
+    py::gil_scoped_release release;
+    column.reserve(first + count);
+    column.append(data, count);
+    return first;
+}
+
+/* View the elements of a buffer (e.g. a memory-mapped NumPy array) in a network column, without copying.
+ * The buffer must be a contiguous array of `T`, and must be kept alive as long as the column views it. */
+template<typename T>
+void view_buffer(Column<T> &column, py::buffer buffer) {
+    py::buffer_info info = buffer.request();
+    if (info.ndim != 1 || info.itemsize != sizeof(T) || (info.size > 1 && info.strides[0] != sizeof(T))) {
+        throw std::invalid_argument("Buffer is not a contiguous array of network elements!");
+    }
+    column.view(static_cast<const T *>(info.ptr), info.size);
+}
+
+/* Expose a network column as a read-only sequence. */
+template<typename T>
+void bind_column(py::module_ &m, const char *name) {
+    py::class_<Column<T>>(m, name)
+            .def("__len__", &Column<T>::size)
+            .def("__bool__", [](const Column<T> &column) { return !column.empty(); })
+            .def("__getitem__", [](const Column<T> &column, py::ssize_t i) {
+                if (i < 0) { i += column.size(); }
+                if (i < 0 || (size_t) i >= column.size()) { throw py::index_error(); }
+                return column[i];
+            })
+            .def("__iter__", [](const Column<T> &column) {
+                return py::make_iterator(column.begin(), column.end());
+            }, py::keep_alive<0, 1>());
+}
+
+/* Append the elements of a contiguous NumPy array to a vector with a single copy.
+ * Returns the index of the first appended element. */
+template<typename T>
+size_t extend(std::vector<T> &vector, py::array_t<T, py::array::c_style | py::array::forcecast> array) {
+    size_t first = vector.size();
+    const T *data = array.data();
+    size_t count = array.size();
+    py::gil_scoped_release release;
+    vector.reserve(first + count);
+    vector.insert(vector.end(), data, data + count);
+    return first;
+}
+
+/* Expose a hardware counter as an optional integer, which is None when the counter is unavailable. */
+template<u64 Counters::*counter>
+void def_counter(py::class_<Counters> &cls, const char *name) {
+    cls.def_property(name, [](const Counters &counters) -> py::object {
+        u64 value = counters.*counter;
+        if (value == COUNTER_UNAVAILABLE) { return py::none(); }
+        return py::int_(value);
+    }, [](Counters &counters, py::object value) {
+        counters.*counter = value.is_none() ? COUNTER_UNAVAILABLE : value.cast<u64>();
+    });
+}
+
 PYBIND11_MAKE_OPAQUE(std::vector<std::vector<Conn*>>);
 
 PYBIND11_MAKE_OPAQUE(std::vector<Query>);
@@ -36,12 +121,51 @@ PYBIND11_MAKE_OPAQUE(std::vector<JourneyPart>);
 PYBIND11_MAKE_OPAQUE(std::vector<u32>);
 
 PYBIND11_MODULE(benchmark_core, m) {
+    PYBIND11_NUMPY_DTYPE(Node, latitude, longitude, stop);
+    PYBIND11_NUMPY_DTYPE(Conn, trip_id, from_node_id, to_node_id, departure_time, arrival_time);
+    PYBIND11_NUMPY_DTYPE(Path, node_a_id, node_b_id, duration);
+    PYBIND11_NUMPY_DTYPE(Query, from_node_id, to_node_id, departure_time);
+    PYBIND11_NUMPY_DTYPE(Counters, cycles, instructions, l1d_misses, llc_misses, branch_misses, dtlb_misses);
+
+    m.attr("node_dtype") = py::dtype::of<Node>();
+    m.attr("conn_dtype") = py::dtype::of<Conn>();
+    m.attr("path_dtype") = py::dtype::of<Path>();
+    m.attr("query_dtype") = py::dtype::of<Query>();
+    m.attr("counters_dtype") = py::dtype::of<Counters>();
+    m.attr("COUNTER_UNAVAILABLE") = py::int_(COUNTER_UNAVAILABLE);
+
     py::class_<Benchmark>(m, "Benchmark")
             .def(py::init<>())
             .def("set_algorithm", &Benchmark::set_algorithm)
             .def("set_network", &Benchmark::set_network)
+            .def("set_counters", &Benchmark::set_counters)
             .def("run_preprocessing", &Benchmark::run_preprocessing)
-            .def("run_query", &Benchmark::run_query);
+            .def("save_snapshot", [](Benchmark &benchmark, std::string filepath, py::bytes key, u64 preprocessing_runtime_ns) {
+                std::string key_bytes = key;
+                if (key_bytes.size() != SNAPSHOT_KEY_SIZE) {
+                    throw std::invalid_argument("Snapshot key must be " + std::to_string(SNAPSHOT_KEY_SIZE) + " bytes!");
+                }
+                return benchmark.save_snapshot(filepath.c_str(), key_bytes, preprocessing_runtime_ns);
+            })
+            .def("load_snapshot", [](Benchmark &benchmark, std::string filepath, py::bytes key) {
+                std::string key_bytes = key;
+                if (key_bytes.size() != SNAPSHOT_KEY_SIZE) {
+                    throw std::invalid_argument("Snapshot key must be " + std::to_string(SNAPSHOT_KEY_SIZE) + " bytes!");
+                }
+                return benchmark.load_snapshot(filepath.c_str(), key_bytes);
+            })
+            .def("supports_profile_queries", &Benchmark::supports_profile_queries)
+            .def("supports_one_to_many_queries", &Benchmark::supports_one_to_many_queries)
+            .def("run_query", &Benchmark::run_query)
+            .def("run_queries", &Benchmark::run_queries,
+                 py::arg("queries"), py::arg("threads"), py::arg("block") = 1,
+                 py::call_guard<py::gil_scoped_release>())
+            .def("run_profile_queries", &Benchmark::run_profile_queries,
+                 py::arg("queries"), py::arg("window"), py::arg("threads"), py::arg("block") = 1,
+                 py::call_guard<py::gil_scoped_release>())
+            .def("run_one_to_many_queries", &Benchmark::run_one_to_many_queries,
+                 py::arg("queries"), py::arg("threads"), py::arg("block") = 1,
+                 py::call_guard<py::gil_scoped_release>());
 
     py::class_<Node>(m, "Node")
             .def_readonly("latitude", &Node::latitude)
@@ -66,23 +190,57 @@ PYBIND11_MODULE(benchmark_core, m) {
             .def_readonly("conns", &Network::conns)
             .def_readonly("paths", &Network::paths)
             .def_readonly("trips", &Network::trips)
+            .def("load", [](Network &network, std::string filepath) {
+                u32 end_time;
+                if (load_network(filepath.c_str(), &network, &end_time) != 0) {
+                    throw std::runtime_error("Could not load network from '" + filepath + "'!");
+                }
+                return end_time;
+            }, py::call_guard<py::gil_scoped_release>())
+            .def("nodes_array", [](py::object self) {
+                return readonly_view(self.cast<Network &>().nodes, self);
+            })
+            .def("conns_array", [](py::object self) {
+                return readonly_view(self.cast<Network &>().conns, self);
+            })
+            .def("paths_array", [](py::object self) {
+                return readonly_view(self.cast<Network &>().paths, self);
+            })
+            .def("view_columns", [](Network &network, py::buffer nodes, py::buffer conns, py::buffer paths) {
+                view_buffer(network.nodes, nodes);
+                view_buffer(network.conns, conns);
+                view_buffer(network.paths, paths);
+            }, py::keep_alive<1, 2>(), py::keep_alive<1, 3>(), py::keep_alive<1, 4>())
             .def("add_node", [](Network &network, f64 latitude, f64 longitude, bool stop) {
                 network.nodes.push_back({latitude, longitude, stop});
                 return network.nodes.size() - 1;
             })
+            .def("add_nodes", [](Network &network, py::array_t<Node, py::array::c_style | py::array::forcecast> nodes) {
+                return extend(network.nodes, nodes);
+            })
             .def("add_trip", [](Network &network) {
                 network.trips.push_back({});
                 return network.trips.size() - 1;
             })
+            .def("add_trips", [](Network &network, size_t count) {
+                network.trips.resize(network.trips.size() + count);
+                return network.trips.size() - count;
+            })
             .def("add_conn", [](Network &network, u32 trip_id, u32 from_node_id, u32 to_node_id, u32 departure_time, u32 arrival_time) {
                 network.conns.push_back({trip_id, from_node_id, to_node_id, departure_time, arrival_time});
             })
+            .def("add_conns", [](Network &network, py::array_t<Conn, py::array::c_style | py::array::forcecast> conns) {
+                return extend(network.conns, conns);
+            })
             .def("add_path", [](Network &network, u32 node_a_id, u32 node_b_id, u32 duration) {
                 network.paths.push_back({node_a_id, node_b_id, duration});
             })
+            .def("add_paths", [](Network &network, py::array_t<Path, py::array::c_style | py::array::forcecast> paths) {
+                return extend(network.paths, paths);
+            })
             .def("sort", [](Network &network) {
-                std::sort(network.conns.begin(), network.conns.end(), connLess);
-                std::sort(network.paths.begin(), network.paths.end(), pathLess);
+                network.conns.sort(connLess);
+                network.paths.sort(pathLess);
             });
 
     py::class_<Query>(m, "Query")
@@ -93,9 +251,26 @@ PYBIND11_MODULE(benchmark_core, m) {
     py::class_<Queries>(m, "Queries")
             .def(py::init<>())
             .def_readonly("queries", &Queries::queries)
+            .def("load", [](Queries &queries, std::string filepath) {
+                if (load_queries(filepath.c_str(), &queries) != 0) {
+                    throw std::runtime_error("Could not load queries from '" + filepath + "'!");
+                }
+            }, py::call_guard<py::gil_scoped_release>())
+            .def("queries_array", [](py::object self) {
+                return readonly_view(self.cast<Queries &>().queries, self);
+            })
             .def("add_query", [](Queries &queries, u32 from_node_id, u32 to_node_id, u32 departure_time) {
                 queries.queries.push_back({from_node_id, to_node_id, departure_time});
                 return queries.queries.size() - 1;
+            })
+            .def("add_queries", [](Queries &queries, py::array_t<Query, py::array::c_style | py::array::forcecast> array) {
+                return extend(queries.queries, array);
+            })
+            .def("targets_array", [](py::object self) {
+                return readonly_view(self.cast<Queries &>().target_node_ids, self);
+            })
+            .def("add_targets", [](Queries &queries, py::array_t<u32, py::array::c_style | py::array::forcecast> array) {
+                return extend(queries.target_node_ids, array);
             });
 
     py::enum_<JourneyPartType>(m, "JourneyPartType")
@@ -115,20 +290,208 @@ PYBIND11_MODULE(benchmark_core, m) {
                 journey.parts.push_back(JourneyPart(type, id));
             });
 
+    py::class_<Counters> counters(m, "Counters");
+    counters.def(py::init<>());
+    def_counter<&Counters::cycles>(counters, "cycles");
+    def_counter<&Counters::instructions>(counters, "instructions");
+    def_counter<&Counters::l1d_misses>(counters, "l1d_misses");
+    def_counter<&Counters::llc_misses>(counters, "llc_misses");
+    def_counter<&Counters::branch_misses>(counters, "branch_misses");
+    def_counter<&Counters::dtlb_misses>(counters, "dtlb_misses");
+
+    py::class_<MemoryUsage>(m, "MemoryUsage")
+            .def(py::init<>())
+            .def_readwrite("peak_rss_bytes", &MemoryUsage::peak_rss_bytes)
+            .def_readwrite("rss_before_bytes", &MemoryUsage::rss_before_bytes)
+            .def_readwrite("heap_growth_bytes", &MemoryUsage::heap_growth_bytes)
+            .def_readwrite("peak_reset", &MemoryUsage::peak_reset)
+            .def("__repr__", [](const MemoryUsage &memory) {
+                return "MemoryUsage(peak_rss: " + std::to_string(memory.peak_rss_bytes >> 20) + " MiB, "
+                       "heap_growth: " + std::to_string(memory.heap_growth_bytes / (1 << 20)) + " MiB)";
+            });
+
     py::class_<QueryResult>(m, "QueryResult")
             .def(py::init<u64>())
             .def_readonly("runtime_ns", &QueryResult::runtime_ns)
             .def_readonly("journeys", &QueryResult::journeys)
+            .def_readwrite("counters", &QueryResult::counters)
             .def("add_journey", [](QueryResult &result, Journey &journey) {
                 result.journeys.push_back(journey);
             });
 
+    py::class_<QueryBatchResult>(m, "QueryBatchResult")
+            .def_readonly("runtime_ns", &QueryBatchResult::runtime_ns)
+            .def_readonly("threads", &QueryBatchResult::threads)
+            .def_readonly("memory", &QueryBatchResult::memory)
+            .def_property_readonly("query_runtime_ns", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().query_runtime_ns, self);
+            })
+            .def_property_readonly("query_counters", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().query_counters, self);
+            })
+            .def_property_readonly("journey_offsets", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().journey_offsets, self);
+            })
+            .def_property_readonly("part_offsets", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().part_offsets, self);
+            })
+            .def_property_readonly("part_types", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().part_types, self);
+            })
+            .def_property_readonly("part_ids", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().part_ids, self);
+            })
+            .def_property_readonly("arrival_offsets", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().arrival_offsets, self);
+            })
+            .def_property_readonly("arrival_times", [](py::object self) {
+                return readonly_view(self.cast<QueryBatchResult &>().arrival_times, self);
+            });
+
+    py::class_<ResultsColumns, QueryBatchResult>(m, "ResultsColumns")
+            .def(py::init<>())
+            .def_readonly("truncated", &ResultsColumns::truncated)
+            .def_property_readonly("query_ids", [](py::object self) {
+                return readonly_view(self.cast<ResultsColumns &>().query_ids, self);
+            })
+            .def_property_readonly("other", [](ResultsColumns &columns) {
+                return py::bytes(columns.other);
+            })
+            .def("load", [](ResultsColumns &columns, std::string filepath) {
+                if (load_results(filepath.c_str(), &columns) != 0) {
+                    throw std::runtime_error("Could not load results from '" + filepath + "'!");
+                }
+            }, py::call_guard<py::gil_scoped_release>());
+
     py::class_<PreprocessingResult>(m, "PreprocessingResult")
-            .def_readonly("runtime_ns", &PreprocessingResult::runtime_ns);
+            .def(py::init<u64>())
+            .def_readonly("runtime_ns", &PreprocessingResult::runtime_ns)
+            .def_readwrite("counters", &PreprocessingResult::counters)
+            .def_readwrite("memory", &PreprocessingResult::memory);
+
+    py::class_<LoadResult>(m, "LoadResult")
+            .def(py::init<u64, u64>())
+            .def_readonly("runtime_ns", &LoadResult::runtime_ns)
+            .def_readonly("preprocessing_runtime_ns", &LoadResult::preprocessing_runtime_ns)
+            .def_readwrite("memory", &LoadResult::memory);
+
+    py::enum_<Verdict>(m, "Verdict")
+            .value("VALID", Verdict::VALID)
+            .value("LOOP", Verdict::LOOP)
+            .value("TELEPORTATION", Verdict::TELEPORTATION)
+            .value("TIME_TRAVEL", Verdict::TIME_TRAVEL)
+            .value("NOT_REACHED", Verdict::NOT_REACHED)
+            .value("INVALID_PART", Verdict::INVALID_PART)
+            .value("NO_JOURNEY", Verdict::NO_JOURNEY);
+
+    m.attr("NO_ARRIVAL") = py::int_(NO_ARRIVAL);
+
+    py::class_<Validation>(m, "Validation")
+            .def_property_readonly("journey_verdicts", [](py::object self) {
+                return readonly_view(self.cast<Validation &>().journey_verdicts, self);
+            })
+            .def_property_readonly("journey_arrivals", [](py::object self) {
+                return readonly_view(self.cast<Validation &>().journey_arrivals, self);
+            })
+            .def_property_readonly("query_verdicts", [](py::object self) {
+                return readonly_view(self.cast<Validation &>().query_verdicts, self);
+            })
+            .def_property_readonly("query_arrivals", [](py::object self) {
+                return readonly_view(self.cast<Validation &>().query_arrivals, self);
+            });
+
+    m.def("validate", [](Network &network, Queries &queries,
+                         py::array_t<u32, py::array::c_style | py::array::forcecast> query_ids,
+                         py::array_t<u32, py::array::c_style | py::array::forcecast> journey_offsets,
+                         py::array_t<u32, py::array::c_style | py::array::forcecast> part_offsets,
+                         py::array_t<u8, py::array::c_style | py::array::forcecast> part_types,
+                         py::array_t<u32, py::array::c_style | py::array::forcecast> part_ids,
+                         u32 threads) {
+        if (journey_offsets.size() != query_ids.size() + 1 || part_offsets.size() < 1
+            || part_types.size() != part_ids.size()) {
+            throw std::invalid_argument("Inconsistent sizes of the query result arrays!");
+        }
+        auto validation = new Validation();
+        int status;
+        {
+            py::gil_scoped_release release;
+            status = validate(&network, &queries, query_ids.data(), query_ids.size(),
+                              journey_offsets.data(), part_offsets.size() - 1, part_offsets.data(),
+                              part_types.data(), part_ids.data(), part_ids.size(), threads, validation);
+        }
+        if (status != 0) {
+            delete validation;
+            throw std::invalid_argument("Invalid query results, or queries that do not belong to the network!");
+        }
+        return validation;
+    }, py::return_value_policy::take_ownership);
+
+    m.def("earliest_arrivals", [](Network &network, Queries &queries, u32 threads) {
+        std::vector<u32> arrivals;
+        int status;
+        {
+            py::gil_scoped_release release;
+            status = earliest_arrivals(&network, &queries, threads, &arrivals);
+        }
+        if (status != 0) {
+            throw std::invalid_argument("Queries or connections refer to nodes or trips that do not exist!");
+        }
+        py::array_t<u32> result({arrivals.size()}, {sizeof(u32)});
+        std::copy(arrivals.begin(), arrivals.end(), result.mutable_data());
+        return result;
+    });
+
+    m.def("one_to_many_targets", [](Network &network, Queries &queries) {
+        std::vector<u32> targets;
+        if (!one_to_many_targets(&network, &queries, &targets)) {
+            throw std::invalid_argument("Targets refer to nodes that do not exist!");
+        }
+        py::array_t<u32> result({targets.size()}, {sizeof(u32)});
+        std::copy(targets.begin(), targets.end(), result.mutable_data());
+        return result;
+    });
+
+    m.def("earliest_arrival_times", [](Network &network, Queries &queries, u32 threads) {
+        std::vector<u32> arrival_times;
+        int status;
+        {
+            py::gil_scoped_release release;
+            status = earliest_arrival_times(&network, &queries, threads, &arrival_times);
+        }
+        if (status != 0) {
+            throw std::invalid_argument("Queries, targets or connections refer to nodes or trips that do not exist!");
+        }
+        size_t target_count = queries.queries.empty() ? 0 : arrival_times.size() / queries.queries.size();
+        py::array_t<u32> result({queries.queries.size(), target_count}, {target_count * sizeof(u32), sizeof(u32)});
+        std::copy(arrival_times.begin(), arrival_times.end(), result.mutable_data());
+        return result;
+    });
+
+    m.def("transitive_paths", [](Network &network,
+                                 py::array_t<u32, py::array::c_style | py::array::forcecast> sources,
+                                 py::array_t<bool, py::array::c_style | py::array::forcecast> targets,
+                                 u32 cutoff, u32 threads) {
+        if ((size_t) targets.size() != network.nodes.size()) {
+            throw std::invalid_argument("Targets must be a mask with an element per node!");
+        }
+        std::vector<Path> paths;
+        int status;
+        {
+            py::gil_scoped_release release;
+            status = transitive_paths(&network, sources.data(), sources.size(),
+                                      reinterpret_cast<const u8 *>(targets.data()), cutoff, threads, &paths);
+        }
+        if (status != 0) {
+            throw std::invalid_argument("Sources or paths refer to nodes that do not exist!");
+        }
+        py::array_t<Path> result({paths.size()}, {sizeof(Path)});
+        std::copy(paths.begin(), paths.end(), result.mutable_data());
+        return result;
+    });
 
-    py::bind_vector<std::vector<Node>>(m, "VectorNode");
-    py::bind_vector<std::vector<Conn>>(m, "VectorConn");
-    py::bind_vector<std::vector<Path>>(m, "VectorPath");
+    bind_column<Node>(m, "ColumnNode");
+    bind_column<Conn>(m, "ColumnConn");
+    bind_column<Path>(m, "ColumnPath");
     py::bind_vector<std::vector<std::vector<Conn*>>>(m, "VectorTrip");
 
     py::bind_vector<std::vector<Query>>(m, "VectorQuery");
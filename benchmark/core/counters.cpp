@@ -0,0 +1,104 @@
+#include <linux/perf_event.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+#include <cstring>
+
+#include "results.h"
+#include "types.h"
+
+#include "counters.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    struct Event {
+        u32 type;
+        u64 config;
+        u64 Counters::*counter;
+    };
+
+    /* Generalized cache events, see `man perf_event_open`. */
+    constexpr u64 cache_miss(u64 cache) {
+        return cache | (PERF_COUNT_HW_CACHE_OP_READ << 8) | (PERF_COUNT_HW_CACHE_RESULT_MISS << 16);
+    }
+
+    const Event EVENTS[] = {
+            {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES, &Counters::cycles},
+            {PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS, &Counters::instructions},
+            {PERF_TYPE_HW_CACHE, cache_miss(PERF_COUNT_HW_CACHE_L1D), &Counters::l1d_misses},
+            {PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_MISSES, &Counters::llc_misses},
+            {PERF_TYPE_HARDWARE, PERF_COUNT_HW_BRANCH_MISSES, &Counters::branch_misses},
+            {PERF_TYPE_HW_CACHE, cache_miss(PERF_COUNT_HW_CACHE_DTLB), &Counters::dtlb_misses},
+    };
+
+    int open_event(const Event &event) {
+        perf_event_attr attr;
+        memset(&attr, 0, sizeof(attr));
+        attr.size = sizeof(attr);
+        attr.type = event.type;
+        attr.config = event.config;
+        attr.disabled = 1;
+        /* Only count user space, which is also allowed for unprivileged users with `perf_event_paranoid` 2. */
+        attr.exclude_kernel = 1;
+        attr.exclude_hv = 1;
+        attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING;
+        return syscall(SYS_perf_event_open, &attr, 0, -1, -1, PERF_FLAG_FD_CLOEXEC);
+    }
+
+}
+
+namespace JourneyBench {
+
+    PerfCounters::PerfCounters() {
+        static_assert(sizeof(EVENTS) / sizeof(Event) == COUNT, "Every counter needs an event.");
+        for (int i = 0; i < COUNT; i++) {
+            fds[i] = open_event(EVENTS[i]);
+        }
+    }
+
+    PerfCounters::~PerfCounters() {
+        for (int fd : fds) {
+            if (fd >= 0) { close(fd); }
+        }
+    }
+
+    bool PerfCounters::available() const {
+        for (int fd : fds) {
+            if (fd >= 0) { return true; }
+        }
+        return false;
+    }
+
+    void PerfCounters::start() {
+        for (int fd : fds) {
+            if (fd < 0) { continue; }
+            ioctl(fd, PERF_EVENT_IOC_RESET, 0);
+            ioctl(fd, PERF_EVENT_IOC_ENABLE, 0);
+        }
+    }
+
+    void PerfCounters::stop(Counters &counters) {
+        for (int fd : fds) {
+            if (fd >= 0) { ioctl(fd, PERF_EVENT_IOC_DISABLE, 0); }
+        }
+        for (int i = 0; i < COUNT; i++) {
+            u64 &counter = counters.*EVENTS[i].counter;
+            counter = COUNTER_UNAVAILABLE;
+
+            /* Value, time enabled and time running. */
+            u64 values[3];
+            if (fds[i] < 0 || read(fds[i], values, sizeof(values)) != sizeof(values)) { continue; }
+            if (values[2] == 0) { continue; }  // Never scheduled on the PMU.
+
+            /* Scale counters that were multiplexed with other events. */
+            counter = values[2] < values[1]
+                      ? static_cast<u64>(static_cast<f64>(values[0]) * values[1] / values[2])
+                      : values[0];
+        }
+    }
+
+}
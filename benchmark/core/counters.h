@@ -0,0 +1,33 @@
+#ifndef COUNTERS_H
+#define COUNTERS_H
+
+#include "results.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Hardware performance counters of the calling thread, based on `perf_event_open`.
+     * Each event is opened on its own instead of as a group, so an event that is not supported
+     * by the CPU or the kernel (e.g. dTLB misses in most virtual machines) only makes that
+     * counter unavailable. Counters that are unavailable are reported as `COUNTER_UNAVAILABLE`. */
+    class PerfCounters {
+    public:
+        PerfCounters();
+
+        ~PerfCounters();
+
+        /* Whether at least one of the counters could be opened. */
+        bool available() const;
+
+        void start();
+
+        void stop(Counters &counters);
+
+    private:
+        static const int COUNT = 6;
+        int fds[COUNT];
+    };
+
+}
+
+#endif
@@ -0,0 +1,104 @@
+#include <algorithm>
+#include <atomic>
+#include <functional>
+#include <queue>
+#include <thread>
+#include <utility>
+
+#include "indexer.h"
+#include "network.h"
+#include "network_index.h"
+#include "types.h"
+
+#include "footpaths.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Number of sources that a thread takes at once. */
+    const u64 CHUNK_SIZE = 64;
+
+    const u32 UNREACHED = ~0u;
+
+    /* Dijkstra search from a single source, bounded by the cutoff. `duration` must be `UNREACHED` for all
+     * nodes, and is restored before returning, by resetting only the nodes that were reached. */
+    void search(const NetworkIndex &index, u32 source, const u8 *targets, u32 cutoff,
+                vector <u32> &duration, vector <u32> &reached, vector <Path> &paths) {
+        typedef pair<u32, u32> Label;  // (duration, node)
+        priority_queue <Label, vector<Label>, greater<Label>> queue;
+        duration[source] = 0;
+        reached.push_back(source);
+        queue.push({0, source});
+
+        while (!queue.empty()) {
+            Label label = queue.top();
+            queue.pop();
+            u32 time = label.first, node = label.second;
+            if (time > duration[node]) { continue; }  // Outdated label.
+            if (targets[node]) { paths.push_back({source, node, time}); }
+
+            for (u32 i = index.footpath_offsets[node]; i < index.footpath_offsets[node + 1]; i++) {
+                u32 target = index.footpaths[i].node_id;
+                u64 target_time = (u64) time + index.footpaths[i].duration;
+                if (target_time <= cutoff && target_time < duration[target]) {
+                    if (duration[target] == UNREACHED) { reached.push_back(target); }
+                    duration[target] = (u32) target_time;
+                    queue.push({(u32) target_time, target});
+                }
+            }
+        }
+
+        for (u32 node : reached) { duration[node] = UNREACHED; }
+        reached.clear();
+    }
+
+}
+
+namespace JourneyBench {
+
+    int transitive_paths(const Network *network, const u32 *sources, u64 source_count, const u8 *targets,
+                         u32 cutoff, u32 threads, vector <Path> *paths) {
+        u32 node_count = network->nodes.size();
+        for (u64 i = 0; i < source_count; i++) {
+            if (sources[i] >= node_count) { return -1; }
+        }
+
+        NetworkIndex index;
+        if (build_footpath_index(network, &index) != 0) { return -1; }
+
+        /* Each chunk of sources writes its own paths, which are concatenated in order afterwards. */
+        u64 chunk_count = (source_count + CHUNK_SIZE - 1) / CHUNK_SIZE;
+        vector <vector<Path>> chunk_paths(chunk_count);
+        atomic<u64> next_chunk(0);
+        auto worker = [&]() {
+            vector <u32> duration(node_count, UNREACHED), reached;
+            for (u64 chunk = next_chunk++; chunk < chunk_count; chunk = next_chunk++) {
+                u64 end = min(source_count, (chunk + 1) * CHUNK_SIZE);
+                for (u64 i = chunk * CHUNK_SIZE; i < end; i++) {
+                    if (index.footpath_offsets[sources[i]] == index.footpath_offsets[sources[i] + 1]) { continue; }
+                    search(index, sources[i], targets, cutoff, duration, reached, chunk_paths[chunk]);
+                }
+            }
+        };
+
+        vector <thread> workers;
+        for (u32 i = 1; i < threads; i++) {
+            workers.emplace_back(worker);
+        }
+        worker();
+        for (thread &t : workers) { t.join(); }
+
+        u64 path_count = 0;
+        for (const vector <Path> &chunk : chunk_paths) { path_count += chunk.size(); }
+        paths->clear();
+        paths->reserve(path_count);
+        for (vector <Path> &chunk : chunk_paths) {
+            paths->insert(paths->end(), chunk.begin(), chunk.end());
+            vector<Path>().swap(chunk);
+        }
+        return 0;
+    }
+
+}
@@ -0,0 +1,22 @@
+#ifndef FOOTPATHS_H
+#define FOOTPATHS_H
+
+#include <vector>
+
+#include "network.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Compute the transitive closure of the footpaths between stops (see `tools/convertTransitive`). From each
+     * source node, a Dijkstra search over the footpaths finds the shortest duration to every target node
+     * (`targets[node] != 0`) within `cutoff` seconds, including the source itself if it is a target.
+     * Sources without footpaths get no paths. The sources are spread over `threads` threads, and the
+     * paths are returned grouped by source, in the order of `sources`.
+     * Returns 0 on success, or -1 if a source or path refers to a node that does not exist. */
+    int transitive_paths(const Network *network, const u32 *sources, u64 source_count, const u8 *targets,
+                         u32 cutoff, u32 threads, vector <Path> *paths);
+
+}
+
+#endif
@@ -0,0 +1,88 @@
+#include <algorithm>
+#include <vector>
+
+#include "network.h"
+#include "network_index.h"
+#include "types.h"
+
+#include "indexer.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Group the indices `0..keys.size()` by key as compressed sparse rows, keeping their order within each row. */
+    void group_by(const vector <u32> &keys, u32 row_count, vector <u32> &offsets, vector <u32> &values) {
+        offsets.assign(row_count + 1, 0);
+        for (u32 key : keys) { offsets[key + 1]++; }
+        for (u32 i = 0; i < row_count; i++) { offsets[i + 1] += offsets[i]; }
+
+        values.resize(keys.size());
+        vector <u32> next(offsets.begin(), offsets.end() - 1);
+        for (u32 i = 0; i < keys.size(); i++) { values[next[keys[i]]++] = i; }
+    }
+
+}
+
+namespace JourneyBench {
+
+    int build_footpath_index(const Network *network, NetworkIndex *index) {
+        u32 node_count = network->nodes.size();
+        for (const Path &path : network->paths) {
+            if (path.node_a_id >= node_count || path.node_b_id >= node_count) { return -1; }
+        }
+
+        index->footpath_offsets.assign(node_count + 1, 0);
+        for (const Path &path : network->paths) {
+            index->footpath_offsets[path.node_a_id + 1]++;
+            index->footpath_offsets[path.node_b_id + 1]++;
+        }
+        for (u32 i = 0; i < node_count; i++) { index->footpath_offsets[i + 1] += index->footpath_offsets[i]; }
+
+        index->footpaths.resize(index->footpath_offsets[node_count]);
+        vector <u32> next(index->footpath_offsets.begin(), index->footpath_offsets.end() - 1);
+        for (u32 i = 0; i < network->paths.size(); i++) {
+            const Path &path = network->paths[i];
+            index->footpaths[next[path.node_a_id]++] = {path.node_b_id, path.duration, i};
+            index->footpaths[next[path.node_b_id]++] = {path.node_a_id, path.duration, i};
+        }
+        return 0;
+    }
+
+    int build_network_index(const Network *network, NetworkIndex *index) {
+        u32 node_count = network->nodes.size(), trip_count = network->trips.size(), conn_count = network->conns.size();
+        for (const Conn &conn : network->conns) {
+            if (conn.trip_id >= trip_count || conn.from_node_id >= node_count || conn.to_node_id >= node_count) { return -1; }
+        }
+        if (build_footpath_index(network, index) != 0) { return -1; }
+
+        vector <u32> keys(conn_count);
+        for (u32 i = 0; i < conn_count; i++) { keys[i] = network->conns[i].trip_id; }
+        group_by(keys, trip_count, index->trip_offsets, index->trip_conns);
+        index->conn_positions.resize(conn_count);
+        for (u32 trip = 0; trip < trip_count; trip++) {
+            for (u32 i = index->trip_offsets[trip]; i < index->trip_offsets[trip + 1]; i++) {
+                index->conn_positions[index->trip_conns[i]] = i - index->trip_offsets[trip];
+            }
+        }
+
+        for (u32 i = 0; i < conn_count; i++) { keys[i] = network->conns[i].from_node_id; }
+        group_by(keys, node_count, index->departure_offsets, index->departures);
+
+        /* A bucket starts at the first connection that does not depart before it, the last bucket
+         * is the one of the latest departure. */
+        u32 last_departure = 0;
+        for (const Conn &conn : network->conns) { last_departure = max(last_departure, conn.departure_time); }
+        u64 bucket_count = conn_count > 0 ? (u64) last_departure / DEPARTURE_BUCKET_SIZE + 1 : 0;
+        index->departure_buckets.resize(bucket_count + 1);
+        u32 conn = 0;
+        for (u64 bucket = 0; bucket < bucket_count; bucket++) {
+            while (conn < conn_count && network->conns[conn].departure_time < bucket * DEPARTURE_BUCKET_SIZE) { conn++; }
+            index->departure_buckets[bucket] = conn;
+        }
+        index->departure_buckets[bucket_count] = conn_count;
+        return 0;
+    }
+
+}
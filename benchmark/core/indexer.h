@@ -0,0 +1,20 @@
+#ifndef INDEXER_H
+#define INDEXER_H
+
+#include "network.h"
+#include "network_index.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Build only the footpaths of the network index, for the tools that do not need the connections.
+     * Returns 0 on success, or -1 if a path refers to a node that does not exist. */
+    int build_footpath_index(const Network *network, NetworkIndex *index);
+
+    /* Build the network index (see `network_index.h`).
+     * Returns 0 on success, or -1 if a connection or path refers to a node or trip that does not exist. */
+    int build_network_index(const Network *network, NetworkIndex *index);
+
+}
+
+#endif
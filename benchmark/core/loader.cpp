@@ -0,0 +1,423 @@
+#include <zlib.h>
+
+#include <algorithm>
+#include <cstring>
+
+#include "network.h"
+#include "queries.h"
+#include "results.h"
+#include "types.h"
+
+#include "loader.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Protobuf wire types, see https://protobuf.dev/programming-guides/encoding/. */
+    enum WireType {
+        VARINT = 0, I64 = 1, LEN = 2, I32 = 5
+    };
+
+    /* Buffered sequential reader on top of a gzip compressed file. */
+    class GzipReader {
+    public:
+        u64 position = 0;  // Number of decompressed bytes consumed so far.
+
+        explicit GzipReader(const char *filepath) : file(gzopen(filepath, "rb")) {
+            if (file != nullptr) { gzbuffer(file, 1 << 20); }
+        }
+
+        ~GzipReader() {
+            if (file != nullptr) { gzclose(file); }
+        }
+
+        bool ok() const { return file != nullptr && !error; }
+
+        bool eof() { return begin == end && !fill(); }
+
+        bool read_byte(u8 &byte) {
+            if (begin == end && !fill()) { return false; }
+            byte = *begin++;
+            position++;
+            return true;
+        }
+
+        bool read(void *data, u64 count) {
+            u8 *out = static_cast<u8 *>(data);
+            while (count > 0) {
+                if (begin == end && !fill()) { return false; }
+                u64 n = min(count, static_cast<u64>(end - begin));
+                memcpy(out, begin, n);
+                out += n, begin += n, position += n, count -= n;
+            }
+            return true;
+        }
+
+        bool skip(u64 count) {
+            while (count > 0) {
+                if (begin == end && !fill()) { return false; }
+                u64 n = min(count, static_cast<u64>(end - begin));
+                begin += n, position += n, count -= n;
+            }
+            return true;
+        }
+
+        bool rewind() {
+            begin = end = buffer;
+            position = 0;
+            return gzrewind(file) == 0;
+        }
+
+    private:
+        gzFile file;
+        bool error = false;
+
+        u8 buffer[1 << 16];
+        u8 *begin = buffer;
+        u8 *end = buffer;
+
+        bool fill() {
+            int n = gzread(file, buffer, sizeof(buffer));
+            if (n < 0) { error = true; }
+            begin = buffer;
+            end = buffer + max(n, 0);
+            return n > 0;
+        }
+    };
+
+    bool read_varint(GzipReader &reader, u64 &value) {
+        value = 0;
+        for (u32 shift = 0; shift < 64; shift += 7) {
+            u8 byte;
+            if (!reader.read_byte(byte)) { return false; }
+            value |= static_cast<u64>(byte & 0x7f) << shift;
+            if (!(byte & 0x80)) { return true; }
+        }
+        return false;
+    }
+
+    bool read_u32(GzipReader &reader, u32 &value) {
+        u64 varint;
+        if (!read_varint(reader, varint)) { return false; }
+        value = static_cast<u32>(varint);
+        return true;
+    }
+
+    /* Read a repeated uint32 field, of which the tag is already read, either packed or as a single element. */
+    bool read_repeated_u32(GzipReader &reader, u32 wire_type, vector <u32> &values) {
+        u32 value;
+        u64 length;
+        if (wire_type == VARINT) {
+            if (!read_u32(reader, value)) { return false; }
+            values.push_back(value);
+            return true;
+        }
+        if (wire_type != LEN || !read_varint(reader, length)) { return false; }
+        u64 end = reader.position + length;
+        while (reader.position < end) {
+            if (!read_u32(reader, value)) { return false; }
+            values.push_back(value);
+        }
+        return reader.position == end;
+    }
+
+    bool skip_field(GzipReader &reader, u32 wire_type) {
+        u64 value;
+        switch (wire_type) {
+            case VARINT: return read_varint(reader, value);
+            case I64: return reader.skip(8);
+            case LEN: return read_varint(reader, value) && reader.skip(value);
+            case I32: return reader.skip(4);
+            default: return false;  // Groups are deprecated and never used in JourneyBench files.
+        }
+    }
+
+    /* Length of the top-level message, which simply continues until the end of the file. */
+    const u64 UNTIL_EOF = ~static_cast<u64>(0);
+
+    /* Decode a (sub)message of `length` bytes, or until the end of the file for `UNTIL_EOF`.
+     * For each field `decode(number, wire_type)` is called, which returns 1 after consuming the
+     * value, 0 if the field is unknown and should be skipped, or -1 on a decoding error. */
+    template<typename Decode>
+    bool read_message(GzipReader &reader, u64 length, Decode decode) {
+        u64 end = reader.position + length;
+        while (length == UNTIL_EOF ? !reader.eof() : reader.position < end) {
+            u64 tag;
+            if (!read_varint(reader, tag)) { return false; }
+            int status = decode(tag >> 3, tag & 7);
+            if (status < 0 || (status == 0 && !skip_field(reader, tag & 7))) { return false; }
+        }
+        return reader.ok() && (length == UNTIL_EOF || reader.position == end);
+    }
+
+    /* Count the occurrences of each length-delimited top-level field, up to field number `n`. */
+    bool count_fields(GzipReader &reader, u64 *counts, u32 n) {
+        fill_n(counts, n + 1, 0);
+        bool ok = read_message(reader, UNTIL_EOF, [&](u64 number, u32 wire_type) -> int {
+            if (wire_type == LEN && number <= n) { counts[number]++; }
+            return 0;
+        });
+        return ok && reader.rewind();
+    }
+
+    bool read_node(GzipReader &reader, u64 length, Node &node) {
+        node = {0.0, 0.0, false};
+        return read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            u64 stop;
+            if (number == 1 && wire_type == I64) { return reader.read(&node.latitude, 8) ? 1 : -1; }
+            if (number == 2 && wire_type == I64) { return reader.read(&node.longitude, 8) ? 1 : -1; }
+            if (number == 3 && wire_type == VARINT) {
+                if (!read_varint(reader, stop)) { return -1; }
+                node.stop = stop != 0;
+                return 1;
+            }
+            return 0;
+        });
+    }
+
+    bool read_conn(GzipReader &reader, u64 length, Conn &conn) {
+        conn = {0, 0, 0, 0, 0};
+        return read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            if (wire_type != VARINT) { return 0; }
+            switch (number) {
+                case 1: return read_u32(reader, conn.trip_id) ? 1 : -1;
+                case 2: return read_u32(reader, conn.from_node_id) ? 1 : -1;
+                case 3: return read_u32(reader, conn.to_node_id) ? 1 : -1;
+                case 4: return read_u32(reader, conn.departure_time) ? 1 : -1;
+                case 5: return read_u32(reader, conn.arrival_time) ? 1 : -1;
+                default: return 0;
+            }
+        });
+    }
+
+    bool read_path(GzipReader &reader, u64 length, Path &path) {
+        path = {0, 0, 0};
+        return read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            if (wire_type != VARINT) { return 0; }
+            switch (number) {
+                case 1: return read_u32(reader, path.node_a_id) ? 1 : -1;
+                case 2: return read_u32(reader, path.node_b_id) ? 1 : -1;
+                case 3: return read_u32(reader, path.duration) ? 1 : -1;
+                default: return 0;
+            }
+        });
+    }
+
+    bool read_counters(GzipReader &reader, u64 length, Counters &counters) {
+        u64 Counters::*fields[] = {&Counters::cycles, &Counters::instructions, &Counters::l1d_misses,
+                                   &Counters::llc_misses, &Counters::branch_misses, &Counters::dtlb_misses};
+        return read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            if (wire_type != VARINT || number < 1 || number > 6) { return 0; }
+            return read_varint(reader, counters.*fields[number - 1]) ? 1 : -1;
+        });
+    }
+
+    bool read_journey(GzipReader &reader, u64 length, ResultsColumns &columns) {
+        bool ok = read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            u64 part_length;
+            if (wire_type != LEN || number != 1) { return 0; }
+            if (!read_varint(reader, part_length)) { return -1; }
+
+            u32 type = CONN, id = 0;
+            bool ok = read_message(reader, part_length, [&](u64 number, u32 wire_type) -> int {
+                if (wire_type != VARINT) { return 0; }
+                if (number == 1) { return read_u32(reader, type) ? 1 : -1; }
+                if (number == 2) { return read_u32(reader, id) ? 1 : -1; }
+                return 0;
+            });
+            columns.part_types.push_back(type);
+            columns.part_ids.push_back(id);
+            return ok ? 1 : -1;
+        });
+        columns.part_offsets.push_back(columns.part_ids.size());
+        return ok;
+    }
+
+    bool read_query_result(GzipReader &reader, u64 length, ResultsColumns &columns) {
+        u32 query_id = 0;
+        u64 runtime_ns = 0;
+        Counters counters;
+        bool ok = read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            u64 field_length;
+            if (number == 1 && wire_type == VARINT) { return read_u32(reader, query_id) ? 1 : -1; }
+            if (number == 2 && wire_type == VARINT) { return read_varint(reader, runtime_ns) ? 1 : -1; }
+            if (number == 5) { return read_repeated_u32(reader, wire_type, columns.arrival_times) ? 1 : -1; }
+            if (wire_type != LEN || (number != 3 && number != 4)) { return 0; }
+            if (!read_varint(reader, field_length)) { return -1; }
+            if (number == 3) { return read_journey(reader, field_length, columns) ? 1 : -1; }
+            return read_counters(reader, field_length, counters) ? 1 : -1;
+        });
+        columns.query_ids.push_back(query_id);
+        columns.query_runtime_ns.push_back(runtime_ns);
+        columns.query_counters.push_back(counters);
+        columns.journey_offsets.push_back(columns.part_offsets.size() - 1);
+        columns.arrival_offsets.push_back(columns.arrival_times.size());
+        return ok;
+    }
+
+    void write_varint(string &out, u64 value) {
+        while (value >= 0x80) {
+            out.push_back(static_cast<char>((value & 0x7f) | 0x80));
+            value >>= 7;
+        }
+        out.push_back(static_cast<char>(value));
+    }
+
+    /* Copy the value of a field, of which the tag is already read, to `out` as it was serialized. */
+    bool copy_field(GzipReader &reader, u64 tag, string &out) {
+        u64 value;
+        size_t size;
+        write_varint(out, tag);
+        switch (tag & 7) {
+            case VARINT:
+                if (!read_varint(reader, value)) { return false; }
+                write_varint(out, value);
+                return true;
+            case I64:
+            case I32:
+                size = out.size();
+                out.resize(size + ((tag & 7) == I64 ? 8 : 4));
+                return reader.read(&out[size], out.size() - size);
+            case LEN:
+                if (!read_varint(reader, value)) { return false; }
+                write_varint(out, value);
+                /* Copied in chunks, so a corrupt length fails on the end of the file instead of allocating it. */
+                while (value > 0) {
+                    char buffer[1 << 12];
+                    u64 n = min(value, static_cast<u64>(sizeof(buffer)));
+                    if (!reader.read(buffer, n)) { return false; }
+                    out.append(buffer, n);
+                    value -= n;
+                }
+                return true;
+            default:
+                return false;
+        }
+    }
+
+    bool read_query(GzipReader &reader, u64 length, Query &query) {
+        query = {0, 0, 0};
+        return read_message(reader, length, [&](u64 number, u32 wire_type) -> int {
+            if (wire_type != VARINT) { return 0; }
+            switch (number) {
+                case 1: return read_u32(reader, query.from_node_id) ? 1 : -1;
+                case 2: return read_u32(reader, query.to_node_id) ? 1 : -1;
+                case 3: return read_u32(reader, query.departure_time) ? 1 : -1;
+                default: return 0;
+            }
+        });
+    }
+
+}
+
+namespace JourneyBench {
+
+    int load_network(const char *filepath, Network *network, u32 *end_time) {
+        GzipReader reader(filepath);
+        if (!reader.ok()) { return -1; }
+
+        /* First pass: count the elements, so each vector is allocated exactly once. */
+        u64 counts[4];
+        if (!count_fields(reader, counts, 3)) { return -1; }
+        network->nodes.reserve(network->nodes.size() + counts[1]);
+        network->conns.reserve(network->conns.size() + counts[2]);
+        network->paths.reserve(network->paths.size() + counts[3]);
+
+        /* Second pass: decode the elements directly into the network. */
+        u32 trip_count = 0;
+        *end_time = 0;
+        bool ok = read_message(reader, UNTIL_EOF, [&](u64 number, u32 wire_type) -> int {
+            u64 length;
+            if (wire_type == VARINT && number == 4) { return read_u32(reader, trip_count) ? 1 : -1; }
+            if (wire_type == VARINT && number == 5) { return read_u32(reader, *end_time) ? 1 : -1; }
+            if (wire_type != LEN || number < 1 || number > 3) { return 0; }
+            if (!read_varint(reader, length)) { return -1; }
+            if (number == 1) {
+                Node node;
+                if (!read_node(reader, length, node)) { return -1; }
+                network->nodes.push_back(node);
+            } else if (number == 2) {
+                Conn conn;
+                if (!read_conn(reader, length, conn)) { return -1; }
+                network->conns.push_back(conn);
+            } else {
+                Path path;
+                if (!read_path(reader, length, path)) { return -1; }
+                network->paths.push_back(path);
+            }
+            return 1;
+        });
+        if (!ok) { return -1; }
+
+        /* Make sure every referenced trip exists, also for files with a missing trip count. */
+        for (const Conn &conn : network->conns) {
+            trip_count = max(trip_count, conn.trip_id + 1);
+        }
+        network->trips.resize(trip_count);
+        return 0;
+    }
+
+    int load_queries(const char *filepath, Queries *queries) {
+        GzipReader reader(filepath);
+        if (!reader.ok()) { return -1; }
+
+        u64 counts[2];
+        if (!count_fields(reader, counts, 1)) { return -1; }
+        queries->queries.reserve(queries->queries.size() + counts[1]);
+
+        bool ok = read_message(reader, UNTIL_EOF, [&](u64 number, u32 wire_type) -> int {
+            u64 length;
+            if (number == 2) { return read_repeated_u32(reader, wire_type, queries->target_node_ids) ? 1 : -1; }
+            if (wire_type != LEN || number != 1) { return 0; }
+            if (!read_varint(reader, length)) { return -1; }
+            Query query;
+            if (!read_query(reader, length, query)) { return -1; }
+            queries->queries.push_back(query);
+            return 1;
+        });
+        return ok ? 0 : -1;
+    }
+
+    int load_results(const char *filepath, ResultsColumns *columns) {
+        GzipReader reader(filepath);
+        if (!reader.ok()) { return -1; }
+
+        /* The top-level fields are read one by one, so an incomplete field at the end can be dropped. */
+        while (!reader.eof()) {
+            size_t queries = columns->query_ids.size();
+            size_t journeys = columns->part_offsets.size();
+            size_t parts = columns->part_ids.size();
+            size_t arrivals = columns->arrival_times.size();
+            size_t other = columns->other.size();
+
+            u64 tag, length;
+            bool ok = read_varint(reader, tag);
+            if (ok && tag == (2 << 3 | LEN)) {
+                ok = read_varint(reader, length) && read_query_result(reader, length, *columns);
+            } else if (ok) {
+                ok = copy_field(reader, tag, columns->other);
+            }
+
+            if (!ok) {
+                columns->query_ids.resize(queries);
+                columns->query_runtime_ns.resize(queries);
+                columns->query_counters.resize(queries);
+                columns->journey_offsets.resize(queries + 1);
+                columns->part_offsets.resize(journeys);
+                columns->part_types.resize(parts);
+                columns->part_ids.resize(parts);
+                columns->arrival_offsets.resize(queries + 1);
+                columns->arrival_times.resize(arrivals);
+                columns->other.resize(other);
+                columns->truncated = true;
+                break;
+            }
+        }
+        /* Also a file that ends exactly after a record, but without the end of the gzip stream, is truncated. */
+        if (!reader.ok()) { columns->truncated = true; }
+        return 0;
+    }
+
+}
@@ -0,0 +1,44 @@
+#ifndef LOADER_H
+#define LOADER_H
+
+#include <string>
+#include <vector>
+
+#include "network.h"
+#include "queries.h"
+#include "results.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* The query results of a `.results` file in the compact encoding of a `QueryBatchResult`,
+     * with the query of each result, and all other top-level fields still serialized. */
+    struct ResultsColumns : QueryBatchResult {
+        vector <u32> query_ids;
+        string other;  // Serialized `PBResults` message without the query results.
+        bool truncated = false;  // Whether an incomplete record at the end of the file was dropped.
+
+        ResultsColumns() : QueryBatchResult(0, 0) {
+            journey_offsets.push_back(0);
+            part_offsets.push_back(0);
+            arrival_offsets.push_back(0);
+        }
+    };
+
+    /* Read a gzip compressed `.network` file (see `protobuf/network.proto`) into an empty network.
+     * Returns 0 on success, or -1 if the file could not be read or is not a valid network file. */
+    int load_network(const char *filepath, Network *network, u32 *end_time);
+
+    /* Read a gzip compressed `.queries` file (see `protobuf/queries.proto`) into an empty query set.
+     * Returns 0 on success, or -1 if the file could not be read or is not a valid queries file. */
+    int load_queries(const char *filepath, Queries *queries);
+
+    /* Read the query results of a gzip compressed `.results` file (see `protobuf/results.proto`) into
+     * empty columns. A file that ends in an incomplete record, e.g. because the benchmark crashed
+     * while it was being written, is read up to the last complete record.
+     * Returns 0 on success, or -1 if the file could not be opened. */
+    int load_results(const char *filepath, ResultsColumns *columns);
+
+}
+
+#endif
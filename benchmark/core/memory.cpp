@@ -0,0 +1,71 @@
+#include <malloc.h>
+
+#include <cstdio>
+#include <cstring>
+
+#include "results.h"
+#include "types.h"
+
+#include "memory.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Read a field in kB from `/proc/self/status`, e.g. "VmRSS", in bytes. Returns 0 if it is missing. */
+    u64 read_status(const char *field) {
+        FILE *file = fopen("/proc/self/status", "r");
+        if (file == nullptr) { return 0; }
+
+        u64 bytes = 0;
+        size_t length = strlen(field);
+        char line[256];
+        while (fgets(line, sizeof(line), file) != nullptr) {
+            unsigned long long kb;
+            if (strncmp(line, field, length) == 0 && line[length] == ':'
+                && sscanf(line + length + 1, "%llu", &kb) == 1) {
+                bytes = kb * 1024;
+                break;
+            }
+        }
+        fclose(file);
+        return bytes;
+    }
+
+    /* Reset the peak resident set size of the process to the current resident set size (Linux 4.0+). */
+    bool reset_peak_rss() {
+        FILE *file = fopen("/proc/self/clear_refs", "w");
+        if (file == nullptr) { return false; }
+        bool ok = fputs("5", file) >= 0;
+        return fclose(file) == 0 && ok;
+    }
+
+    /* Number of bytes currently allocated with malloc, over all arenas and including mmap-ed chunks. */
+    u64 heap_in_use() {
+#if defined(__GLIBC__) && (__GLIBC__ > 2 || (__GLIBC__ == 2 && __GLIBC_MINOR__ >= 33))
+        struct mallinfo2 info = mallinfo2();
+#else
+        struct mallinfo info = mallinfo();  // Wraps around above 4 GiB.
+#endif
+        return static_cast<u64>(info.uordblks) + static_cast<u64>(info.hblkhd);
+    }
+
+}
+
+namespace JourneyBench {
+
+    void MemoryMeter::start() {
+        peak_reset = reset_peak_rss();
+        rss_bytes = read_status("VmRSS");
+        heap_bytes = heap_in_use();
+    }
+
+    void MemoryMeter::stop(MemoryUsage &usage) {
+        usage.peak_rss_bytes = read_status("VmHWM");
+        usage.rss_before_bytes = rss_bytes;
+        usage.heap_growth_bytes = static_cast<i64>(heap_in_use()) - static_cast<i64>(heap_bytes);
+        usage.peak_reset = peak_reset;
+    }
+
+}
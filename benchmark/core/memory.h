@@ -0,0 +1,26 @@
+#ifndef MEMORY_H
+#define MEMORY_H
+
+#include "results.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Measures the memory footprint of a phase of the benchmark for the whole process:
+     * the peak resident set size (VmHWM, reset through `/proc/self/clear_refs`) and the
+     * growth of the bytes allocated with malloc (and thus `new`), according to `mallinfo2`. */
+    class MemoryMeter {
+    public:
+        void start();
+
+        void stop(MemoryUsage &usage);
+
+    private:
+        u64 rss_bytes = 0;
+        u64 heap_bytes = 0;
+        bool peak_reset = false;
+    };
+
+}
+
+#endif
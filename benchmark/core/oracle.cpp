@@ -0,0 +1,200 @@
+#include <algorithm>
+#include <atomic>
+#include <functional>
+#include <queue>
+#include <thread>
+#include <utility>
+
+#include "indexer.h"
+#include "network.h"
+#include "network_index.h"
+#include "queries.h"
+#include "results.h"
+#include "types.h"
+
+#include "oracle.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Compressed sparse rows: the values of row `i` are `values[offsets[i]]` up to `values[offsets[i + 1]]`. */
+    struct CSR {
+        vector <u32> offsets;
+        vector <u32> values;
+    };
+
+    /* Group the indices `0..keys.size()` by key, ordered by `less` within each row. */
+    template<typename Less>
+    CSR group_by(const vector <u32> &keys, u32 row_count, Less less) {
+        CSR csr;
+        csr.offsets.assign(row_count + 1, 0);
+        for (u32 key : keys) { csr.offsets[key + 1]++; }
+        for (u32 i = 0; i < row_count; i++) { csr.offsets[i + 1] += csr.offsets[i]; }
+
+        csr.values.resize(keys.size());
+        vector <u32> next(csr.offsets.begin(), csr.offsets.end() - 1);
+        for (u32 i = 0; i < keys.size(); i++) { csr.values[next[keys[i]]++] = i; }
+        for (u32 i = 0; i < row_count; i++) {
+            sort(csr.values.begin() + csr.offsets[i], csr.values.begin() + csr.offsets[i + 1], less);
+        }
+        return csr;
+    }
+
+    struct Graph {
+        const Network *network;
+        CSR trip_conns;  // Connections of each trip, in order of departure.
+        CSR node_conns;  // Connections departing from each node, in order of departure.
+        vector <u32> conn_positions;  // Position of each connection in its trip.
+        NetworkIndex paths;  // Only the footpaths.
+    };
+
+    /* Search from the origin of the query until its destination is settled, or until all nodes
+     * are settled for a destination of `NO_ARRIVAL`, leaving the arrival time of each node in `arrival`. */
+    void search(const Graph &graph, const Query &query, vector <u32> &arrival, vector <u32> &boarded) {
+        const Network *network = graph.network;
+        fill(arrival.begin(), arrival.end(), NO_ARRIVAL);
+        /* Position from which each trip has been followed, later connections are already relaxed. */
+        fill(boarded.begin(), boarded.end(), NO_ARRIVAL);
+
+        typedef pair<u32, u32> Label;  // (arrival time, node)
+        priority_queue <Label, vector<Label>, greater<Label>> queue;
+        arrival[query.from_node_id] = query.departure_time;
+        queue.push({query.departure_time, query.from_node_id});
+
+        while (!queue.empty()) {
+            Label label = queue.top();
+            queue.pop();
+            u32 time = label.first, node = label.second;
+            if (time > arrival[node]) { continue; }  // Outdated label.
+            if (node == query.to_node_id) { break; }
+
+            for (u32 i = graph.paths.footpath_offsets[node]; i < graph.paths.footpath_offsets[node + 1]; i++) {
+                u32 target = graph.paths.footpaths[i].node_id, target_time = time + graph.paths.footpaths[i].duration;
+                if (target_time < arrival[target]) {
+                    arrival[target] = target_time;
+                    queue.push({target_time, target});
+                }
+            }
+
+            /* Board every trip that departs after the arrival, and follow it up to where it was boarded before. */
+            auto begin = graph.node_conns.values.begin() + graph.node_conns.offsets[node];
+            auto end = graph.node_conns.values.begin() + graph.node_conns.offsets[node + 1];
+            begin = lower_bound(begin, end, time, [&](u32 conn_id, u32 time) {
+                return network->conns[conn_id].departure_time < time;
+            });
+            for (auto it = begin; it != end; it++) {
+                u32 trip = network->conns[*it].trip_id, position = graph.conn_positions[*it];
+                if (position >= boarded[trip]) { continue; }
+
+                const u32 *trip_conns = &graph.trip_conns.values[graph.trip_conns.offsets[trip]];
+                u32 trip_end = min(boarded[trip], graph.trip_conns.offsets[trip + 1] - graph.trip_conns.offsets[trip]);
+                for (u32 p = position; p < trip_end; p++) {
+                    const Conn &conn = network->conns[trip_conns[p]];
+                    if (conn.arrival_time < arrival[conn.to_node_id]) {
+                        arrival[conn.to_node_id] = conn.arrival_time;
+                        queue.push({conn.arrival_time, conn.to_node_id});
+                    }
+                }
+                boarded[trip] = position;
+            }
+        }
+    }
+
+    /* Build the graph of the network, or return -1 if a connection or path refers to a node or trip that does not exist. */
+    int build_graph(const Network *network, Graph &graph) {
+        u32 node_count = network->nodes.size(), trip_count = network->trips.size();
+        for (const Conn &conn : network->conns) {
+            if (conn.trip_id >= trip_count || conn.from_node_id >= node_count || conn.to_node_id >= node_count) { return -1; }
+        }
+        for (const Path &path : network->paths) {
+            if (path.node_a_id >= node_count || path.node_b_id >= node_count) { return -1; }
+        }
+
+        graph.network = network;
+        auto by_departure = [&](u32 a, u32 b) {
+            const Conn &conn_a = network->conns[a], &conn_b = network->conns[b];
+            return conn_a.departure_time < conn_b.departure_time || (conn_a.departure_time == conn_b.departure_time && a < b);
+        };
+        vector <u32> keys(network->conns.size());
+        for (u32 i = 0; i < keys.size(); i++) { keys[i] = network->conns[i].trip_id; }
+        graph.trip_conns = group_by(keys, trip_count, by_departure);
+        for (u32 i = 0; i < keys.size(); i++) { keys[i] = network->conns[i].from_node_id; }
+        graph.node_conns = group_by(keys, node_count, by_departure);
+
+        graph.conn_positions.resize(network->conns.size());
+        for (u32 trip = 0; trip < trip_count; trip++) {
+            for (u32 i = graph.trip_conns.offsets[trip]; i < graph.trip_conns.offsets[trip + 1]; i++) {
+                graph.conn_positions[graph.trip_conns.values[i]] = i - graph.trip_conns.offsets[trip];
+            }
+        }
+
+        build_footpath_index(network, &graph.paths);
+        return 0;
+    }
+
+    /* Run `search` for each query, spread over `threads` threads, and pass the arrival times to `collect(i, arrival)`. */
+    template<typename Collect>
+    void search_all(const Graph &graph, const vector <Query> &queries, u32 threads, Collect collect) {
+        u64 query_count = queries.size();
+        atomic<u64> next_query(0);
+        auto worker = [&]() {
+            vector <u32> arrival(graph.network->nodes.size()), boarded(graph.network->trips.size());
+            for (u64 i = next_query++; i < query_count; i = next_query++) {
+                search(graph, queries[i], arrival, boarded);
+                collect(i, arrival);
+            }
+        };
+
+        vector <thread> workers;
+        for (u32 i = 1; i < threads; i++) {
+            workers.emplace_back(worker);
+        }
+        worker();
+        for (thread &t : workers) { t.join(); }
+    }
+
+}
+
+namespace JourneyBench {
+
+    int earliest_arrivals(const Network *network, const Queries *queries, u32 threads, vector <u32> *arrivals) {
+        u32 node_count = network->nodes.size();
+        for (const Query &query : queries->queries) {
+            if (query.from_node_id >= node_count || query.to_node_id >= node_count) { return -1; }
+        }
+        Graph graph;
+        if (build_graph(network, graph) != 0) { return -1; }
+
+        arrivals->assign(queries->queries.size(), NO_ARRIVAL);
+        search_all(graph, queries->queries, threads, [&](u64 i, const vector <u32> &arrival) {
+            (*arrivals)[i] = arrival[queries->queries[i].to_node_id];
+        });
+        return 0;
+    }
+
+    int earliest_arrival_times(const Network *network, const Queries *queries, u32 threads, vector <u32> *arrival_times) {
+        u32 node_count = network->nodes.size();
+        for (const Query &query : queries->queries) {
+            if (query.from_node_id >= node_count) { return -1; }
+        }
+        vector <u32> targets;
+        if (!one_to_many_targets(network, queries, &targets)) { return -1; }
+        Graph graph;
+        if (build_graph(network, graph) != 0) { return -1; }
+
+        /* Search without a destination, so every node is settled. */
+        vector <Query> origins(queries->queries);
+        for (Query &query : origins) { query.to_node_id = NO_ARRIVAL; }
+
+        u64 target_count = targets.size();
+        arrival_times->assign(origins.size() * target_count, NO_ARRIVAL);
+        search_all(graph, origins, threads, [&](u64 i, const vector <u32> &arrival) {
+            u32 *row = &(*arrival_times)[i * target_count];
+            for (u64 j = 0; j < target_count; j++) { row[j] = arrival[targets[j]]; }
+        });
+        return 0;
+    }
+
+}
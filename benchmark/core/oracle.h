@@ -0,0 +1,30 @@
+#ifndef ORACLE_H
+#define ORACLE_H
+
+#include <vector>
+
+#include "network.h"
+#include "queries.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Compute the earliest arrival time of every query with a time-dependent Dijkstra search, as
+     * a reference for the algorithms. Footpaths can be chained, so on networks that are not
+     * transitively closed (see `tools/convertTransitive`) the arrival can be earlier than that of
+     * algorithms that only take a single footpath per transfer. Queries without a journey get
+     * `NO_ARRIVAL` (see `results.h`). The queries are spread over `threads` threads.
+     * Returns 0 on success, or -1 if a query or connection refers to a node or trip that does not exist. */
+    int earliest_arrivals(const Network *network, const Queries *queries, u32 threads, vector <u32> *arrivals);
+
+    /* Compute the earliest arrival time at each target of the queries (see `one_to_many_targets`) for every
+     * query as a one-to-many query, with a time-dependent Dijkstra search that settles all nodes. The arrival
+     * time of query `i` at target `j` is `arrival_times[i * target_count + j]`, and `NO_ARRIVAL` if the target
+     * cannot be reached. Returns 0 on success, or -1 if a query, target or connection refers to a node or trip
+     * that does not exist. */
+    int earliest_arrival_times(const Network *network, const Queries *queries, u32 threads,
+                               vector <u32> *arrival_times);
+
+}
+
+#endif
@@ -0,0 +1,119 @@
+#include <algorithm>
+#include <atomic>
+#include <thread>
+
+#include "network.h"
+#include "queries.h"
+#include "results.h"
+#include "types.h"
+
+#include "validator.h"
+
+using namespace std;
+using namespace JourneyBench;
+
+namespace {
+
+    /* Number of query results a thread validates at once. */
+    const u64 CHUNK_SIZE = 256;
+
+    /* Follow the parts of a journey from the departure of the query, see `tools/util/results.py`.
+     * `visited` holds the last journey in which each node was visited, so it never needs clearing. */
+    Verdict validate_journey(const Network *network, const Query &query,
+                             const u8 *part_types, const u32 *part_ids, u32 begin, u32 end,
+                             u64 journey, vector<u64> &visited, u32 &arrival) {
+        Verdict verdict = VALID;
+        u32 current_node = query.from_node_id;
+        u32 current_time = query.departure_time;
+        visited[current_node] = journey;
+        arrival = NO_ARRIVAL;
+
+        for (u32 i = begin; i < end; i++) {
+            u32 prev_node, next_node;
+            if (part_types[i] == CONN) {
+                if (part_ids[i] >= network->conns.size()) { return INVALID_PART; }
+                const Conn &conn = network->conns[part_ids[i]];
+                if (conn.departure_time < current_time) { return TIME_TRAVEL; }
+                prev_node = conn.from_node_id;
+                next_node = conn.to_node_id;
+                current_time = conn.arrival_time;
+            } else if (part_types[i] == PATH) {
+                if (part_ids[i] >= network->paths.size()) { return INVALID_PART; }
+                const Path &path = network->paths[part_ids[i]];
+                prev_node = current_node == path.node_a_id ? path.node_a_id : path.node_b_id;
+                next_node = current_node == path.node_a_id ? path.node_b_id : path.node_a_id;
+                current_time += path.duration;
+            } else {
+                return INVALID_PART;
+            }
+
+            if (prev_node != current_node) { return TELEPORTATION; }
+            if (visited[next_node] == journey) { verdict = LOOP; }
+            visited[next_node] = journey;
+            current_node = next_node;
+        }
+
+        if (current_node != query.to_node_id) { return NOT_REACHED; }
+        arrival = current_time;
+        return verdict;
+    }
+
+}
+
+namespace JourneyBench {
+
+    int validate(const Network *network, const Queries *queries, const u32 *query_ids, u64 query_count,
+                 const u32 *journey_offsets, u64 journey_count, const u32 *part_offsets,
+                 const u8 *part_types, const u32 *part_ids, u64 part_count,
+                 u32 threads, Validation *validation) {
+        /* Check the encoding up front, so the threads only need to check the ids of the parts. */
+        if (journey_offsets[0] != 0 || journey_offsets[query_count] != journey_count) { return -1; }
+        if (part_offsets[0] != 0 || part_offsets[journey_count] != part_count) { return -1; }
+        for (u64 i = 0; i < query_count; i++) {
+            if (query_ids[i] >= queries->queries.size()) { return -1; }
+            if (journey_offsets[i] > journey_offsets[i + 1]) { return -1; }
+        }
+        for (u64 j = 0; j < journey_count; j++) {
+            if (part_offsets[j] > part_offsets[j + 1]) { return -1; }
+        }
+        for (const Query &query : queries->queries) {
+            if (query.from_node_id >= network->nodes.size() || query.to_node_id >= network->nodes.size()) { return -1; }
+        }
+
+        validation->journey_verdicts.assign(journey_count, VALID);
+        validation->journey_arrivals.assign(journey_count, NO_ARRIVAL);
+        validation->query_verdicts.assign(query_count, NO_JOURNEY);
+        validation->query_arrivals.assign(query_count, NO_ARRIVAL);
+
+        atomic<u64> next_chunk(0);
+        auto worker = [&]() {
+            /* Journey indices are offset by one, so no node is visited by journey 0 initially. */
+            vector<u64> visited(network->nodes.size(), 0);
+            for (u64 begin = next_chunk.fetch_add(CHUNK_SIZE); begin < query_count; begin = next_chunk.fetch_add(CHUNK_SIZE)) {
+                for (u64 i = begin; i < min(begin + CHUNK_SIZE, query_count); i++) {
+                    const Query &query = queries->queries[query_ids[i]];
+                    for (u64 j = journey_offsets[i]; j < journey_offsets[i + 1]; j++) {
+                        u32 arrival;
+                        Verdict verdict = validate_journey(network, query, part_types, part_ids,
+                                                           part_offsets[j], part_offsets[j + 1], j + 1, visited, arrival);
+                        validation->journey_verdicts[j] = verdict;
+                        validation->journey_arrivals[j] = arrival;
+
+                        u8 &query_verdict = validation->query_verdicts[i];
+                        query_verdict = j == journey_offsets[i] ? static_cast<u8>(verdict) : max<u8>(query_verdict, verdict);
+                        validation->query_arrivals[i] = min(validation->query_arrivals[i], arrival);
+                    }
+                }
+            }
+        };
+
+        vector<thread> workers;
+        for (u32 i = 1; i < threads; i++) {
+            workers.emplace_back(worker);
+        }
+        worker();
+        for (thread &t : workers) { t.join(); }
+        return 0;
+    }
+
+}
@@ -0,0 +1,37 @@
+#ifndef VALIDATOR_H
+#define VALIDATOR_H
+
+#include <vector>
+
+#include "network.h"
+#include "queries.h"
+#include "results.h"
+#include "types.h"
+
+namespace JourneyBench {
+
+    /* Verdict of a journey, ordered from best to worst. Only journeys that are `VALID` or
+     * contain a `LOOP` (legal, but never optimal) reach the destination and have an arrival time. */
+    enum Verdict : u8 {
+        VALID, LOOP, TELEPORTATION, TIME_TRAVEL, NOT_REACHED, INVALID_PART, NO_JOURNEY
+    };
+
+    /* Results of validating the journeys of a batch of query results (see `QueryBatchResult`). */
+    struct Validation {
+        vector <u8> journey_verdicts;
+        vector <u32> journey_arrivals;
+        vector <u8> query_verdicts;  // Worst verdict of the journeys of the query, or `NO_JOURNEY`.
+        vector <u32> query_arrivals;  // Earliest arrival of the legal journeys of the query.
+    };
+
+    /* Validate journeys in the compact encoding of a `QueryBatchResult` against the network, where
+     * `query_ids[i]` is the query in `queries` of the `i`-th result. The results are spread over
+     * `threads` threads. Returns 0 on success, or -1 if the encoding or a query id is invalid. */
+    int validate(const Network *network, const Queries *queries, const u32 *query_ids, u64 query_count,
+                 const u32 *journey_offsets, u64 journey_count, const u32 *part_offsets,
+                 const u8 *part_types, const u32 *part_ids, u64 part_count,
+                 u32 threads, Validation *validation);
+
+}
+
+#endif
@@ -3,13 +3,42 @@ import pathlib
 from gzip import open
 from typing import Any, Dict, Optional, TypeVar
 
+import numpy as np
+from numpy.typing import ArrayLike
+
 from .benchmark_core import Network as CoreNetwork
-from .network_pb2 import PBNetwork, PBNetworkNode, PBNetworkConn, PBNetworkPath
+from .benchmark_core import node_dtype, conn_dtype, path_dtype
+from .cache import NetworkCache
+from .network_pb2 import PBNetwork
 
 
 Self = TypeVar("Self", bound="Network")
 
 
+class IdentityIdMap(dict):
+    """
+    Map of external to internal IDs in which the IDs 0 up to `count` map onto
+    themselves without being stored, other IDs are stored like in a dict.
+    """
+    count: int
+
+    def __init__(self, count: int):
+        super().__init__()
+        self.count = count
+
+    def __is_identity(self, key: Any) -> bool:
+        return isinstance(key, (int, np.integer)) and 0 <= key < self.count
+
+    def __contains__(self, key: Any) -> bool:
+        return self.__is_identity(key) or super().__contains__(key)
+
+    def __getitem__(self, key: Any) -> int:
+        return int(key) if self.__is_identity(key) else super().__getitem__(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return int(key) if self.__is_identity(key) else super().get(key, default)
+
+
 class Network(CoreNetwork):
     end: Optional[int]
 
@@ -23,32 +52,37 @@ class Network(CoreNetwork):
         self.__trip_id_map = {}
 
     def __repr__(self):
-        return (f"Network(stops: {sum([1 for n in self.nodes if n.stop])}, trips: {len(self.trips)}, "
+        return (f"Network(stops: {int(self.nodes_array()['stop'].sum())}, trips: {len(self.trips)}, "
                 f"conns: {len(self.conns)}, nodes: {len(self.nodes)}, paths: {len(self.paths)})")
 
     @classmethod
-    def read(cls, filepath: pathlib.Path) -> Self:
+    def read(cls, filepath: pathlib.Path, cache: bool = False) -> Self:
+        """
+        Read a network from a `.network` file.
+        :param filepath: path of the `.network` file
+        :param cache: use (and create, if possible) a memory-mapped sidecar cache next to the file
+        :return: the network
+        """
         network = Network()
-
-        pb_network: PBNetwork = PBNetwork()
-        with open(filepath, 'rb') as file:
-            pb_network.ParseFromString(file.read())
-
-        network.end = pb_network.end_time
-
-        for node_id, pb_node in enumerate(pb_network.nodes):
-            network.add_node(node_id,
-                             pb_node.latitude, pb_node.longitude,
-                             pb_node.stop)
-
-        for pb_conn in pb_network.conns:
-            network.add_conn(pb_conn.trip_id,
-                             pb_conn.from_node_id, pb_conn.to_node_id,
-                             pb_conn.departure_time, pb_conn.arrival_time)
-
-        for pb_path in pb_network.paths:
-            network.add_path(pb_path.node_a_id, pb_path.node_b_id,
-                             pb_path.duration)
+        network_cache = NetworkCache.open(filepath) if cache else None
+        if network_cache is not None:
+            # The columns view the mapped pages, which are only copied when the network is modified.
+            network.end = network_cache.end
+            network.view_columns(network_cache.nodes, network_cache.conns, network_cache.paths)
+            CoreNetwork.add_trips(network, network_cache.trip_count)
+        else:
+            network.end = network.load(str(filepath))
+            if cache:
+                try:
+                    NetworkCache.write(filepath, network.end, len(network.trips),
+                                       network.nodes_array(), network.conns_array(), network.paths_array())
+                except OSError:
+                    # E.g. a read-only dataset directory, the network is used uncached.
+                    pass
+
+        # Node and trip IDs in the file are used as external IDs.
+        network.__node_id_map = IdentityIdMap(len(network.nodes))
+        network.__trip_id_map = IdentityIdMap(len(network.trips))
 
         return network
 
@@ -59,25 +93,16 @@ class Network(CoreNetwork):
         pb_network.end_time = self.end
         pb_network.trip_count = len(self.trips)
 
-        for node in self.nodes:
-            pb_node: PBNetworkNode = pb_network.nodes.add()
-            pb_node.latitude = node.latitude
-            pb_node.longitude = node.longitude
-            pb_node.stop = node.stop
-
-        for conn in self.conns:
-            pb_conn: PBNetworkConn = pb_network.conns.add()
-            pb_conn.trip_id = conn.trip_id
-            pb_conn.from_node_id = conn.from_node_id
-            pb_conn.to_node_id = conn.to_node_id
-            pb_conn.departure_time = conn.departure_time
-            pb_conn.arrival_time = conn.arrival_time
-
-        for path in self.paths:
-            pb_path: PBNetworkPath = pb_network.paths.add()
-            pb_path.node_a_id = path.node_a_id
-            pb_path.node_b_id = path.node_b_id
-            pb_path.duration = path.duration
+        for latitude, longitude, stop in self.nodes_array().tolist():
+            pb_network.nodes.add(latitude=latitude, longitude=longitude, stop=stop)
+
+        for trip_id, from_node_id, to_node_id, departure_time, arrival_time in self.conns_array().tolist():
+            pb_network.conns.add(trip_id=trip_id,
+                                 from_node_id=from_node_id, to_node_id=to_node_id,
+                                 departure_time=departure_time, arrival_time=arrival_time)
+
+        for node_a_id, node_b_id, duration in self.paths_array().tolist():
+            pb_network.paths.add(node_a_id=node_a_id, node_b_id=node_b_id, duration=duration)
 
         serialized_data = pb_network.SerializeToString()
         with open(filepath, 'wb') as file:
@@ -97,6 +122,30 @@ class Network(CoreNetwork):
         self.__node_id_map[ext_node_id] = node_id
         return node_id
 
+    def add_nodes(
+            self,
+            ext_node_ids: ArrayLike,
+            latitudes: ArrayLike,
+            longitudes: ArrayLike,
+            stops: ArrayLike = False,
+    ) -> np.ndarray:
+        ext_node_ids = np.asarray(ext_node_ids)
+        if len(np.unique(ext_node_ids)) != len(ext_node_ids):
+            raise Exception("Node IDs are not unique!")
+        for ext_node_id in ext_node_ids.tolist():
+            if ext_node_id in self.__node_id_map:
+                raise Exception(f"Node with ID '{ext_node_id}' is already registered!")
+
+        nodes = np.empty(len(ext_node_ids), dtype=node_dtype)
+        nodes['latitude'] = latitudes
+        nodes['longitude'] = longitudes
+        nodes['stop'] = stops
+
+        first_node_id = super().add_nodes(nodes)
+        node_ids = np.arange(first_node_id, first_node_id + len(nodes), dtype=np.uint32)
+        self.__node_id_map.update(zip(ext_node_ids.tolist(), node_ids.tolist()))
+        return node_ids
+
     def add_stop(self, ext_stop_id: Any, latitude: float, longitude: float) -> int:
         return self.add_node(ext_stop_id, latitude, longitude, True)
 
@@ -126,6 +175,43 @@ class Network(CoreNetwork):
 
         super().add_conn(trip_id, from_node_id, to_node_id, departure_time, arrival_time)
 
+    def add_conns(
+            self,
+            ext_trip_ids: ArrayLike,
+            ext_from_node_ids: ArrayLike,
+            ext_to_node_ids: ArrayLike,
+            departure_times: ArrayLike,
+            arrival_times: ArrayLike,
+    ) -> None:
+        from_node_ids = self.__map_ids(self.__node_id_map, ext_from_node_ids, "From node")
+        to_node_ids = self.__map_ids(self.__node_id_map, ext_to_node_ids, "To node")
+        departure_times = np.asarray(departure_times, dtype=np.int64)
+        arrival_times = np.asarray(arrival_times, dtype=np.int64)
+
+        keep = departure_times >= 0
+        if self.end is not None:
+            keep &= arrival_times <= self.end
+        if (departure_times[keep] > arrival_times[keep]).any():
+            raise Exception("Departure time cannot be later than arrival time!")
+
+        # Register unseen trips in order of their first appearance.
+        ext_trip_ids = np.asarray(ext_trip_ids)[keep]
+        unique, first, inverse = np.unique(ext_trip_ids, return_index=True, return_inverse=True)
+        new = [ext_trip_id for _, ext_trip_id in sorted(zip(first.tolist(), unique.tolist()))
+               if ext_trip_id not in self.__trip_id_map]
+        first_trip_id = super().add_trips(len(new))
+        self.__trip_id_map.update(zip(new, range(first_trip_id, first_trip_id + len(new))))
+        trip_ids = np.fromiter((self.__trip_id_map[ext_trip_id] for ext_trip_id in unique.tolist()),
+                               dtype=np.uint32, count=len(unique))
+
+        conns = np.empty(len(ext_trip_ids), dtype=conn_dtype)
+        conns['trip_id'] = trip_ids[inverse.reshape(-1)]
+        conns['from_node_id'] = from_node_ids[keep]
+        conns['to_node_id'] = to_node_ids[keep]
+        conns['departure_time'] = departure_times[keep]
+        conns['arrival_time'] = arrival_times[keep]
+        super().add_conns(conns)
+
     def add_path(
             self,
             ext_node_a_id: Any,
@@ -143,3 +229,33 @@ class Network(CoreNetwork):
         node_b_id = self.__node_id_map[ext_node_b_id]
 
         super().add_path(node_a_id, node_b_id, duration)
+
+    def add_paths(
+            self,
+            ext_node_a_ids: ArrayLike,
+            ext_node_b_ids: ArrayLike,
+            durations: ArrayLike,
+    ) -> None:
+        node_a_ids = self.__map_ids(self.__node_id_map, ext_node_a_ids, "Node A")
+        node_b_ids = self.__map_ids(self.__node_id_map, ext_node_b_ids, "Node B")
+        durations = np.asarray(durations)
+        if durations.dtype == object or (durations < 0).any():
+            raise Exception("Path with negative duration cannot be registered!")
+
+        paths = np.empty(len(node_a_ids), dtype=path_dtype)
+        paths['node_a_id'] = node_a_ids
+        paths['node_b_id'] = node_b_ids
+        paths['duration'] = durations
+        super().add_paths(paths)
+
+    @staticmethod
+    def __map_ids(id_map: Dict[Any, int], ext_ids: ArrayLike, name: str) -> np.ndarray:
+        """
+        Map an array of external IDs onto internal IDs, looking up each distinct ID only once.
+        """
+        unique, inverse = np.unique(np.asarray(ext_ids), return_inverse=True)
+        ids = np.fromiter((id_map.get(ext_id, -1) for ext_id in unique.tolist()),
+                          dtype=np.int64, count=len(unique))
+        if (ids < 0).any():
+            raise Exception(f"{name} with ID '{unique[np.argmax(ids < 0)]}' is not registered!")
+        return ids[inverse.reshape(-1)].astype(np.uint32)
@@ -0,0 +1,131 @@
+import os
+import pathlib
+import struct
+
+from typing import Optional, Union
+
+import numpy as np
+
+from .benchmark_core import earliest_arrivals
+from .cache import file_hash, source_matches
+from .network import Network
+from .queries import Queries
+
+
+ORACLE_MAGIC = b'JBEAT'
+ORACLE_VERSION = 1
+
+# Header: magic, version, (size, mtime, hash) of the network and of the queries file, query count.
+HEADER = struct.Struct('<5sI' + 'QQ32s' * 2 + 'Q')
+NETWORK_MTIME_OFFSET = struct.calcsize('<5sIQ')
+QUERIES_MTIME_OFFSET = NETWORK_MTIME_OFFSET + struct.calcsize('<QQ32s')
+
+
+class ReferenceArrivals:
+    """
+    Earliest arrival time of every query in a `.queries` file on a `.network` file, computed by a
+    straightforward time-dependent Dijkstra search instead of one of the algorithms (see `oracle.h`).
+    Queries without a journey have arrival `NO_ARRIVAL`.
+
+    The arrivals are stored in a sidecar of the `.queries` file, which identifies both source files
+    by their size, modification time and content hash, so later runs can check against them for free.
+    """
+
+    @staticmethod
+    def path(queries_filepath: Union[str, pathlib.Path]) -> pathlib.Path:
+        """
+        Get the path of the sidecar with the reference arrivals of a `.queries` file.
+        """
+        return pathlib.Path(f'{queries_filepath}.eat')
+
+    @staticmethod
+    def compute(network: Network, queries: Queries, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Compute the earliest arrival time of every query, in parallel.
+        :param threads: number of threads, by default one per CPU
+        :return: uint32 arrival time per query
+        """
+        return earliest_arrivals(network, queries, threads or os.cpu_count() or 1)
+
+    @classmethod
+    def open(
+            cls,
+            network_filepath: Union[str, pathlib.Path],
+            queries_filepath: Union[str, pathlib.Path],
+    ) -> Optional[np.ndarray]:
+        """
+        Read the reference arrivals of a `.queries` file if they were computed for these network and queries files.
+        :return: uint32 arrival time per query, or None if there are no (up-to-date) reference arrivals
+        """
+        filepath = cls.path(queries_filepath)
+        try:
+            with open(filepath, 'rb') as file:
+                header = HEADER.unpack(file.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+
+        magic, version = header[:2]
+        if magic != ORACLE_MAGIC or version != ORACLE_VERSION:
+            return None
+        if (not source_matches(network_filepath, *header[2:5], filepath, NETWORK_MTIME_OFFSET) or
+                not source_matches(queries_filepath, *header[5:8], filepath, QUERIES_MTIME_OFFSET)):
+            return None
+
+        arrivals = np.fromfile(filepath, dtype=np.uint32, offset=HEADER.size)
+        return arrivals if len(arrivals) == header[8] else None
+
+    @classmethod
+    def write(
+            cls,
+            network_filepath: Union[str, pathlib.Path],
+            queries_filepath: Union[str, pathlib.Path],
+            arrivals: np.ndarray,
+    ) -> pathlib.Path:
+        """
+        Write the reference arrivals of a `.queries` file, computed on the given `.network` file.
+        Raises an OSError if the sidecar cannot be written, e.g. in a read-only directory.
+        :return: path of the written sidecar
+        """
+        filepath = cls.path(queries_filepath)
+        sources = []
+        for source_filepath in [network_filepath, queries_filepath]:
+            stat = os.stat(source_filepath)
+            sources += [stat.st_size, stat.st_mtime_ns, file_hash(source_filepath)]
+
+        tmp_filepath = filepath.with_name(f'{filepath.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_filepath, 'wb') as file:
+                file.write(HEADER.pack(ORACLE_MAGIC, ORACLE_VERSION, *sources, len(arrivals)))
+                np.asarray(arrivals, dtype=np.uint32).tofile(file)
+            os.replace(tmp_filepath, filepath)
+        except OSError:
+            tmp_filepath.unlink(missing_ok=True)
+            raise
+        return filepath
+
+    @classmethod
+    def get(
+            cls,
+            network_filepath: Union[str, pathlib.Path],
+            queries_filepath: Union[str, pathlib.Path],
+            network: Network,
+            queries: Queries,
+            threads: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Read the reference arrivals of the files, or compute (and store, if possible) them if they are missing
+        or outdated.
+        :param network: the network read from `network_filepath`
+        :param queries: the queries read from `queries_filepath`
+        :param threads: number of threads to compute the arrivals on, by default one per CPU
+        :return: uint32 arrival time per query
+        """
+        arrivals = cls.open(network_filepath, queries_filepath)
+        if arrivals is None:
+            arrivals = cls.compute(network, queries, threads)
+            try:
+                cls.write(network_filepath, queries_filepath, arrivals)
+            except OSError:
+                # E.g. a read-only dataset directory, the arrivals are used without storing them.
+                pass
+        return arrivals
@@ -1,6 +1,9 @@
 from gzip import open
 from typing import TypeVar
 
+import numpy as np
+from numpy.typing import ArrayLike
+
 from .benchmark_core import Queries as CoreQueries
 from .benchmark_core import Query as CoreQuery
 
@@ -19,23 +22,12 @@ class Query(CoreQuery):
 class Queries(CoreQueries):
 
     def __repr__(self):
-        return f"Queries(queries: {len(self.queries)})"
+        return f"Queries(queries: {len(self.queries)}, targets: {len(self.targets_array())})"
 
     @classmethod
     def read(cls, filepath: str) -> Self:
         queries = Queries()
-
-        pb_queries: PBQueries = PBQueries()
-        with open(filepath, 'rb') as file:
-            pb_queries.ParseFromString(file.read())
-
-        for pb_query in pb_queries.queries:
-            queries.add_query(
-                pb_query.from_node_id,
-                pb_query.to_node_id,
-                pb_query.departure_time,
-            )
-
+        queries.load(str(filepath))
         return queries
 
     def write(self, filepath: str) -> None:
@@ -46,9 +38,27 @@ class Queries(CoreQueries):
             pb_query.from_node_id = query.from_node_id
             pb_query.to_node_id = query.to_node_id
             pb_query.departure_time = query.departure_time
+        pb_queries.target_node_ids.extend(self.targets_array().tolist())
 
         with open(filepath, 'wb') as file:
             file.write(pb_queries.SerializeToString())
 
     def add_query(self, from_node_id: int, to_node_id: int, departure_time: int) -> int:
         return super().add_query(from_node_id, to_node_id, departure_time)
+
+    def add_targets(self, node_ids: ArrayLike) -> int:
+        """
+        Add targets for one-to-many queries, which otherwise target all stops.
+        :param node_ids: the target nodes
+        :return: the index of the first added target
+        """
+        return super().add_targets(np.asarray(node_ids, dtype=np.uint32))
+
+    def subset(self, query_ids: ArrayLike) -> Self:
+        """
+        Create a query set with the given queries, in the given order (queries may be repeated), and the same targets.
+        """
+        queries = Queries()
+        queries.add_queries(self.queries_array()[np.asarray(query_ids, dtype=np.intp)])
+        queries.add_targets(self.targets_array())
+        return queries
@@ -1,79 +1,642 @@
+import os
+
 from collections import defaultdict
+from dataclasses import dataclass
 from gzip import open
-from typing import Dict, List, TypeVar
+from typing import Dict, List, Optional, TypeVar
+
+import numpy as np
 
-from .benchmark_core import JourneyPartType, JourneyPart, Journey, QueryResult, PreprocessingResult
+from .benchmark_core import JourneyPartType, JourneyPart, Journey, QueryResult, PreprocessingResult, LoadResult, \
+    Counters, counters_dtype, COUNTER_UNAVAILABLE, MemoryUsage, ResultsColumns, Validation, Verdict, validate, \
+    earliest_arrivals, earliest_arrival_times, NO_ARRIVAL, query_dtype, Queries as CoreQueries
 
-from .results_pb2 import PBResults, PBJourneyPartType
+from .results_pb2 import PBResults, PBJourneyPartType, PBCounters, PBMemoryUsage
+from .summary import MAX_RELATIVE_MAD, RuntimeSummary, summarize
 
 
 Self = TypeVar("Self", bound="Results")
 
+# Maximum number of query results in a single record of a `.results` file.
+RECORD_SIZE = 1024
+
+COUNTER_NAMES = counters_dtype.names
+
+
+def counter_values(counters: Counters) -> Dict[str, int]:
+    """
+    Get the available hardware counters.
+    :param counters: the counters of a single measurement
+    :return: the value of each available counter by name
+    """
+    values = {name: getattr(counters, name) for name in COUNTER_NAMES}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def _read_counters(pb_counters: PBCounters) -> Counters:
+    counters = Counters()
+    for name in COUNTER_NAMES:
+        if pb_counters.HasField(name):
+            setattr(counters, name, getattr(pb_counters, name))
+    return counters
+
+
+def _write_counters(pb_result, values: Dict[str, int]) -> None:
+    # Without any available counter the field is left out completely.
+    if values:
+        pb_result.counters.CopyFrom(PBCounters(**values))
+
+
+MEMORY_FIELDS = ['peak_rss_bytes', 'rss_before_bytes', 'heap_growth_bytes', 'peak_reset']
+
+
+def _read_memory(pb_memory: PBMemoryUsage) -> MemoryUsage:
+    memory = MemoryUsage()
+    for name in MEMORY_FIELDS:
+        setattr(memory, name, getattr(pb_memory, name))
+    return memory
+
+
+def _write_memory(pb_result, memory: Optional[MemoryUsage]) -> None:
+    if memory is not None:
+        pb_result.memory.CopyFrom(PBMemoryUsage(**{name: getattr(memory, name) for name in MEMORY_FIELDS}))
+
+
+@dataclass
+class BatchResult:
+    threads: int
+    query_count: int
+    runtime_ns: int  # Wall-clock time of the whole batch.
+    memory: Optional[MemoryUsage] = None
+    window: Optional[int] = None  # Profile queries, over departures up to this many seconds after the query.
+    target_count: Optional[int] = None  # One-to-many queries, to this many targets.
+
+    @property
+    def throughput(self) -> float:
+        """
+        Number of queries answered per second.
+        """
+        return self.query_count / (self.runtime_ns / 1e9) if self.runtime_ns > 0 else 0.0
+
+
+@dataclass
+class QueryBatch:
+    """
+    Results of a batch of queries in a compact (CSR) encoding, without any per-journey objects.
+    The journeys of the `i`-th query are `journey_offsets[i]` up to `journey_offsets[i + 1]`,
+    the parts of the `j`-th journey are `part_offsets[j]` up to `part_offsets[j + 1]`.
+    One-to-many queries have an arrival time per target instead of journeys, those of the `i`-th
+    query are `arrival_times[arrival_offsets[i]]` up to `arrival_times[arrival_offsets[i + 1]]`.
+    """
+    query_ids: np.ndarray  # uint32, one per query
+    runtime_ns: np.ndarray  # uint64, one per query
+    journey_offsets: np.ndarray  # uint32, one per query plus one
+    part_offsets: np.ndarray  # uint32, one per journey plus one
+    part_types: np.ndarray  # uint8 JourneyPartType, one per part
+    part_ids: np.ndarray  # uint32, one per part
+    counters: Optional[np.ndarray] = None  # counters_dtype, one per query, unavailable is COUNTER_UNAVAILABLE
+    arrival_offsets: Optional[np.ndarray] = None  # uint64, one per query plus one
+    arrival_times: Optional[np.ndarray] = None  # uint32, NO_ARRIVAL for targets that cannot be reached
+
+    def __len__(self) -> int:
+        return len(self.query_ids)
+
+    @classmethod
+    def from_query_results(cls, query_results: Dict[int, List[QueryResult]]) -> "QueryBatch":
+        """
+        Encode query results (e.g. from `Results.query_results`) as a batch.
+        """
+        query_ids, runtime_ns, journey_offsets, part_offsets, part_types, part_ids = [], [], [0], [0], [], []
+        for query_id, results in query_results.items():
+            for query_result in results:
+                query_ids.append(query_id)
+                runtime_ns.append(query_result.runtime_ns)
+                for journey in query_result.journeys:
+                    for part in journey.parts:
+                        part_types.append(int(part.type))
+                        part_ids.append(part.id)
+                    part_offsets.append(len(part_ids))
+                journey_offsets.append(len(part_offsets) - 1)
+        return QueryBatch(
+            np.array(query_ids, dtype=np.uint32),
+            np.array(runtime_ns, dtype=np.uint64),
+            np.array(journey_offsets, dtype=np.uint32),
+            np.array(part_offsets, dtype=np.uint32),
+            np.array(part_types, dtype=np.uint8),
+            np.array(part_ids, dtype=np.uint32),
+        )
+
+    def validate(self, network, queries, threads: Optional[int] = None) -> Validation:
+        """
+        Check the journeys against the network for teleportation, time travel, loops and reaching
+        the destination, natively and in parallel, without creating any journey objects.
+        :param network: network the queries were run on
+        :param queries: queries the `query_ids` refer to
+        :param threads: number of threads, by default one per CPU
+        :return: the verdict and arrival time of each journey and each query result
+        """
+        return validate(network, queries, self.query_ids, self.journey_offsets, self.part_offsets,
+                        self.part_types, self.part_ids, threads or os.cpu_count() or 1)
+
+    def arrivals(self, i: int) -> np.ndarray:
+        """
+        Get the arrival time at each target of the `i`-th query in the batch, for one-to-many queries.
+        """
+        if self.arrival_offsets is None:
+            return np.empty(0, dtype=np.uint32)
+        return self.arrival_times[self.arrival_offsets[i]:self.arrival_offsets[i + 1]]
+
+    def arrival_mismatches(self, network, queries, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Check the results of one-to-many queries against the earliest arrival times of the oracle, which
+        settles all nodes from the origin of each query (see `earliest_arrival_times` in `oracle.h`).
+        :param network: network the queries were run on
+        :param queries: queries the `query_ids` refer to, with the targets of the one-to-many queries
+        :param threads: number of threads, by default one per CPU
+        :return: the query id of each mismatching query result
+        """
+        reference = earliest_arrival_times(network, queries.subset(self.query_ids), threads or os.cpu_count() or 1)
+        if self.arrival_offsets is None:
+            return self.query_ids[np.full(len(self), reference.shape[1] > 0)]
+
+        # Results with a different number of arrival times than targets mismatch, the others are compared per target.
+        mismatches = np.diff(self.arrival_offsets.astype(np.int64)) != reference.shape[1]
+        rows = np.flatnonzero(~mismatches)
+        arrival_times = self.arrival_times[self.arrival_offsets[rows].astype(np.int64)[:, np.newaxis]
+                                           + np.arange(reference.shape[1])]
+        mismatches[rows] = (arrival_times != reference[rows]).any(axis=1)
+        return self.query_ids[mismatches]
+
+    def departures(self, network) -> np.ndarray:
+        """
+        Get the departure time of each journey: the departure of its first connection, minus the duration
+        of the footpaths before it. Journeys without a connection have departure `NO_ARRIVAL`.
+        :param network: network the queries were run on
+        :return: uint32 departure time per journey
+        """
+        conns, paths = network.conns_array(), network.paths_array()
+        journey_count = len(self.part_offsets) - 1
+        part_journeys = np.repeat(np.arange(journey_count), np.diff(self.part_offsets.astype(np.int64)))
+        is_conn = self.part_types == int(JourneyPartType.CONN)
+        conn_parts = np.flatnonzero(is_conn & (self.part_ids < len(conns)))
+        path_parts = ~is_conn & (self.part_ids < len(paths))
+
+        # Walking time before each part, within its journey.
+        walked = np.zeros(len(self.part_ids), dtype=np.int64)
+        walked[path_parts] = paths['duration'][self.part_ids[path_parts]]
+        before = np.cumsum(walked) - walked
+        before -= before[self.part_offsets[:-1][part_journeys]]
+
+        journeys, index = np.unique(part_journeys[conn_parts], return_index=True)
+        first = conn_parts[index]
+        times = conns['departure_time'][self.part_ids[first]].astype(np.int64) - before[first]
+        departures = np.full(journey_count, NO_ARRIVAL, dtype=np.uint32)
+        departures[journeys[times >= 0]] = times[times >= 0]
+        return departures
+
+    def profile_mismatches(self, network, queries, window: int, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Check the results of profile queries against earliest arrival times of the oracle (see `ReferenceArrivals`).
+        The journeys of a query must be legal (loops are allowed, like in `Results.check_arrivals`), depart within
+        the window in order of strictly increasing departure and arrival, arrive earlier than walking directly, and
+        arrive at the earliest arrival time for their departure. The profile must also be complete: departing at
+        the start of the window, or just after one of its journeys, the earliest arrival is that of the next journey
+        or of walking directly, whichever is first. After the last journey of a profile the earliest journey may
+        depart after the window, which is not checked. An empty profile must have no journey from the start of the
+        window that arrives earlier than both walking directly and the earliest journey departing after the window.
+        A query from a node to itself must have a single empty journey.
+        :param network: network the queries were run on
+        :param queries: queries the `query_ids` refer to
+        :param window: window of the profile queries, in seconds
+        :param threads: number of threads, by default one per CPU
+        :return: the query id of each mismatching query result
+        """
+        threads = threads or os.cpu_count() or 1
+        query_array = queries.queries_array()[self.query_ids]
+        from_ids, to_ids = query_array['from_node_id'], query_array['to_node_id']
+        starts = query_array['departure_time'].astype(np.int64)
+        journey_offsets = self.journey_offsets.astype(np.int64)
+        journey_counts = np.diff(journey_offsets)
+        journey_count = len(self.part_offsets) - 1
+        journey_queries = np.repeat(np.arange(len(self)), journey_counts)
+
+        def pseudo(query_ids: np.ndarray, times: np.ndarray) -> CoreQueries:
+            array = np.zeros(len(query_ids), dtype=query_dtype)
+            array['from_node_id'], array['to_node_id'], array['departure_time'] = \
+                from_ids[query_ids], to_ids[query_ids], times
+            pseudo_queries = CoreQueries()
+            pseudo_queries.add_queries(array)
+            return pseudo_queries
+
+        def arrivals_at(query_ids: np.ndarray, times: np.ndarray) -> np.ndarray:
+            return earliest_arrivals(network, pseudo(query_ids, times), threads).astype(np.int64)
+
+        # Validate each journey as the answer to a query at its own departure time.
+        departures = self.departures(network)
+        has_departure = departures != NO_ARRIVAL
+        departures = np.where(has_departure, departures, 0).astype(np.int64)
+        at_departure = pseudo(journey_queries, departures)
+        validation = validate(network, at_departure, np.arange(journey_count, dtype=np.uint32),
+                              np.arange(journey_count + 1, dtype=np.uint32), self.part_offsets,
+                              self.part_types, self.part_ids, threads)
+        arrivals = validation.journey_arrivals.astype(np.int64)
+
+        # Walking directly takes as long at any time, so it is the earliest arrival after the last departure.
+        conns = network.conns_array()
+        late = int(conns['departure_time'].max()) + 1 if len(conns) > 0 else 0
+        walk_arrivals = arrivals_at(np.arange(len(self)), np.full(len(self), late))
+        walks = np.where(walk_arrivals != NO_ARRIVAL, walk_arrivals - late, NO_ARRIVAL)
+
+        ok = has_departure & (validation.journey_verdicts <= int(Verdict.LOOP)) \
+            & (departures >= starts[journey_queries]) & (departures <= starts[journey_queries] + window) \
+            & (arrivals < departures + walks[journey_queries]) \
+            & (earliest_arrivals(network, at_departure, threads) == arrivals)
+        same_query = journey_queries[1:] == journey_queries[:-1]
+        ok[1:] &= ~same_query | ((departures[1:] > departures[:-1]) & (arrivals[1:] > arrivals[:-1]))
+
+        # Depart at the start of the window of each nonempty profile, and just after each journey but the last.
+        has_next = np.append(same_query, False)[:journey_count]
+        nonempty = np.flatnonzero(journey_counts > 0)
+        sample_queries = np.concatenate((nonempty, journey_queries[has_next]))
+        sample_times = np.concatenate((starts[nonempty], departures[has_next] + 1))
+        next_arrivals = np.concatenate((arrivals[journey_offsets[nonempty]], arrivals[1:][same_query]))
+        expected = np.minimum(next_arrivals, sample_times + walks[sample_queries])
+
+        mismatches = np.zeros(len(self), dtype=bool)
+        mismatches[journey_queries[~ok]] = True
+        mismatches[sample_queries[arrivals_at(sample_queries, sample_times) != expected]] = True
+
+        # Depart at the start of the window of each empty profile, and just after the window.
+        empty_profiles = np.flatnonzero(journey_counts == 0)
+        after_window = arrivals_at(empty_profiles, starts[empty_profiles] + window + 1)
+        bound = np.minimum(after_window, starts[empty_profiles] + walks[empty_profiles])
+        mismatches[empty_profiles[arrivals_at(empty_profiles, starts[empty_profiles]) < bound]] = True
+
+        same_node = from_ids == to_ids
+        empty = np.append(np.diff(self.part_offsets.astype(np.int64)) == 0, False)
+        mismatches[same_node] = (journey_counts[same_node] != 1) | ~empty[journey_offsets[:-1][same_node]]
+        return self.query_ids[mismatches]
+
+    def journeys(self, i: int) -> List[Journey]:
+        """
+        Construct the journeys of the `i`-th query in the batch.
+        """
+        journeys = []
+        for j in range(self.journey_offsets[i], self.journey_offsets[i + 1]):
+            journey = Journey()
+            for k in range(self.part_offsets[j], self.part_offsets[j + 1]):
+                journey.add_part(JourneyPartType(int(self.part_types[k])), int(self.part_ids[k]))
+            journeys.append(journey)
+        return journeys
+
+
+def _add_preprocessing_result(pb_results: PBResults, preprocessing_result: PreprocessingResult) -> None:
+    pb_preprocessing_result = pb_results.preprocessing.add(runtime_ns=preprocessing_result.runtime_ns)
+    _write_counters(pb_preprocessing_result, counter_values(preprocessing_result.counters))
+    _write_memory(pb_preprocessing_result, preprocessing_result.memory)
+
+
+def _add_query_result(pb_results: PBResults, query_id: int, query_result: QueryResult) -> None:
+    pb_query_result = pb_results.queries.add(query_id=query_id, runtime_ns=query_result.runtime_ns)
+    _write_counters(pb_query_result, counter_values(query_result.counters))
+
+    for journey in query_result.journeys:
+        pb_journey = pb_query_result.journeys.add()
+        for part in journey.parts:
+            pb_part = pb_journey.parts.add()
+            pb_part.id = part.id
+            if part.type == JourneyPartType.CONN:
+                pb_part.type = PBJourneyPartType.CONN
+            else:
+                assert(part.type == JourneyPartType.PATH)
+                pb_part.type = PBJourneyPartType.PATH
+
+
+def _add_query_batch(pb_results: PBResults, query_batch: QueryBatch, start: int, stop: int) -> None:
+    journey_offsets = query_batch.journey_offsets[start:stop + 1].tolist()
+    part_offsets = query_batch.part_offsets[journey_offsets[0]:journey_offsets[-1] + 1].tolist()
+    part_slice = slice(part_offsets[0], part_offsets[-1])
+    part_types = np.where(query_batch.part_types[part_slice] == int(JourneyPartType.CONN),
+                          PBJourneyPartType.CONN, PBJourneyPartType.PATH).tolist()
+    part_ids = query_batch.part_ids[part_slice].tolist()
+    counters = query_batch.counters[start:stop].tolist() if query_batch.counters is not None else []
+
+    for i, (query_id, runtime_ns) in enumerate(zip(query_batch.query_ids[start:stop].tolist(),
+                                                  query_batch.runtime_ns[start:stop].tolist())):
+        pb_query_result = pb_results.queries.add(query_id=query_id, runtime_ns=runtime_ns,
+                                                 arrival_times=query_batch.arrivals(start + i).tolist())
+        if counters:
+            _write_counters(pb_query_result, {name: value for name, value in zip(COUNTER_NAMES, counters[i])
+                                              if value != COUNTER_UNAVAILABLE})
+        for j in range(journey_offsets[i] - journey_offsets[0], journey_offsets[i + 1] - journey_offsets[0]):
+            pb_journey = pb_query_result.journeys.add()
+            for k in range(part_offsets[j] - part_offsets[0], part_offsets[j + 1] - part_offsets[0]):
+                pb_journey.parts.add(type=part_types[k], id=part_ids[k])
+
+
+class ResultsWriter:
+    """
+    Writes a `.results` file as a sequence of records, each a serialized `PBResults` message
+    with only some of its fields. Concatenated messages are merged when they are parsed, so the
+    file is a valid `PBResults` message after every record. The gzip stream is flushed after each
+    record, so if the benchmark crashes all completed records can still be read (see `Results.read`).
+    """
+
+    def __init__(self, filepath: str):
+        self.file = open(filepath, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, pb_results: PBResults) -> None:
+        """
+        Append a record, and flush it to the file.
+        """
+        self.file.write(pb_results.SerializeToString())
+        self.file.flush()  # Z_SYNC_FLUSH, the record can be decompressed without the rest of the stream.
+
+    def write_preprocessing_results(self, preprocessing_results: List[PreprocessingResult]) -> None:
+        pb_results: PBResults = PBResults()
+        for preprocessing_result in preprocessing_results:
+            _add_preprocessing_result(pb_results, preprocessing_result)
+        self.write(pb_results)
+
+    def write_load_results(self, load_results: List[LoadResult]) -> None:
+        pb_results: PBResults = PBResults()
+        for load_result in load_results:
+            pb_load_result = pb_results.load.add(runtime_ns=load_result.runtime_ns,
+                                                 preprocessing_runtime_ns=load_result.preprocessing_runtime_ns)
+            _write_memory(pb_load_result, load_result.memory)
+        self.write(pb_results)
+
+    def write_query_results(self, query_results: Dict[int, List[QueryResult]]) -> None:
+        pb_results: PBResults = PBResults()
+        for query_id, results in query_results.items():
+            for query_result in results:
+                _add_query_result(pb_results, query_id, query_result)
+                if len(pb_results.queries) >= RECORD_SIZE:
+                    self.write(pb_results)
+                    pb_results = PBResults()
+        if pb_results.queries:
+            self.write(pb_results)
+
+    def write_query_batch(self, query_batch: QueryBatch) -> None:
+        for start in range(0, len(query_batch), RECORD_SIZE):
+            pb_results: PBResults = PBResults()
+            _add_query_batch(pb_results, query_batch, start, min(start + RECORD_SIZE, len(query_batch)))
+            self.write(pb_results)
+
+    def write_batch_results(self, batch_results: List[BatchResult]) -> None:
+        pb_results: PBResults = PBResults()
+        for batch_result in batch_results:
+            pb_batch_result = pb_results.batches.add(threads=batch_result.threads,
+                                                     query_count=batch_result.query_count,
+                                                     runtime_ns=batch_result.runtime_ns,
+                                                     window=batch_result.window,
+                                                     target_count=batch_result.target_count)
+            _write_memory(pb_batch_result, batch_result.memory)
+        self.write(pb_results)
+
+    def write_summaries(self, summaries: Dict[int, RuntimeSummary]) -> None:
+        pb_results: PBResults = PBResults()
+        for query_id, summary in sorted(summaries.items()):
+            pb_results.summaries.add(query_id=query_id, **vars(summary))
+        self.write(pb_results)
+
+    def close(self) -> None:
+        self.file.close()
+
 
 class Results:
     preprocessing_results: List[PreprocessingResult]
+    load_results: List[LoadResult]
     query_results: Dict[int, List[QueryResult]]
+    query_batches: List[QueryBatch]
+    batch_results: List[BatchResult]
+    summaries: Dict[int, RuntimeSummary]
+    truncated: bool  # Whether the file these results were read from ended in an incomplete record.
+    writer: Optional[ResultsWriter]
 
     def __init__(self):
         self.preprocessing_results = []
+        self.load_results = []
         self.query_results = defaultdict(list)
+        self.query_batches = []
+        self.batch_results = []
+        self.summaries = {}
+        self.truncated = False
+        self.writer = None
 
     @classmethod
-    def read(cls, filepath: str) -> Self:
+    def read(cls, filepath: str, columnar: bool = False) -> Self:
+        """
+        Read a `.results` file. Files that end in an incomplete record, e.g. because the benchmark
+        crashed, are read up to the last complete query result and marked as `truncated`.
+        :param filepath: path of the `.results` file
+        :param columnar: put all query results in a single `QueryBatch` of NumPy arrays,
+                         instead of creating `QueryResult` and `Journey` objects (results with
+                         arrival times of one-to-many queries are always read columnar)
+        :return: the results
+        """
         results = Results()
 
+        columns = ResultsColumns()
+        columns.load(str(filepath))
+        results.truncated = columns.truncated
+
         pb_results: PBResults = PBResults()
-        with open(filepath, 'rb') as file:
-            pb_results.ParseFromString(file.read())
+        pb_results.ParseFromString(columns.other)
 
         for pb_preprocessing_result in pb_results.preprocessing:
-            results.preprocessing_results.append(pb_preprocessing_result.runtime_ns)
-
-        for pb_query_result in pb_results.queries:
-            query_result = QueryResult(pb_query_result.runtime_ns)
-            for pb_journey in pb_query_result.journeys:
-                journey = Journey()
-                for pb_part in pb_journey.parts:
-                    if pb_part.type == PBJourneyPartType.CONN:
-                        type = JourneyPartType.CONN
-                    else:
-                        assert(pb_part.type == PBJourneyPartType.PATH)
-                        type = JourneyPartType.PATH
-                    journey.add_part(type, pb_part.id)
-                query_result.add_journey(journey)
-            results.add_query_result(pb_query_result.query_id, query_result)
+            preprocessing_result = PreprocessingResult(pb_preprocessing_result.runtime_ns)
+            if pb_preprocessing_result.HasField('counters'):
+                preprocessing_result.counters = _read_counters(pb_preprocessing_result.counters)
+            if pb_preprocessing_result.HasField('memory'):
+                preprocessing_result.memory = _read_memory(pb_preprocessing_result.memory)
+            results.add_preprocessing_result(preprocessing_result)
+
+        for pb_load_result in pb_results.load:
+            load_result = LoadResult(pb_load_result.runtime_ns, pb_load_result.preprocessing_runtime_ns)
+            if pb_load_result.HasField('memory'):
+                load_result.memory = _read_memory(pb_load_result.memory)
+            results.add_load_result(load_result)
+
+        counters = columns.query_counters
+        if len(counters) == 0 or np.all(counters.view(np.uint64) == COUNTER_UNAVAILABLE):
+            counters = None
+        query_batch = QueryBatch(
+            columns.query_ids,
+            columns.query_runtime_ns,
+            columns.journey_offsets,
+            columns.part_offsets,
+            columns.part_types,
+            columns.part_ids,
+            counters,
+            columns.arrival_offsets,
+            columns.arrival_times,
+        )
+        if columnar or len(query_batch.arrival_times) > 0:
+            results.add_query_batch(query_batch)
+        else:
+            for i, (query_id, runtime_ns) in enumerate(zip(query_batch.query_ids.tolist(),
+                                                          query_batch.runtime_ns.tolist())):
+                query_result = QueryResult(runtime_ns)
+                for journey in query_batch.journeys(i):
+                    query_result.add_journey(journey)
+                if counters is not None:
+                    for name in COUNTER_NAMES:
+                        value = int(counters[i][name])
+                        setattr(query_result.counters, name, value if value != COUNTER_UNAVAILABLE else None)
+                results.add_query_result(query_id, query_result)
+
+        for pb_batch_result in pb_results.batches:
+            memory = _read_memory(pb_batch_result.memory) if pb_batch_result.HasField('memory') else None
+            window = pb_batch_result.window if pb_batch_result.HasField('window') else None
+            target_count = pb_batch_result.target_count if pb_batch_result.HasField('target_count') else None
+            results.add_batch_result(BatchResult(pb_batch_result.threads, pb_batch_result.query_count,
+                                                 pb_batch_result.runtime_ns, memory, window, target_count))
+
+        for pb_summary in pb_results.summaries:
+            results.summaries[pb_summary.query_id] = RuntimeSummary(
+                pb_summary.samples, pb_summary.median_ns, pb_summary.p95_ns, pb_summary.p99_ns,
+                pb_summary.trimmed_mean_ns, pb_summary.mad_ns, pb_summary.ci_low_ns, pb_summary.ci_high_ns,
+                pb_summary.high_variance)
 
         return results
 
-    def write(self, filepath: str) -> None:
-        pb_results: PBResults = PBResults()
+    def write(self, filepath: str, max_relative_mad: float = MAX_RELATIVE_MAD) -> None:
+        self.summarize(max_relative_mad)
+        with ResultsWriter(filepath) as writer:
+            writer.write_preprocessing_results(self.preprocessing_results)
+            if self.load_results:
+                writer.write_load_results(self.load_results)
+            writer.write_query_results(self.query_results)
+            for query_batch in self.query_batches:
+                writer.write_query_batch(query_batch)
+            writer.write_batch_results(self.batch_results)
+            writer.write_summaries(self.summaries)
 
-        for preprocessing_result in self.preprocessing_results:
-            pb_preprocessing_result = pb_results.preprocessing.add()
-            pb_preprocessing_result.runtime_ns = preprocessing_result.runtime_ns
+    def stream(self, filepath: str) -> ResultsWriter:
+        """
+        Write every result that is added from now on directly to a `.results` file,
+        and finish the file with the summaries on `close`.
+        """
+        self.writer = ResultsWriter(filepath)
+        return self.writer
 
-        for query_id, query_results in self.query_results.items():
-            for query_result in query_results:
-                pb_query_result = pb_results.queries.add()
-                pb_query_result.query_id = query_id
-                pb_query_result.runtime_ns = query_result.runtime_ns
+    def close(self, max_relative_mad: float = MAX_RELATIVE_MAD) -> None:
+        """
+        Summarize the results, and write the summaries to and close the streamed `.results` file.
+        """
+        self.summarize(max_relative_mad)
+        if self.writer:
+            self.writer.write_summaries(self.summaries)
+            self.writer.close()
+            self.writer = None
 
-                for journey in query_result.journeys:
-                    pb_journey = pb_query_result.journeys.add()
-                    for part in journey.parts:
-                        pb_part = pb_journey.parts.add()
-                        pb_part.id = part.id
-                        if part.type == JourneyPartType.CONN:
-                            pb_part.type = PBJourneyPartType.CONN
-                        else:
-                            assert(part.type == JourneyPartType.PATH)
-                            pb_part.type = PBJourneyPartType.PATH
+    def validate(self, network, queries, threads: Optional[int] = None) -> List[Validation]:
+        """
+        Validate the journeys of all query results, see `QueryBatch.validate`.
+        :return: a validation for each query batch, followed by one for `query_results` (if any)
+        """
+        return [query_batch.validate(network, queries, threads) for query_batch in self.all_query_batches()]
+
+    def check_arrivals(self, reference: np.ndarray, network, queries, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Find the query results that do not arrive at the reference arrival time of their
+        query (see `ReferenceArrivals`), including query results without a legal journey.
+        :param reference: arrival time per query
+        :return: the query id of each mismatching query result
+        """
+        mismatches = [np.empty(0, dtype=np.uint32)]
+        for query_batch, validation in zip(self.all_query_batches(), self.validate(network, queries, threads)):
+            mismatches.append(query_batch.query_ids[validation.query_arrivals != reference[query_batch.query_ids]])
+        return np.concatenate(mismatches)
+
+    def check_profiles(self, network, queries, window: int, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Find the results of profile queries that are not the complete Pareto set of journeys
+        within the window, see `QueryBatch.profile_mismatches`.
+        :param window: window of the profile queries, in seconds
+        :return: the query id of each mismatching query result
+        """
+        mismatches = [np.empty(0, dtype=np.uint32)]
+        for query_batch in self.all_query_batches():
+            mismatches.append(query_batch.profile_mismatches(network, queries, window, threads))
+        return np.concatenate(mismatches)
+
+    def check_arrival_times(self, network, queries, threads: Optional[int] = None) -> np.ndarray:
+        """
+        Find the results of one-to-many queries that do not arrive at the earliest arrival
+        time at each target, see `QueryBatch.arrival_mismatches`.
+        :return: the query id of each mismatching query result
+        """
+        mismatches = [np.empty(0, dtype=np.uint32)]
+        for query_batch in self.all_query_batches():
+            mismatches.append(query_batch.arrival_mismatches(network, queries, threads))
+        return np.concatenate(mismatches)
+
+    def all_query_batches(self) -> List[QueryBatch]:
+        """
+        Get the query batches, followed by `query_results` encoded as a batch (if any).
+        """
+        query_batches = list(self.query_batches)
+        if self.query_results:
+            query_batches.append(QueryBatch.from_query_results(self.query_results))
+        return query_batches
 
-        with open(filepath, 'wb') as file:
-            file.write(pb_results.SerializeToString())
+    def query_runtimes(self) -> Dict[int, np.ndarray]:
+        """
+        Collect the runtimes (in nanoseconds) of all repetitions of each query.
+        """
+        query_ids = [np.repeat(np.fromiter(self.query_results.keys(), dtype=np.uint32, count=len(self.query_results)),
+                               [len(query_results) for query_results in self.query_results.values()])]
+        runtimes = [np.fromiter((query_result.runtime_ns for query_results in self.query_results.values()
+                                 for query_result in query_results), dtype=np.uint64)]
+        for query_batch in self.query_batches:
+            query_ids.append(query_batch.query_ids)
+            runtimes.append(query_batch.runtime_ns)
+        query_ids, runtimes = np.concatenate(query_ids), np.concatenate(runtimes)
+
+        order = np.argsort(query_ids, kind='stable')
+        unique, starts = np.unique(query_ids[order], return_index=True)
+        return dict(zip(unique.tolist(), np.split(runtimes[order], starts[1:])))
+
+    def summarize(self, max_relative_mad: float = MAX_RELATIVE_MAD) -> Dict[int, RuntimeSummary]:
+        """
+        Summarize the runtimes of each query over all of its repetitions. Without any measured
+        runtimes (e.g. results that only contain summaries) the existing summaries are kept.
+        """
+        query_runtimes = self.query_runtimes()
+        if query_runtimes:
+            self.summaries = {query_id: summarize(runtimes, max_relative_mad=max_relative_mad)
+                              for query_id, runtimes in query_runtimes.items()}
+        return self.summaries
 
     def add_preprocessing_result(self, preprocessing_result: PreprocessingResult):
         self.preprocessing_results.append(preprocessing_result)
+        if self.writer:
+            self.writer.write_preprocessing_results([preprocessing_result])
+
+    def add_load_result(self, load_result: LoadResult):
+        self.load_results.append(load_result)
+        if self.writer:
+            self.writer.write_load_results([load_result])
 
     def add_query_result(self, query_id: int, query_result: QueryResult):
         self.query_results[query_id].append(query_result)
+        if self.writer:
+            self.writer.write_query_results({query_id: [query_result]})
+
+    def add_query_batch(self, query_batch: QueryBatch):
+        self.query_batches.append(query_batch)
+        if self.writer:
+            self.writer.write_query_batch(query_batch)
+
+    def add_batch_result(self, batch_result: BatchResult):
+        self.batch_results.append(batch_result)
+        if self.writer:
+            self.writer.write_batch_results([batch_result])
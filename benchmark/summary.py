@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+# Fraction of the samples that is removed from each end for the trimmed mean.
+TRIM = 0.1
+# Confidence level and number of resamples for the bootstrap confidence interval of the median.
+CONFIDENCE = 0.95
+RESAMPLES = 1000
+# Queries with a median absolute deviation above this fraction of the median are flagged.
+MAX_RELATIVE_MAD = 0.1
+
+
+@dataclass
+class RuntimeSummary:
+    samples: int
+    median_ns: float
+    p95_ns: float
+    p99_ns: float
+    trimmed_mean_ns: float
+    mad_ns: float  # Median absolute deviation.
+    ci_low_ns: float  # Bootstrap confidence interval of the median.
+    ci_high_ns: float
+    high_variance: bool
+
+
+def trimmed_mean(samples: ArrayLike, trim: float = TRIM) -> float:
+    """
+    Calculate the mean without the lowest and highest samples. At least one sample is
+    removed from each end when there are more than two samples.
+    :param samples: the samples
+    :param trim: fraction of the samples to remove from each end
+    :return: the trimmed mean
+    """
+    samples = np.sort(np.asarray(samples, dtype=np.float64))
+    k = max(1, int(len(samples) * trim)) if len(samples) > 2 else 0
+    return float(samples[k:len(samples) - k].mean())
+
+
+def summarize(
+        runtimes_ns: ArrayLike,
+        trim: float = TRIM,
+        confidence: float = CONFIDENCE,
+        resamples: int = RESAMPLES,
+        max_relative_mad: float = MAX_RELATIVE_MAD,
+        seed: int = 0,
+) -> RuntimeSummary:
+    """
+    Summarize the repeated runtime measurements of a single query (or preprocessing run).
+    :param runtimes_ns: runtimes in nanoseconds, at least one
+    :param trim: fraction of the samples to remove from each end for the trimmed mean
+    :param confidence: confidence level of the interval of the median
+    :param resamples: number of bootstrap resamples
+    :param max_relative_mad: flag the summary as high variance above this MAD to median ratio
+    :param seed: seed for the bootstrap, so summaries are reproducible
+    :return: the summary
+    """
+    samples = np.asarray(runtimes_ns, dtype=np.float64)
+    if len(samples) == 0:
+        raise Exception("Cannot summarize an empty set of runtimes!")
+
+    median = float(np.median(samples))
+    mad = float(np.median(np.abs(samples - median)))
+
+    rng = np.random.default_rng(seed)
+    medians = np.median(rng.choice(samples, size=(resamples, len(samples))), axis=1)
+    ci_low, ci_high = np.quantile(medians, [(1 - confidence) / 2, (1 + confidence) / 2])
+
+    return RuntimeSummary(
+        samples=len(samples),
+        median_ns=median,
+        p95_ns=float(np.quantile(samples, 0.95)),
+        p99_ns=float(np.quantile(samples, 0.99)),
+        trimmed_mean_ns=trimmed_mean(samples, trim),
+        mad_ns=mad,
+        ci_low_ns=float(ci_low),
+        ci_high_ns=float(ci_high),
+        high_variance=median > 0 and mad / median > max_relative_mad,
+    )
@@ -2,8 +2,10 @@
 #define ALGOBASE_H
 
 #include <cstdint>
+#include <cstdio>
 
 #include "network.h"
+#include "network_index.h"
 #include "results.h"
 #include "types.h"
 
@@ -11,9 +13,52 @@ namespace JourneyBench {
 
     class AlgorithmBase {
     public:
-        virtual int init(Network *network) = 0;
+        /* Prepare the algorithm for the network. The index is built by the benchmark (see `network_index.h`)
+         * and stays valid for the lifetime of this instance and its clones. */
+        virtual int init(Network *network, const NetworkIndex *index) = 0;
 
         virtual vector <Journey> *query(u32 from_node_id, u32 to_node_id, u32 departure_time) = 0;
+
+        /* Optional: answer a profile query, with the Pareto-optimal journeys that depart from `from_node_id` from
+         * `min_departure_time` up to and including `max_departure_time`: no other journey, not even one departing
+         * after `max_departure_time`, departs later and arrives at least as early. A journey departs with its first
+         * connection, minus the footpaths before it. Journeys that only walk, or arrive no earlier than walking
+         * directly, are left out. The journeys are in order of departure. Returns nullptr if profile queries are
+         * not supported. */
+        virtual vector <Journey> *profile_query(u32 /* from_node_id */, u32 /* to_node_id */,
+                                                u32 /* min_departure_time */, u32 /* max_departure_time */) {
+            return nullptr;
+        }
+
+        /* Optional: answer a one-to-many query, with the earliest arrival time at each of the `target_count`
+         * nodes `target_node_ids` when departing from `from_node_id` at `departure_time`, written to
+         * `arrival_times`. Targets that cannot be reached get `NO_ARRIVAL`, the origin itself gets the departure
+         * time. Returns 0 on success, or -1 if one-to-many queries are not supported. */
+        virtual int arrival_times(u32 /* from_node_id */, u32 /* departure_time */, const u32 * /* target_node_ids */,
+                                  u32 /* target_count */, u32 * /* arrival_times */) { return -1; }
+
+        /* Optional: whether `profile_query` and `arrival_times` are supported, so the benchmark can refuse
+         * profile or one-to-many queries before running them. Implementations of the hooks return true. */
+        virtual bool supports_profile_queries() { return false; }
+        virtual bool supports_one_to_many_queries() { return false; }
+
+        /* Optional: create an instance that shares the (read-only) preprocessed data of this
+         * instance, but has its own query state, so both instances can answer queries concurrently.
+         * Only called after `init`. Returns nullptr if concurrent queries are not supported. */
+        virtual AlgorithmBase *clone() { return nullptr; }
+
+        /* Optional: write the preprocessed data to a snapshot file, so later runs on the same network can
+         * restore it with `load_state` instead of calling `init`. Only called after `init`.
+         * Returns 0 on success, or -1 if snapshots are not supported. */
+        virtual int save_state(FILE * /* file */) { return -1; }
+
+        /* Optional: restore the preprocessed data written by `save_state`, instead of calling `init`. The data
+         * is memory-mapped read-only, starts at a page boundary, and stays valid for the lifetime of this
+         * instance and its clones. Returns 0 on success, or -1 if the data cannot be restored. */
+        virtual int load_state(Network * /* network */, const NetworkIndex * /* index */,
+                               const u8 * /* data */, u64 /* size */) { return -1; }
+
+        virtual ~AlgorithmBase() {}
     };
 
 }
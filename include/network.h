@@ -1,6 +1,7 @@
 #ifndef NETWORK_H
 #define NETWORK_H
 
+#include <algorithm>
 #include <vector>
 
 #include "types.h"
@@ -29,12 +30,100 @@ namespace JourneyBench {
         u32 duration;
     };
 
+    /* Elements of a network, either stored in a vector or viewed in memory that is owned elsewhere, e.g. the pages
+     * of a memory-mapped network cache. Reading is the same for both; the first modification of a view copies it
+     * into the vector. */
+    template<typename T>
+    class Column {
+    public:
+        Column() = default;
+
+        Column(const Column &other) { *this = other; }
+
+        Column &operator=(const Column &other) {
+            storage = other.storage;
+            viewing = other.viewing;
+            items = other.items;
+            count = other.count;
+            sync();
+            return *this;
+        }
+
+        size_t size() const { return count; }
+
+        bool empty() const { return count == 0; }
+
+        const T *data() const { return items; }
+
+        const T *begin() const { return items; }
+
+        const T *end() const { return items + count; }
+
+        const T &operator[](size_t i) const { return items[i]; }
+
+        /* Whether the elements are viewed in memory that is owned elsewhere. */
+        bool is_view() const { return viewing; }
+
+        /* View `count` elements at `data`, which must stay valid and unchanged while they are viewed. */
+        void view(const T *data, size_t size) {
+            vector<T>().swap(storage);
+            viewing = true;
+            items = data;
+            count = size;
+        }
+
+        void reserve(size_t capacity) {
+            detach();
+            storage.reserve(capacity);
+            sync();
+        }
+
+        void push_back(const T &item) {
+            detach();
+            storage.push_back(item);
+            sync();
+        }
+
+        void append(const T *first, size_t size) {
+            detach();
+            storage.insert(storage.end(), first, first + size);
+            sync();
+        }
+
+        template<typename Less>
+        void sort(Less less) {
+            if (is_sorted(begin(), end(), less)) { return; }
+            detach();
+            std::sort(storage.begin(), storage.end(), less);
+            sync();
+        }
+
+    private:
+        vector <T> storage;
+        bool viewing = false;
+        const T *items = nullptr;
+        size_t count = 0;
+
+        void detach() {
+            if (!viewing) { return; }
+            storage.assign(items, items + count);
+            viewing = false;
+            sync();
+        }
+
+        void sync() {
+            if (viewing) { return; }
+            items = storage.data();
+            count = storage.size();
+        }
+    };
+
     struct Network {
-        vector <Node> nodes;
-        vector <Conn> conns;
-        vector <Path> paths;
+        Column <Node> nodes;
+        Column <Conn> conns;
+        Column <Path> paths;
 
-        vector <vector<Conn *>> trips;  // NOTE: SHOULD NEVER BE USED TO GET CONNECTIONS
+        vector <vector<Conn *>> trips;  // NOTE: ONLY THE SIZE IS SET, SEE `NetworkIndex` FOR THE CONNECTIONS OF A TRIP
     };
 }
 
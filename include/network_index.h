@@ -0,0 +1,57 @@
+#ifndef NETWORK_INDEX_H
+#define NETWORK_INDEX_H
+
+#include <algorithm>
+#include <vector>
+
+#include "network.h"
+#include "types.h"
+
+using namespace std;
+
+namespace JourneyBench {
+
+    /* Width in seconds of the departure time buckets of the network index. */
+    const u32 DEPARTURE_BUCKET_SIZE = 60;
+
+    /* A footpath as seen from one of its nodes. */
+    struct Footpath {
+        u32 node_id;  // Node at the other end.
+        u32 duration;
+        u32 path_id;  // Index in the network paths.
+    };
+
+    /* Read-only indexes of a network, which the benchmark builds once per network and shares with all
+     * algorithm instances. Each group is stored as compressed sparse rows: the values of row `i` are
+     * `values[offsets[i]]` up to `values[offsets[i + 1]]`. Connections within a row are in network order,
+     * which is the order of departure, as networks are sorted when they are written. */
+    struct NetworkIndex {
+        /* Footpaths of each node, in both directions. */
+        vector <u32> footpath_offsets;
+        vector <Footpath> footpaths;
+
+        /* Connections of each trip, and the position of each connection within its trip. */
+        vector <u32> trip_offsets;
+        vector <u32> trip_conns;
+        vector <u32> conn_positions;
+
+        /* Connections departing from each node. */
+        vector <u32> departure_offsets;
+        vector <u32> departures;
+
+        /* First connection departing at or after the start of each bucket of `DEPARTURE_BUCKET_SIZE` seconds,
+         * followed by the number of connections. */
+        vector <u32> departure_buckets;
+
+        /* Get the first connection that departs at or after `time`, or the number of connections if there is none. */
+        u32 first_departure(const Column <Conn> &conns, u32 time) const {
+            u64 bucket = time / DEPARTURE_BUCKET_SIZE;
+            if (bucket + 1 >= departure_buckets.size()) { return departure_buckets.back(); }
+            return lower_bound(conns.begin() + departure_buckets[bucket], conns.begin() + departure_buckets[bucket + 1],
+                               time, [](const Conn &conn, u32 time) { return conn.departure_time < time; }) - conns.begin();
+        }
+    };
+
+}
+
+#endif
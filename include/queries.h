@@ -3,6 +3,7 @@
 
 #include <vector>
 
+#include "network.h"
 #include "types.h"
 
 using namespace std;
@@ -17,8 +18,26 @@ namespace JourneyBench {
 
     struct Queries {
         vector <Query> queries;
+        vector <u32> target_node_ids;  // Targets of one-to-many queries, all stops if empty.
     };
 
+    /* Get the targets of one-to-many queries: the targets of the queries, or all stops of the network if the
+     * queries have none. Returns false if a target does not exist. */
+    inline bool one_to_many_targets(const Network *network, const Queries *queries, vector <u32> *targets) {
+        targets->clear();
+        if (queries->target_node_ids.empty()) {
+            for (u32 i = 0; i < network->nodes.size(); i++) {
+                if (network->nodes[i].stop) { targets->push_back(i); }
+            }
+            return true;
+        }
+        for (u32 target : queries->target_node_ids) {
+            if (target >= network->nodes.size()) { return false; }
+        }
+        *targets = queries->target_node_ids;
+        return true;
+    }
+
 }
 
 #endif
@@ -9,6 +9,9 @@ using namespace std;
 
 namespace JourneyBench {
 
+    /* Arrival time of a journey, query or target without a (legal) journey to the destination. */
+    const u32 NO_ARRIVAL = ~static_cast<u32>(0);
+
     enum JourneyPartType {
         CONN, PATH
     };
@@ -39,9 +42,31 @@ namespace JourneyBench {
         }
     };
 
+    /* Value of a hardware counter that was not measured or could not be measured. */
+    const u64 COUNTER_UNAVAILABLE = ~static_cast<u64>(0);
+
+    /* Hardware performance counters (user space only) of a single measurement. */
+    struct Counters {
+        u64 cycles = COUNTER_UNAVAILABLE;
+        u64 instructions = COUNTER_UNAVAILABLE;
+        u64 l1d_misses = COUNTER_UNAVAILABLE;
+        u64 llc_misses = COUNTER_UNAVAILABLE;
+        u64 branch_misses = COUNTER_UNAVAILABLE;
+        u64 dtlb_misses = COUNTER_UNAVAILABLE;
+    };
+
+    /* Memory footprint of the process during a phase of the benchmark. */
+    struct MemoryUsage {
+        u64 peak_rss_bytes = 0;  // Peak resident set size, since the start of the process if not `peak_reset`.
+        u64 rss_before_bytes = 0;  // Resident set size at the start of the phase.
+        i64 heap_growth_bytes = 0;  // Bytes still allocated at the end of the phase minus at the start.
+        bool peak_reset = false;
+    };
+
     struct QueryResult {
         u64 runtime_ns;
         vector <Journey> journeys;
+        Counters counters;
 
         QueryResult(u64 runtime_ns)
                 : runtime_ns(runtime_ns) {}
@@ -49,13 +74,50 @@ namespace JourneyBench {
                 : runtime_ns(runtime_ns), journeys(journeys) {}
     };
 
+    /* Results of a batch of queries, with the journeys in a compact (CSR) encoding:
+     * the journeys of query `i` are `journey_offsets[i]` up to `journey_offsets[i + 1]`,
+     * the parts of journey `j` are `part_offsets[j]` up to `part_offsets[j + 1]`.
+     * One-to-many queries have no journeys, but an arrival time per target instead:
+     * `arrival_times[arrival_offsets[i]]` up to `arrival_times[arrival_offsets[i + 1]]`. */
+    struct QueryBatchResult {
+        u64 runtime_ns;  // Wall-clock time of the whole batch.
+        u32 threads;
+
+        vector <u64> query_runtime_ns;
+        vector <Counters> query_counters;  // Empty if the counters are disabled.
+        vector <u32> journey_offsets;
+        vector <u32> part_offsets;
+        vector <u8> part_types;
+        vector <u32> part_ids;
+        vector <u64> arrival_offsets;
+        vector <u32> arrival_times;
+
+        /* Memory of the query phase, including the instances of the other threads and the returned journeys. */
+        MemoryUsage memory;
+
+        QueryBatchResult(u64 runtime_ns, u32 threads)
+                : runtime_ns(runtime_ns), threads(threads) {}
+    };
+
     struct PreprocessingResult {
         u64 runtime_ns;
+        Counters counters;
+        MemoryUsage memory;
 
         PreprocessingResult(u64 runtime_ns)
                 : runtime_ns(runtime_ns) {}
     };
 
+    /* Restoring the preprocessed state of an algorithm from a snapshot, instead of preprocessing. */
+    struct LoadResult {
+        u64 runtime_ns;
+        u64 preprocessing_runtime_ns;  // Preprocessing of the run that created the snapshot.
+        MemoryUsage memory;
+
+        LoadResult(u64 runtime_ns, u64 preprocessing_runtime_ns)
+                : runtime_ns(runtime_ns), preprocessing_runtime_ns(preprocessing_runtime_ns) {}
+    };
+
 }
 
 #endif
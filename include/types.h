@@ -3,9 +3,12 @@
 
 #include <stdint.h>
 
+typedef uint8_t u8;
 typedef uint32_t u32;
 typedef uint64_t u64;
 
+typedef int64_t i64;
+
 typedef double f64;
 
 #endif
@@ -0,0 +1,154 @@
+import os
+import pathlib
+import struct
+
+from dataclasses import dataclass, fields
+from typing import Dict, Optional, Tuple, TypeVar, Union
+
+import numpy as np
+
+from benchmark.cache import page_align
+
+
+Self = TypeVar("Self", bound="Graph")
+
+CHECKPOINT_MAGIC = b'JBGRAPH'
+CHECKPOINT_VERSION = 1
+
+# Header: magic, version, stage name and number of arrays, followed by an entry per array.
+HEADER = struct.Struct('<7sI16sI')
+# Array entry: name, NumPy type string, number of rows and columns (0 for a 1-D array), and offset.
+ENTRY = struct.Struct('<32s8sQQQ')
+
+
+def write_checkpoint(filepath: Union[str, pathlib.Path], stage: str, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write named arrays to an uncompressed checkpoint file, which can be memory-mapped by `read_checkpoint`.
+    The checkpoint is written to a temporary file first, so an interrupted stage never leaves a partial checkpoint.
+    :param filepath: path of the checkpoint
+    :param stage: name of the stage that created the checkpoint
+    :param arrays: 1-D or 2-D arrays by name
+    """
+    filepath = pathlib.Path(filepath)
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    entries, offset = [], page_align(HEADER.size + ENTRY.size * len(arrays))
+    for name, array in arrays.items():
+        rows, cols = (array.shape[0], 0) if array.ndim == 1 else array.shape
+        entries.append(ENTRY.pack(name.encode(), array.dtype.str.encode(), rows, cols, offset))
+        offset = page_align(offset + array.nbytes)
+
+    tmp_filepath = filepath.with_name(f'{filepath.name}.{os.getpid()}.tmp')
+    with open(tmp_filepath, 'wb') as file:
+        file.write(HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, stage.encode(), len(arrays)))
+        for entry in entries:
+            file.write(entry)
+        for entry, array in zip(entries, arrays.values()):
+            file.seek(ENTRY.unpack(entry)[-1])
+            array.tofile(file)
+        file.truncate(page_align(file.tell()))
+    os.replace(tmp_filepath, filepath)
+
+
+def read_checkpoint(filepath: Union[str, pathlib.Path], stage: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-map the arrays of a checkpoint file written by `write_checkpoint`.
+    :param filepath: path of the checkpoint
+    :param stage: name of the stage that must have created the checkpoint
+    :return: read-only arrays by name
+    """
+    with open(filepath, 'rb') as file:
+        magic, version, checkpoint_stage, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+            raise Exception(f"File '{filepath}' is not a valid checkpoint!")
+        if checkpoint_stage.rstrip(b'\0').decode() != stage:
+            raise Exception(f"Checkpoint '{filepath}' was not created by the '{stage}' stage!")
+        entries = [ENTRY.unpack(file.read(ENTRY.size)) for _ in range(count)]
+
+    arrays = {}
+    for name, dtype, rows, cols, offset in entries:
+        shape = (rows,) if cols == 0 else (rows, cols)
+        dtype = np.dtype(dtype.rstrip(b'\0').decode())
+        if rows == 0:
+            arrays[name.rstrip(b'\0').decode()] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name.rstrip(b'\0').decode()] = np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return arrays
+
+
+@dataclass
+class Graph:
+    """
+    Undirected graph with integer node ids `0..n-1`, in arrays. Nodes have an external id: the OSM node
+    reference, or the network node id for the nodes that must be kept (stops). Each edge is stored once.
+    """
+    ids: np.ndarray  # int64 external id, per node
+    latitudes: np.ndarray  # float64, per node
+    longitudes: np.ndarray  # float64, per node
+    keep: np.ndarray  # bool, per node
+
+    sources: np.ndarray  # int64 node id, per edge
+    targets: np.ndarray  # int64 node id, per edge
+    distances: Optional[np.ndarray] = None  # float64 meters, per edge (see `geo.osm.set_distance`)
+
+    def __repr__(self) -> str:
+        return f'Graph(nodes: {len(self.ids)}, edges: {len(self.sources)}, keep: {int(self.keep.sum())})'
+
+    @classmethod
+    def from_nodes(cls, ids: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray, keep: bool = False) -> Self:
+        """
+        Create a graph without edges.
+        """
+        return Graph(
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(latitudes, dtype=np.float64),
+            np.asarray(longitudes, dtype=np.float64),
+            np.full(len(ids), keep, dtype=bool),
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+        )
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Build the adjacency of each node in compressed sparse row form: the neighbours of node `v`
+        are `neighbours[offsets[v]:offsets[v + 1]]`, connected by the edges `edges[offsets[v]:offsets[v + 1]]`.
+        :return: the offsets, neighbours and edges
+        """
+        ends = np.concatenate((self.sources, self.targets))
+        others = np.concatenate((self.targets, self.sources))
+        order = np.argsort(ends, kind='stable')
+        offsets = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=len(self.ids)), out=offsets[1:])
+        return offsets, others[order], order % max(1, len(self.sources))
+
+    def degrees(self) -> np.ndarray:
+        """
+        Get the number of edges of each node.
+        """
+        return np.bincount(self.sources, minlength=len(self.ids)) + np.bincount(self.targets, minlength=len(self.ids))
+
+    def subgraph(self, nodes: np.ndarray) -> Self:
+        """
+        Create the subgraph induced by a node mask, with the node ids renumbered in order.
+        :param nodes: boolean mask of the nodes to keep
+        :return: the subgraph
+        """
+        new_ids = np.cumsum(nodes) - 1
+        edges = nodes[self.sources] & nodes[self.targets]
+        return Graph(
+            self.ids[nodes], self.latitudes[nodes], self.longitudes[nodes], self.keep[nodes],
+            new_ids[self.sources[edges]], new_ids[self.targets[edges]],
+            self.distances[edges] if self.distances is not None else None,
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Get the arrays of the graph by name, e.g. to write them to a checkpoint.
+        """
+        return {field.name: getattr(self, field.name) for field in fields(self) if getattr(self, field.name) is not None}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> Self:
+        """
+        Create a graph from its arrays by name, e.g. as read from a checkpoint.
+        """
+        return Graph(**{field.name: arrays.get(field.name) for field in fields(cls)})
@@ -1,109 +1,225 @@
 #!/usr/bin/env python3
 import pathlib
+from array import array
 
 import osmium
-import networkx as nx
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from scipy.spatial import KDTree
-from shapely.geometry import Polygon, Point
+from shapely.geometry import Polygon
 
+from .graph import Graph
+from .poly import PolygonClip
 from .util import haversine, latlon2xyz
 
 
+# Number of edges that are buffered before they are clipped against the polygon.
+CHUNK_SIZE = 1 << 16
+
+
 class OSMHandler(osmium.SimpleHandler):
-    def __init__(self, graph, poly):
+    def __init__(self, poly):
         super(OSMHandler, self).__init__()
-        self.graph = graph
-        self.poly = poly
+        self.clip = PolygonClip(poly) if poly is not None else None
+        # Both end points of each edge, as OSM node reference and location.
+        self.refs = array('q')
+        self.lats = array('d')
+        self.lons = array('d')
+        # Edges that are not clipped against the polygon yet, in the same layout.
+        self.chunk_refs = array('q')
+        self.chunk_lats = array('d')
+        self.chunk_lons = array('d')
 
     def way(self, w):
         if 'highway' not in w.tags:
             return
 
+        refs, lats, lons = (self.chunk_refs, self.chunk_lats, self.chunk_lons) if self.clip is not None \
+            else (self.refs, self.lats, self.lons)
         for i in range(len(w.nodes) - 1):
             a = w.nodes[i]
             b = w.nodes[i + 1]
-
-            # Skip if edge is (partly) outside the target polygon.
-            if self.poly is not None and (
-                not self.poly.contains(Point(a.location.lon, a.location.lat)) or
-                not self.poly.contains(Point(b.location.lon, b.location.lat))
-            ):
-                continue
-
-            self.graph.add_node(f'__OSM_{a.ref}', lat=a.location.lat, lon=a.location.lon)
-            self.graph.add_node(f'__OSM_{b.ref}', lat=b.location.lat, lon=b.location.lon)
-            self.graph.add_edge(f'__OSM_{a.ref}', f'__OSM_{b.ref}')
-
-
-def osm2nx(osm_file_path: pathlib.Path, poly: Polygon = None) -> nx.Graph:
+            refs.extend((a.ref, b.ref))
+            lats.extend((a.location.lat, b.location.lat))
+            lons.extend((a.location.lon, b.location.lon))
+
+        if len(self.chunk_refs) >= 2 * CHUNK_SIZE:
+            self.clip_chunk()
+
+    def clip_chunk(self) -> None:
+        """
+        Clip the buffered edges against the polygon, and only keep the edges that are inside it,
+        so at most `CHUNK_SIZE` edges outside the polygon are in memory at a time.
+        """
+        inside = self.clip.contains(np.frombuffer(self.chunk_lats, dtype=np.float64),
+                                    np.frombuffer(self.chunk_lons, dtype=np.float64))
+        keep = np.repeat(inside.reshape(-1, 2).all(axis=1), 2)
+        for edges, chunk, dtype in [(self.refs, self.chunk_refs, np.int64),
+                                    (self.lats, self.chunk_lats, np.float64),
+                                    (self.lons, self.chunk_lons, np.float64)]:
+            edges.frombytes(np.frombuffer(chunk, dtype=dtype)[keep].tobytes())
+        self.chunk_refs, self.chunk_lats, self.chunk_lons = array('q'), array('d'), array('d')
+
+    def graph(self) -> Graph:
+        """
+        Build the graph of the edges that were read, with a node per distinct OSM node reference.
+        Edges that are (partly) outside the target polygon are skipped.
+        """
+        if self.clip is not None:
+            self.clip_chunk()
+
+        refs = np.frombuffer(self.refs, dtype=np.int64)
+        ids, first, inverse = np.unique(refs, return_index=True, return_inverse=True)
+        latitudes = np.frombuffer(self.lats, dtype=np.float64)[first]
+        longitudes = np.frombuffer(self.lons, dtype=np.float64)[first]
+        ends = inverse.reshape(-1, 2)
+
+        # Store each edge once, without self-loops.
+        ends = np.sort(ends, axis=1)
+        ends = np.unique(ends[ends[:, 0] != ends[:, 1]], axis=0).reshape(-1, 2)
+
+        return Graph(
+            ids, latitudes, longitudes,
+            np.zeros(len(ids), dtype=bool),
+            ends[:, 0].astype(np.int64), ends[:, 1].astype(np.int64),
+        )
+
+
+def osm2graph(osm_file_path: pathlib.Path, poly: Polygon = None) -> Graph:
     """
-    Read a `.osm.pbf` file and convert it into a NetworkX Graph.
+    Read a `.osm.pbf` file and convert it into an array-backed graph.
     :param osm_file_path: path to `.osm.pbf` file
     :param poly: polygon to use during parsing, nodes outside polygon are ignored
-    :return: the resulting NetworkX Graph
+    :return: the resulting graph, with OSM node references as external ids
     """
-    graph = nx.Graph()
-    handler = OSMHandler(graph, poly)
+    handler = OSMHandler(poly)
     handler.apply_file(osm_file_path, locations=True)
-    return graph
+    return handler.graph()
 
 
-def combine(G: nx.Graph, G_other: nx.Graph) -> None:
+def combine(G: Graph, G_other: Graph) -> Graph:
     """
-    Combine two NetworkX graphs and connect all nodes from the second graph to
-    the nearest node in the first graph, result are stored in the first graph.
-    :param G: first NetworkX Graph, result is stored here
-    :param G_other: second NetworkX Graph
+    Combine two graphs and connect all nodes from the second graph to
+    the nearest node in the first graph, the nodes of the second graph are kept.
+    :param G: first graph
+    :param G_other: second graph
+    :return: the combined graph
     """
-    nodes = [(v, latlon2xyz(data['lat'], data['lon'])) for v, data in G.nodes(data=True)]
-    tree = KDTree(list(zip(*nodes))[1])
+    tree = KDTree(np.column_stack(latlon2xyz(G.latitudes, G.longitudes)))
+    _, nearest = tree.query(np.column_stack(latlon2xyz(G_other.latitudes, G_other.longitudes)))
 
-    for u, data in G_other.nodes(data=True):
-        v = nodes[tree.query(latlon2xyz(data['lat'], data['lon']))[1]][0]
-        G.add_node(u, lat=data['lat'], lon=data['lon'], keep=True)
-        G.add_edge(u, v)
+    count = len(G.ids)
+    return Graph(
+        np.concatenate((G.ids, G_other.ids)),
+        np.concatenate((G.latitudes, G_other.latitudes)),
+        np.concatenate((G.longitudes, G_other.longitudes)),
+        np.concatenate((G.keep, np.ones(len(G_other.ids), dtype=bool))),
+        np.concatenate((G.sources, G_other.sources + count, count + np.arange(len(G_other.ids)))),
+        np.concatenate((G.targets, G_other.targets + count, np.asarray(nearest, dtype=np.int64))),
+    )
 
 
-def set_distance(G: nx.Graph) -> None:
+def set_distance(G: Graph) -> None:
     """
     Set the distance in meters for each edge.
-    :param G: a NetworkX Graph with attributes 'lat' and 'lon' on nodes
+    :param G: a graph
     """
-    for u, v in G.edges(data=False):
-        G.edges[u, v]['distance'] = haversine(G.nodes[u]['lat'], G.nodes[u]['lon'],
-                                              G.nodes[v]['lat'], G.nodes[v]['lon'])
+    G.distances = haversine(G.latitudes[G.sources], G.longitudes[G.sources],
+                            G.latitudes[G.targets], G.longitudes[G.targets])
 
 
-def contract(G: nx.Graph, rounds=100) -> nx.Graph:
+def _prune(G: Graph) -> Graph:
+    """
+    Remove the dead-end trees of the graph: repeatedly remove the nodes that are not kept with a degree
+    less than 2, with a worklist, so each node and edge is visited a constant number of times.
+    """
+    offsets, neighbours, _ = G.csr()
+    offsets, neighbours, keep = offsets.tolist(), neighbours.tolist(), G.keep.tolist()
+    degrees = G.degrees().tolist()
+    removed = bytearray(len(degrees))
+
+    stack = [v for v, d in enumerate(degrees) if d < 2 and not keep[v]]
+    while stack:
+        v = stack.pop()
+        if removed[v]:
+            continue
+        removed[v] = 1
+        for u in neighbours[offsets[v]:offsets[v + 1]]:
+            if not removed[u]:
+                degrees[u] -= 1
+                if degrees[u] < 2 and not keep[u]:
+                    stack.append(u)
+
+    return G.subgraph(np.frombuffer(removed, dtype=np.uint8) == 0)
+
+
+def _contract_chains(G: Graph) -> Graph:
+    """
+    Replace each maximal chain of nodes that are not kept with a degree of 2 by a single edge with the summed
+    distance, walking each chain once. Self-loops are removed, and of parallel edges only the shortest is kept.
+    """
+    offsets, neighbours, edges = G.csr()
+    anchors = G.keep | (G.degrees() != 2)
+    offsets, neighbours, edges = offsets.tolist(), neighbours.tolist(), edges.tolist()
+    is_anchor, distances = anchors.tolist(), G.distances.tolist()
+    visited = bytearray(len(distances))
+
+    sources, targets, chain_distances = array('q'), array('q'), array('d')
+    for a in np.flatnonzero(anchors).tolist():
+        for k in range(offsets[a], offsets[a + 1]):
+            e = edges[k]
+            if visited[e]:
+                continue
+            visited[e] = 1
+            distance, v = distances[e], neighbours[k]
+            while not is_anchor[v]:
+                # Continue over the other edge of the chain node.
+                k = offsets[v]
+                if edges[k] == e:
+                    k += 1
+                e, v = edges[k], neighbours[k]
+                visited[e] = 1
+                distance += distances[e]
+            sources.append(a)
+            targets.append(v)
+            chain_distances.append(distance)
+
+    # Renumber the anchors, and keep the shortest edge between each pair of distinct anchors.
+    new_ids = np.cumsum(anchors) - 1
+    ends = np.sort(np.column_stack((new_ids[np.frombuffer(sources, dtype=np.int64)],
+                                    new_ids[np.frombuffer(targets, dtype=np.int64)])), axis=1)
+    chain_distances = np.frombuffer(chain_distances, dtype=np.float64)
+    loops = ends[:, 0] == ends[:, 1]
+    ends, chain_distances = ends[~loops], chain_distances[~loops]
+    order = np.lexsort((chain_distances, ends[:, 1], ends[:, 0]))
+    ends, chain_distances = ends[order], chain_distances[order]
+    first = np.ones(len(ends), dtype=bool)
+    first[1:] = (ends[1:] != ends[:-1]).any(axis=1)
+
+    return Graph(
+        G.ids[anchors], G.latitudes[anchors], G.longitudes[anchors], G.keep[anchors],
+        ends[first, 0], ends[first, 1], chain_distances[first],
+    )
+
+
+def contract(G: Graph) -> Graph:
     """
     Create a simplified version of the graph with no edges with a degree less
     than 3 and all connected components containing at least one transit stops.
-    :param G: NetworkX Graph with attribute 'distance' on edges
-    :param rounds: maximum number of iterations to run the contraction
+    :param G: graph with distances on the edges
     :return: a contracted copy of the original graph
     """
     # Remove all connected components without a transit stop.
-    cc = list(nx.connected_components(G))
-    fc = [c for c in cc if any([G.nodes[v].get('keep') is True for v in c])]
-    G = G.subgraph(v for c in fc for v in c).copy()
-
-    # Remove all nodes with a degree less than 3.
-    for i in range(rounds):
-        count = 0
-        for v, keep in list(G.nodes(data='keep', default=False)):
-            d = G.degree[v]
-            if keep or d >= 3:
-                continue
-            if d == 2:  # not a dead-end, must replace edges
-                (_, u), (_, w) = G.edges(v)
-                if G.has_edge(u, w):  # edge already exists, just update distance
-                    G.edges[u, w]['distance'] = min(G.edges[u, w]['distance'],
-                                                    G.edges[u, v]['distance'] + G.edges[v, w]['distance'])
-                else:
-                    G.add_edge(u, w, distance=G.edges[u, v]['distance'] + G.edges[v, w]['distance'])
-            G.remove_node(v)
-            count += 1
-        if count == 0:
-            break
-
-    return G
+    adjacency = coo_matrix((np.ones(len(G.sources), dtype=np.int8), (G.sources, G.targets)),
+                           shape=(len(G.ids), len(G.ids)))
+    _, labels = connected_components(adjacency, directed=False)
+    G = G.subgraph(np.isin(labels, labels[G.keep]))
+
+    # Remove the dead-end trees and contract the chains. Removing a self-loop or parallel edge can
+    # lower the degree of a node, in which case another (usually much smaller) pass is needed.
+    while True:
+        G = _contract_chains(_prune(G))
+        degrees = G.degrees()
+        if not (~G.keep & (degrees < 3)).any():
+            return G
@@ -1,4 +1,35 @@
+import numpy as np
+import shapely
+from numpy.typing import ArrayLike
 from shapely.geometry import MultiPolygon
+from shapely.geometry.base import BaseGeometry
+
+
+class PolygonClip:
+    """
+    Point-in-polygon tests for arrays of coordinates, against a prepared polygon. Points outside
+    the bounding box of the polygon are rejected without testing them against the polygon itself.
+    """
+    poly: BaseGeometry
+
+    def __init__(self, poly: BaseGeometry):
+        self.poly = poly
+        shapely.prepare(self.poly)
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = poly.bounds
+
+    def contains(self, latitudes: ArrayLike, longitudes: ArrayLike) -> np.ndarray:
+        """
+        Test which points are inside the polygon.
+        :param latitudes: latitudes of the points (in degrees)
+        :param longitudes: longitudes of the points (in degrees)
+        :return: boolean mask of the points inside the polygon
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        inside = (longitudes >= self.min_lon) & (longitudes <= self.max_lon) \
+            & (latitudes >= self.min_lat) & (latitudes <= self.max_lat)
+        inside[inside] = shapely.contains_xy(self.poly, longitudes[inside], latitudes[inside])
+        return inside
 
 
 def parse_poly(lines):
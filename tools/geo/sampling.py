@@ -0,0 +1,171 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from benchmark import Network, Queries
+from benchmark.benchmark_core import query_dtype
+
+from .util import WSG84_R, haversine, latlon2xyz
+
+
+# Width of the departure time bins, as in `experiment/histoNetwork`.
+INTERVAL = 15 * 60
+# Number of consecutive sampling rounds without any stop pair in the distance band before giving up.
+MAX_EMPTY_ROUNDS = 100
+# Number of origins of which the candidate destinations are listed at a time, which bounds the memory use.
+BATCH_SIZE = 1024
+
+
+def allocate(n: int, weights: np.ndarray) -> np.ndarray:
+    """
+    Divide `n` samples over strata proportional to their weights, rounding with the largest remainders.
+    :param n: number of samples
+    :param weights: non-negative weight per stratum, with a positive sum
+    :return: number of samples per stratum, which sum to `n`
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    expected = n * weights / weights.sum()
+    counts = np.floor(expected).astype(np.int64)
+    remainders = np.argsort(counts - expected, kind='stable')[:n - counts.sum()]
+    counts[remainders] += 1
+    return counts
+
+
+class QueryGenerator:
+    """
+    Generate random queries between the stops of a network, without rejection sampling of arbitrary stop pairs.
+    The stop pair of a query is uniformly random over the pairs within a distance band: the origin is
+    weighted by its number of stops in the band, which are found with a KD-tree over the stop positions,
+    and the destination is a uniformly random one of these.
+    """
+    stops: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    tree: KDTree
+    departure_times: np.ndarray
+    rng: np.random.Generator
+
+    def __init__(self, network: Network, seed: Optional[int] = None):
+        """
+        :param network: the network
+        :param seed: seed of the random number generator, so query sets are reproducible
+        """
+        nodes = network.nodes_array()
+        self.stops = np.flatnonzero(nodes['stop'])
+        if len(self.stops) < 2:
+            raise Exception("Network has less than two stops!")
+        self.latitudes = nodes['latitude'][self.stops]
+        self.longitudes = nodes['longitude'][self.stops]
+        self.tree = KDTree(np.column_stack(latlon2xyz(self.latitudes, self.longitudes)))
+        self.departure_times = network.conns_array()['departure_time']
+        self.rng = np.random.default_rng(seed)
+
+    def stop_pairs(self, n: int, min_dist: float, max_dist: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample pairs of distinct stops with a great-circle distance within a band, uniformly over all such pairs.
+        :param n: number of pairs
+        :param min_dist: minimum distance in meters (inclusive)
+        :param max_dist: maximum distance in meters (inclusive)
+        :return: the node ids of the origins and destinations
+        """
+        # Straight-line (chord) distances through the sphere of the band, with a margin for rounding, so the
+        # stops between the inner and outer radius include all stops in the band.
+        outer_radius = self.__chord(max_dist) * (1 + 1e-9) + 1e-6
+        inner_radius = self.__chord(min_dist) * (1 - 1e-9) - 1e-6
+
+        # Weigh each origin by its number of candidate destinations, so each candidate pair is equally likely.
+        weights = self.tree.query_ball_point(self.tree.data, outer_radius, return_length=True)
+        if inner_radius > 0:
+            weights -= self.tree.query_ball_point(self.tree.data, inner_radius, return_length=True)
+        if weights.sum() == 0:
+            raise Exception(f"No stop pairs found between {min_dist} and {max_dist} meters!")
+        probabilities = weights / weights.sum()
+
+        # Candidates that are not actually in the band (or the origin itself) are rejected.
+        origins, destinations, empty_rounds = [], [], 0
+        while len(origins) < n:
+            sampled = self.rng.choice(len(self.stops), size=n - len(origins), p=probabilities)
+            found = len(origins)
+            for batch in np.array_split(sampled, -(-len(sampled) // BATCH_SIZE)):
+                points = self.tree.data[batch]
+                outer = self.tree.query_ball_point(points, outer_radius)
+                inner = self.tree.query_ball_point(points, inner_radius) if inner_radius > 0 else [[]] * len(batch)
+                for origin, outer_candidates, inner_candidates in zip(batch.tolist(), outer, inner):
+                    candidates = np.setdiff1d(outer_candidates, inner_candidates)
+                    destination = int(candidates[self.rng.integers(len(candidates))])
+                    distance = haversine(self.latitudes[origin], self.longitudes[origin],
+                                         self.latitudes[destination], self.longitudes[destination])
+                    if destination != origin and min_dist <= distance <= max_dist:
+                        origins.append(origin)
+                        destinations.append(destination)
+
+            empty_rounds = empty_rounds + 1 if len(origins) == found else 0
+            if empty_rounds >= MAX_EMPTY_ROUNDS:
+                raise Exception(f"No stop pairs found between {min_dist} and {max_dist} meters!")
+
+        return self.stops[origins], self.stops[destinations]
+
+    @staticmethod
+    def __chord(distance: float) -> float:
+        """
+        Get the straight-line distance through the sphere between points at a great-circle distance.
+        """
+        return 2 * WSG84_R * np.sin(min(distance, np.pi * WSG84_R) / (2 * WSG84_R))
+
+    def departures(self, n: int, max_departure_time: int, weighted: bool = False, interval: int = INTERVAL) -> np.ndarray:
+        """
+        Sample departure times from 0 up to and including the maximum departure time, stratified over bins.
+        :param n: number of departure times
+        :param max_departure_time: maximum departure time
+        :param weighted: divide the samples over the bins proportional to the number of connections
+                         that depart in them, instead of proportional to the bin width
+        :param interval: width of the bins in seconds
+        :return: the departure times, in random order
+        """
+        starts = np.arange(0, max_departure_time + 1, interval)
+        ends = np.minimum(starts + interval, max_departure_time + 1)
+        if weighted:
+            departures = self.departure_times[self.departure_times <= max_departure_time]
+            weights = np.bincount(departures // interval, minlength=len(starts))
+            if weights.sum() == 0:
+                raise Exception(f"No connections depart before {max_departure_time}!")
+        else:
+            weights = ends - starts
+
+        counts = allocate(n, weights)
+        times = self.rng.integers(np.repeat(starts, counts), np.repeat(ends, counts))
+        return self.rng.permutation(times)
+
+    def generate(
+            self,
+            n: int,
+            min_dist: float, max_dist: float,
+            max_departure_time: int,
+            distance_bins: int = 1,
+            weighted: bool = False,
+            interval: int = INTERVAL,
+    ) -> Queries:
+        """
+        Generate queries, with the same number of queries in each distance bin (up to rounding).
+        :param n: number of queries
+        :param min_dist: minimum distance between the stops in meters
+        :param max_dist: maximum distance between the stops in meters
+        :param max_departure_time: maximum departure time
+        :param distance_bins: number of bins of equal width between the minimum and maximum distance
+        :param weighted: weight the departure time bins by the number of departing connections
+        :param interval: width of the departure time bins in seconds
+        :return: the queries, in random order
+        """
+        edges = np.linspace(min_dist, max_dist, distance_bins + 1)
+        pairs = [self.stop_pairs(int(count), edges[i], edges[i + 1])
+                 for i, count in enumerate(allocate(n, np.ones(distance_bins)))]
+
+        query_array = np.empty(n, dtype=query_dtype)
+        query_array['from_node_id'] = np.concatenate([origins for origins, _ in pairs])
+        query_array['to_node_id'] = np.concatenate([destinations for _, destinations in pairs])
+        query_array['departure_time'] = self.departures(n, max_departure_time, weighted, interval)
+
+        queries = Queries()
+        queries.add_queries(query_array[self.rng.permutation(n)])
+        return queries
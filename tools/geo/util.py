@@ -1,18 +1,21 @@
 import math
 from typing import Tuple
 
+import numpy as np
+from numpy.typing import ArrayLike
+
 
 # Mean radius of Earth in meters derived from the World Geodetic System (WGS 84).
 WSG84_R = 6371008.77142
 
 
 def haversine(
-        lat_a: float, lon_a: float,
-        lat_b: float, lon_b: float,
+        lat_a: ArrayLike, lon_a: ArrayLike,
+        lat_b: ArrayLike, lon_b: ArrayLike,
         r: float = WSG84_R,
-) -> float:
+) -> ArrayLike:
     """
-    Calculate the great-circle distance between two points on a sphere.
+    Calculate the great-circle distance between two points on a sphere, or element-wise for arrays of points.
 
     :param lat_a: latitude of first point (in degrees)
     :param lon_a: longitude of first point (in degrees)
@@ -22,24 +25,24 @@ def haversine(
 
     :return: distance between first and second points (in meters)
     """
-    ta = math.radians(lat_a)
-    la = math.radians(lon_a)
-    tb = math.radians(lat_b)
-    lb = math.radians(lon_b)
-    return 2 * r * math.asin(min(1, math.sqrt(
-        math.sin((tb - ta) / 2) ** 2 + math.cos(ta) * math.cos(tb) * math.sin((lb - la) / 2) ** 2
+    ta = np.radians(lat_a)
+    la = np.radians(lon_a)
+    tb = np.radians(lat_b)
+    lb = np.radians(lon_b)
+    return 2 * r * np.arcsin(np.minimum(1, np.sqrt(
+        np.sin((tb - ta) / 2) ** 2 + np.cos(ta) * np.cos(tb) * np.sin((lb - la) / 2) ** 2
     )))
 
 
 def latlon2xyz(
-        lat: float, lon: float,
+        lat: ArrayLike, lon: ArrayLike,
         r: float = WSG84_R,
-) -> Tuple[float, float, float]:
-    lat = math.radians(lat)
-    lon = math.radians(lon)
-    x = r * math.cos(lat) * math.cos(lon)
-    y = r * math.cos(lat) * math.sin(lon)
-    z = r * math.sin(lat)
+) -> Tuple[ArrayLike, ArrayLike, ArrayLike]:
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    x = r * np.cos(lat) * np.cos(lon)
+    y = r * np.cos(lat) * np.sin(lon)
+    z = r * np.sin(lat)
     return x, y, z
 
 
@@ -1 +1,2 @@
+from .arrays import GTFSArrays
 from .gtfs import GTFS
@@ -0,0 +1,264 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from csv import DictReader, reader
+from dataclasses import dataclass, field
+from io import TextIOWrapper
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypeVar
+from zipfile import ZipFile
+
+import numpy as np
+
+from .calendar import ServiceCalendar
+from .model import Pathway, Service, ServiceChange
+from .model.common import RecordExistsException, get_id
+
+
+Self = TypeVar("Self", bound="GTFSArrays")
+
+# Time of a stop time without an arrival or departure time.
+NO_TIME = -1
+
+
+def str2seconds(delta: str) -> int:
+    """
+    Convert a GTFS time (which can be past 24:00:00) to seconds since midnight,
+    or NO_TIME if the time is empty.
+    """
+    delta = delta.strip()
+    if not delta:
+        return NO_TIME
+    digits = delta.split(':')
+    if len(digits) != 3 or not all(digit.isdigit() for digit in digits):
+        raise Exception(f"Invalid GTFS time '{delta}'!")
+    return int(digits[0]) * 3600 + int(digits[1]) * 60 + int(digits[2])
+
+
+def offset_times(times: np.ndarray, offset: int) -> np.ndarray:
+    """
+    Add an offset (e.g. the start of a service day) to times since midnight, keeping NO_TIME.
+    :param times: seconds since midnight, or NO_TIME
+    :param offset: offset in seconds
+    :return: int64 offset times, or NO_TIME
+    """
+    times = np.asarray(times, dtype=np.int64)
+    return np.where(times == NO_TIME, NO_TIME, times + offset)
+
+
+def _csv_columns(gtfs_file: ZipFile, filename: str, columns: List[str]) -> Iterator[Tuple[str, ...]]:
+    """
+    Read the given columns of each row of a file in the GTFS feed, without creating a dict per row.
+    """
+    with gtfs_file.open(filename, 'r') as data_file:
+        rows = reader(TextIOWrapper(data_file, encoding='utf-8-sig'))
+        header = [name.strip() for name in next(rows)]
+        getter = itemgetter(*[header.index(column) for column in columns])
+        for row in rows:
+            if row:
+                yield getter(row)
+
+
+def _csv_records(gtfs_file: ZipFile, filename: str, cls, context: Dict[str, Any]) -> List[Any]:
+    """
+    Read the (small) files of the GTFS feed as records, like `GTFS.read`.
+    """
+    if filename not in gtfs_file.namelist():
+        return []
+    records = []
+    with gtfs_file.open(filename, 'r') as data_file:
+        for row in DictReader(TextIOWrapper(data_file, encoding='utf-8-sig')):
+            try:
+                records.append(cls(row, context))
+            except RecordExistsException:
+                continue
+    return records
+
+
+@dataclass
+class _Feed:
+    """
+    A single parsed GTFS feed, with ids that are local to the feed.
+    """
+    stop_ids: List[str]
+    service_ids: List[str]
+    trip_ids: List[str]
+    pathway_ids: List[str]
+
+    stop_lats: np.ndarray
+    stop_lons: np.ndarray
+    trip_services: np.ndarray
+    stop_time_trips: np.ndarray
+    stop_time_sequences: np.ndarray
+    stop_time_stops: np.ndarray
+    stop_time_arrivals: np.ndarray
+    stop_time_departures: np.ndarray
+
+    services: List[Service]
+    service_changes: List[ServiceChange]
+    pathways: List[Pathway]
+
+
+def _parse_feed(path: Path) -> _Feed:
+    context: Dict[str, Any] = {}
+    stop_id_map = context.setdefault('stop_id_map', {})
+    service_id_map = context.setdefault('service_id_map', {})
+    trip_id_map = context.setdefault('trip_id_map', {})
+
+    with ZipFile(path, 'r') as gtfs_file:
+        names = gtfs_file.namelist()
+
+        stop_lats, stop_lons = array('d'), array('d')
+        if 'stops.txt' in names:
+            for stop_id, stop_lat, stop_lon in _csv_columns(gtfs_file, 'stops.txt', ['stop_id', 'stop_lat', 'stop_lon']):
+                if stop_id in stop_id_map:
+                    continue
+                get_id(stop_id_map, stop_id)
+                stop_lats.append(float(stop_lat))
+                stop_lons.append(float(stop_lon))
+
+        services = _csv_records(gtfs_file, 'calendar.txt', Service, context)
+        service_changes = _csv_records(gtfs_file, 'calendar_dates.txt', ServiceChange, context)
+
+        trip_services = array('i')
+        if 'trips.txt' in names:
+            for trip_id, service_id in _csv_columns(gtfs_file, 'trips.txt', ['trip_id', 'service_id']):
+                trip = get_id(trip_id_map, trip_id)
+                if trip == len(trip_services):
+                    trip_services.append(service_id_map[service_id])
+                else:
+                    trip_services[trip] = service_id_map[service_id]
+
+        # Most times occur many times in a feed, so each distinct time string is only parsed once.
+        time_cache: Dict[str, int] = {}
+        trips, sequences, stops, arrivals, departures = array('i'), array('i'), array('i'), array('i'), array('i')
+        if 'stop_times.txt' in names:
+            columns = ['trip_id', 'stop_sequence', 'stop_id', 'arrival_time', 'departure_time']
+            for trip_id, stop_sequence, stop_id, arrival_time, departure_time in _csv_columns(gtfs_file, 'stop_times.txt', columns):
+                trips.append(trip_id_map[trip_id])
+                sequences.append(int(stop_sequence))
+                stops.append(stop_id_map[stop_id])
+                arrival = time_cache.get(arrival_time)
+                if arrival is None:
+                    arrival = time_cache.setdefault(arrival_time, str2seconds(arrival_time))
+                departure = time_cache.get(departure_time)
+                if departure is None:
+                    departure = time_cache.setdefault(departure_time, str2seconds(departure_time))
+                arrivals.append(arrival)
+                departures.append(departure)
+
+        pathways = _csv_records(gtfs_file, 'pathways.txt', Pathway, context)
+
+    return _Feed(
+        list(stop_id_map), list(service_id_map), list(trip_id_map), list(context.get('pathway_id_map', {})),
+        np.frombuffer(stop_lats, dtype=np.float64), np.frombuffer(stop_lons, dtype=np.float64),
+        np.frombuffer(trip_services, dtype=np.int32),
+        np.frombuffer(trips, dtype=np.int32), np.frombuffer(sequences, dtype=np.int32),
+        np.frombuffer(stops, dtype=np.int32),
+        np.frombuffer(arrivals, dtype=np.int32), np.frombuffer(departures, dtype=np.int32),
+        services, service_changes, pathways,
+    )
+
+
+def _map_ids(id_map: Dict[str, int], local_ids: List[str]) -> np.ndarray:
+    # Translate the local ids of a feed to global ids, registering the new ones.
+    return np.array([get_id(id_map, local_id) for local_id in local_ids], dtype=np.int32)
+
+
+@dataclass
+class GTFSArrays:
+    """
+    Columnar version of `GTFS`: the stops, trips and stop times are typed arrays instead of records,
+    with dense ids from the same `*_id_map` context. The (small) calendar and pathway files are records.
+    """
+    stop_lats: np.ndarray  # float64, per stop id
+    stop_lons: np.ndarray  # float64, per stop id
+    trip_services: np.ndarray  # int32 service id, per trip id
+
+    stop_time_trips: np.ndarray  # int32 trip id, per stop time
+    stop_time_sequences: np.ndarray  # int32, per stop time
+    stop_time_stops: np.ndarray  # int32 stop id, per stop time
+    stop_time_arrivals: np.ndarray  # int32 seconds since midnight (or NO_TIME), per stop time
+    stop_time_departures: np.ndarray  # int32 seconds since midnight (or NO_TIME), per stop time
+
+    services: List[Service] = field(default_factory=list)
+    service_changes: List[ServiceChange] = field(default_factory=list)
+    pathways: List[Pathway] = field(default_factory=list)
+
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    # Derived indexes, computed on first use by `gtfs.util` (or read from a `GTFSCache`).
+    trip_stop_time_indices: Optional[np.ndarray] = None  # int32 stop time indices, by trip and stop sequence
+    trip_stop_time_offsets: Optional[np.ndarray] = None  # int64, per trip id and one past the last
+    calendar: Optional[ServiceCalendar] = None
+
+    def __repr__(self) -> str:
+        return (f'GTFSArrays(stops: {len(self.stop_lats)}, trips: {len(self.trip_services)}, '
+                f'stop_times: {len(self.stop_time_trips)})')
+
+    @classmethod
+    def read(cls, paths: List[Path], processes: Optional[int] = None) -> Self:
+        """
+        Read GTFS feeds into arrays. Each feed is parsed in its own process, after which
+        the feeds are merged in order, with the same id semantics as `GTFS.read`.
+        :param paths: paths of the GTFS zip files
+        :param processes: maximum number of processes, by default one per CPU
+        :return: the merged feeds
+        """
+        if len(paths) > 1 and processes != 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                feeds = list(executor.map(_parse_feed, paths))
+        else:
+            feeds = [_parse_feed(path) for path in paths]
+
+        context: Dict[str, Any] = {}
+        stop_id_map = context.setdefault('stop_id_map', {})
+        service_id_map = context.setdefault('service_id_map', {})
+        trip_id_map = context.setdefault('trip_id_map', {})
+        pathway_id_map = context.setdefault('pathway_id_map', {})
+
+        stop_lats, stop_lons, trip_services = [], [], np.empty(0, dtype=np.int32)
+        stop_time_columns: List[List[np.ndarray]] = [[] for _ in range(5)]
+        services, service_changes, pathways = [], [], []
+        for feed in feeds:
+            # Stops that already exist in an earlier feed are skipped, but can still be referred to.
+            new_stops = np.array([stop_id not in stop_id_map for stop_id in feed.stop_ids], dtype=bool)
+            stops = _map_ids(stop_id_map, feed.stop_ids)
+            stop_lats.append(feed.stop_lats[new_stops])
+            stop_lons.append(feed.stop_lons[new_stops])
+
+            service_ids = _map_ids(service_id_map, feed.service_ids)
+            for service in feed.services:
+                service.service_id = int(service_ids[service.service_id])
+            for service_change in feed.service_changes:
+                service_change.service_id = int(service_ids[service_change.service_id])
+            services += feed.services
+            service_changes += feed.service_changes
+
+            trips = _map_ids(trip_id_map, feed.trip_ids)
+            trip_services = np.resize(trip_services, len(trip_id_map))
+            trip_services[trips] = service_ids[feed.trip_services]
+
+            for columns, column in zip(stop_time_columns, [
+                trips[feed.stop_time_trips], feed.stop_time_sequences, stops[feed.stop_time_stops],
+                feed.stop_time_arrivals, feed.stop_time_departures,
+            ]):
+                columns.append(column)
+
+            for pathway in feed.pathways:
+                pathway_id = feed.pathway_ids[pathway.pathway_id]
+                if pathway_id in pathway_id_map:
+                    continue
+                pathway.pathway_id = get_id(pathway_id_map, pathway_id)
+                pathway.from_stop_id = int(stops[pathway.from_stop_id])
+                pathway.to_stop_id = int(stops[pathway.to_stop_id])
+                pathways.append(pathway)
+
+        def concatenate(columns: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(columns).astype(dtype, copy=False) if columns else np.empty(0, dtype=dtype)
+
+        return GTFSArrays(
+            concatenate(stop_lats, np.float64), concatenate(stop_lons, np.float64), trip_services,
+            *[concatenate(columns, np.int32) for columns in stop_time_columns],
+            services=services, service_changes=service_changes, pathways=pathways, context=context,
+        )
@@ -0,0 +1,161 @@
+import os
+import pathlib
+import pickle
+import struct
+
+from datetime import date
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from benchmark.cache import file_hash, page_align, source_matches
+
+from .arrays import GTFSArrays
+from .calendar import ServiceCalendar
+from .util import index_service_calendar, index_trip_stop_times
+
+
+CACHE_MAGIC = b'JBGTFSCACHE'
+CACHE_VERSION = 2
+
+# Header: magic, version, number of source files, ordinal of the first date of the service calendar, number
+# of dates and services, followed by (count, offset) of the columns and the offset and size of the records.
+HEADER = struct.Struct('<11sIIqQQ' + 'QQ' * 11 + 'QQ')
+# Identification of each source file: size, modification time and content hash.
+SOURCE = struct.Struct('<QQ32s')
+SOURCE_MTIME_OFFSET = struct.calcsize('<Q')
+
+# Array fields of `GTFSArrays` in the cache, with their types.
+COLUMNS: List[Tuple[str, np.dtype]] = [
+    ('stop_lats', np.dtype(np.float64)),
+    ('stop_lons', np.dtype(np.float64)),
+    ('trip_services', np.dtype(np.int32)),
+    ('stop_time_trips', np.dtype(np.int32)),
+    ('stop_time_sequences', np.dtype(np.int32)),
+    ('stop_time_stops', np.dtype(np.int32)),
+    ('stop_time_arrivals', np.dtype(np.int32)),
+    ('stop_time_departures', np.dtype(np.int32)),
+    ('trip_stop_time_indices', np.dtype(np.int32)),
+    ('trip_stop_time_offsets', np.dtype(np.int64)),
+    ('calendar', np.dtype(np.uint8)),  # Bitmasks of the service calendar.
+]
+
+
+class GTFSCache:
+    """
+    Uncompressed cache of parsed GTFS feeds and their derived indexes, which can be memory-mapped.
+
+    The file starts with a header that identifies the source zip files by their size,
+    modification time and content hash. The columns of `GTFSArrays` follow as page-aligned
+    arrays, and the (small) calendar and pathway records and id maps are pickled at the end.
+    """
+
+    @staticmethod
+    def path(gtfs_paths: List[Union[str, pathlib.Path]]) -> pathlib.Path:
+        """
+        Get the path of the cache for a list of GTFS zip files, next to the first file.
+        """
+        return pathlib.Path(f'{gtfs_paths[0]}.cache')
+
+    @classmethod
+    def open(cls, gtfs_paths: List[Union[str, pathlib.Path]]) -> Optional[GTFSArrays]:
+        """
+        Read the cache of the GTFS zip files if it exists and matches the files (in order).
+        :param gtfs_paths: paths of the GTFS zip files
+        :return: the memory-mapped feeds, or None if there is no (up-to-date) cache
+        """
+        filepath = cls.path(gtfs_paths)
+        try:
+            with open(filepath, 'rb') as file:
+                header = HEADER.unpack(file.read(HEADER.size))
+                magic, version, source_count, first_date, date_count, service_count = header[:6]
+                if magic != CACHE_MAGIC or version != CACHE_VERSION or source_count != len(gtfs_paths):
+                    return None
+                for i, gtfs_path in enumerate(gtfs_paths):
+                    mtime_offset = HEADER.size + i * SOURCE.size + SOURCE_MTIME_OFFSET
+                    if not source_matches(gtfs_path, *SOURCE.unpack(file.read(SOURCE.size)), filepath, mtime_offset):
+                        return None
+                records_offset, records_size = header[-2:]
+                file.seek(records_offset)
+                services, service_changes, pathways, context = pickle.loads(file.read(records_size))
+
+            columns = {}
+            for i, (name, dtype) in enumerate(COLUMNS):
+                count, offset = header[6 + 2 * i:8 + 2 * i]
+                if count == 0:
+                    columns[name] = np.empty(0, dtype=dtype)
+                else:
+                    columns[name] = np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        except (ValueError, EOFError, struct.error, pickle.UnpicklingError, OSError):
+            # E.g. a missing, truncated or corrupt cache.
+            return None
+
+        bitmasks = columns.pop('calendar').reshape(service_count, (date_count + 7) // 8)
+
+        return GTFSArrays(
+            **columns,
+            services=services, service_changes=service_changes, pathways=pathways, context=context,
+            calendar=ServiceCalendar(date.fromordinal(first_date), date_count, bitmasks),
+        )
+
+    @classmethod
+    def write(cls, gtfs_paths: List[Union[str, pathlib.Path]], gtfs: GTFSArrays) -> pathlib.Path:
+        """
+        Write the cache of the GTFS zip files from the feeds that were read from them, including the derived indexes.
+        The cache is written to a temporary file first, so concurrent readers never see a partial cache.
+        Raises an OSError if the cache cannot be written, e.g. in a read-only directory.
+        :return: path of the written cache
+        """
+        filepath = cls.path(gtfs_paths)
+        sources = b''.join(SOURCE.pack(os.stat(gtfs_path).st_size, os.stat(gtfs_path).st_mtime_ns, file_hash(gtfs_path))
+                           for gtfs_path in gtfs_paths)
+
+        index_trip_stop_times(gtfs)
+        calendar = index_service_calendar(gtfs)
+        columns = [np.ascontiguousarray(calendar.bitmasks if name == 'calendar' else getattr(gtfs, name), dtype=dtype)
+                   for name, dtype in COLUMNS]
+        records = pickle.dumps((gtfs.services, gtfs.service_changes, gtfs.pathways, gtfs.context))
+
+        offsets, offset = [], page_align(HEADER.size + len(sources))
+        for column in columns:
+            offsets.append(offset)
+            offset = page_align(offset + column.nbytes)
+
+        header = HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(gtfs_paths), calendar.start.toordinal(),
+                             calendar.days, len(calendar.bitmasks),
+                             *[v for column, column_offset in zip(columns, offsets) for v in (column.size, column_offset)],
+                             offset, len(records))
+
+        tmp_filepath = filepath.with_name(f'{filepath.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_filepath, 'wb') as file:
+                file.write(header)
+                file.write(sources)
+                for column, column_offset in zip(columns, offsets):
+                    file.seek(column_offset)
+                    column.tofile(file)
+                file.seek(offset)
+                file.write(records)
+            os.replace(tmp_filepath, filepath)
+        except OSError:
+            tmp_filepath.unlink(missing_ok=True)
+            raise
+        return filepath
+
+    @classmethod
+    def read(cls, gtfs_paths: List[Union[str, pathlib.Path]], processes: Optional[int] = None) -> GTFSArrays:
+        """
+        Read GTFS zip files from their cache, or parse them and create the cache if possible.
+        :param gtfs_paths: paths of the GTFS zip files
+        :param processes: maximum number of processes to parse the files with
+        :return: the feeds
+        """
+        gtfs = cls.open(gtfs_paths)
+        if gtfs is None:
+            gtfs = GTFSArrays.read(gtfs_paths, processes)
+            try:
+                cls.write(gtfs_paths, gtfs)
+            except OSError:
+                # E.g. a read-only dataset directory, the feeds are used uncached.
+                pass
+        return gtfs
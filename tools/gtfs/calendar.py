@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, TypeVar
+
+import numpy as np
+
+from .model import SCExceptionType, Service, ServiceChange
+
+
+Self = TypeVar("Self", bound="ServiceCalendar")
+
+
+@dataclass
+class ServiceCalendar:
+    """
+    The active dates of each service, as a bitmask per service with a bit per date from `start`.
+    Bit `d` of service `s` is bit `7 - d % 8` of `bitmasks[s, d // 8]` (see `np.packbits`).
+    """
+    start: date
+    days: int
+    bitmasks: np.ndarray  # uint8, per service id and 8 dates
+
+    @classmethod
+    def build(
+            cls,
+            services: List[Service],
+            service_changes: List[ServiceChange],
+            service_count: Optional[int] = None,
+    ) -> Self:
+        """
+        Build the calendar from the `calendar.txt` and `calendar_dates.txt` records, with changes applied in order.
+        :param services: the regular services
+        :param service_changes: the services that are added or removed on specific dates
+        :param service_count: number of service ids, by default one more than the largest id
+        :return: the calendar, from the first until the last service date
+        """
+        dates = [d for service in services for d in (service.start_date, service.end_date)]
+        dates += [service_change.date for service_change in service_changes]
+        if not dates:
+            raise Exception("GTFS feed has no service dates!")
+        start = min(dates)
+        days = (max(dates) - start).days + 1
+        if service_count is None:
+            service_count = max([service.service_id for service in services]
+                                + [service_change.service_id for service_change in service_changes]) + 1
+
+        active = np.zeros((service_count, days), dtype=bool)
+        if services:
+            service_ids = np.array([service.service_id for service in services])
+            weekdays = np.array([[service.monday, service.tuesday, service.wednesday, service.thursday,
+                                  service.friday, service.saturday, service.sunday] for service in services], dtype=bool)
+            first = np.array([(service.start_date - start).days for service in services])
+            last = np.array([(service.end_date - start).days for service in services])
+            day_range = np.arange(days)
+            active[service_ids] = weekdays[:, (start.weekday() + day_range) % 7] \
+                & (day_range >= first[:, None]) & (day_range <= last[:, None])
+        if service_changes:
+            # For repeated changes of the same service and date, the last assignment wins.
+            active[[service_change.service_id for service_change in service_changes],
+                   [(service_change.date - start).days for service_change in service_changes]] = \
+                [service_change.exception_type == SCExceptionType.ADDED for service_change in service_changes]
+
+        return ServiceCalendar(start, days, np.packbits(active, axis=1))
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=self.days - 1)
+
+    def day(self, d: date) -> int:
+        """
+        Get the index of a date in the calendar, which is out of range for dates before or after it.
+        """
+        return (d - self.start).days
+
+    def active(self, d: date) -> np.ndarray:
+        """
+        Get which services are active on a date.
+        :return: boolean array per service id
+        """
+        day = self.day(d)
+        if day < 0 or day >= self.days:
+            return np.zeros(len(self.bitmasks), dtype=bool)
+        return (self.bitmasks[:, day >> 3] >> (7 - (day & 7))) & 1 == 1
+
+    def services(self, d: date) -> np.ndarray:
+        """
+        Get the ids of the services that are active on a date.
+        """
+        return np.flatnonzero(self.active(d))
+
+    def trips(self, d: date, trip_services: np.ndarray) -> np.ndarray:
+        """
+        Get the ids of the trips that run on a date.
+        :param d: the date
+        :param trip_services: service id per trip id
+        """
+        return np.flatnonzero(self.active(d)[trip_services])
+
+    def matrix(self) -> np.ndarray:
+        """
+        Unpack the bitmasks to a boolean matrix with a row per service id and a column per date.
+        """
+        return np.unpackbits(self.bitmasks, axis=1, count=self.days).astype(bool)
+
+    def volume(self, service_weights: np.ndarray) -> np.ndarray:
+        """
+        Sum a weight per service (e.g. its number of stop times) for each date.
+        :param service_weights: weight per service id
+        :return: total weight of the active services per date
+        """
+        return np.asarray(service_weights, dtype=np.float64) @ self.matrix()
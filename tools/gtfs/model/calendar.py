@@ -29,7 +29,7 @@ class Service(RecordBase):
 
         self.monday = values['monday'] == '1'
         self.tuesday = values['tuesday'] == '1'
-        self.wednesday = values['tuesday'] == '1'
+        self.wednesday = values['wednesday'] == '1'
         self.thursday = values['thursday'] == '1'
         self.friday = values['friday'] == '1'
         self.saturday = values['saturday'] == '1'
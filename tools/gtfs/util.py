@@ -1,12 +1,15 @@
 import datetime
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 
+import numpy as np
+
+from .arrays import GTFSArrays
+from .calendar import ServiceCalendar
 from .gtfs import GTFS
-from .model.calendar_dates import SCExceptionType
 
 
-def find_date_range(gtfs: GTFS) -> Tuple[datetime.date, datetime.date]:
+def find_date_range(gtfs: Union[GTFS, GTFSArrays]) -> Tuple[datetime.date, datetime.date]:
     """
     Finds the first and last service date of the GTFS feed.
     """
@@ -19,85 +22,73 @@ def find_date_range(gtfs: GTFS) -> Tuple[datetime.date, datetime.date]:
     return min(dates), max(dates)
 
 
-def generate_date_service_dict(gtfs: GTFS) -> Dict[datetime.date, List[int]]:
+def index_service_calendar(gtfs: Union[GTFS, GTFSArrays]) -> ServiceCalendar:
+    """
+    Get the service calendar of the GTFS feed, which is built once and kept with columnar feeds.
+    """
+    calendar = getattr(gtfs, 'calendar', None)
+    if calendar is None:
+        service_count = len(gtfs.context['service_id_map']) if isinstance(gtfs, GTFSArrays) else None
+        calendar = ServiceCalendar.build(gtfs.services, gtfs.service_changes, service_count)
+        if isinstance(gtfs, GTFSArrays):
+            gtfs.calendar = calendar
+    return calendar
+
+
+def generate_date_service_dict(gtfs: Union[GTFS, GTFSArrays]) -> Dict[datetime.date, List[int]]:
     """
     Generate a dictionary with dates as keys and valid service id's as values.
     """
+    calendar = index_service_calendar(gtfs)
     date_service_dict = defaultdict(list)
+    for day, services in enumerate(calendar.matrix().T):
+        if services.any():
+            date_service_dict[calendar.start + datetime.timedelta(days=day)] = np.flatnonzero(services).tolist()
+    return date_service_dict
 
-    # Find the active dates for each service
-    for gtfs_service in gtfs.services:
-        date = gtfs_service.start_date
-        while date <= gtfs_service.end_date:
-            weekday = date.weekday()
-            if (weekday == 0 and gtfs_service.monday) or \
-               (weekday == 1 and gtfs_service.tuesday) or \
-               (weekday == 2 and gtfs_service.wednesday) or \
-               (weekday == 3 and gtfs_service.thursday) or \
-               (weekday == 4 and gtfs_service.friday) or \
-               (weekday == 5 and gtfs_service.saturday) or \
-               (weekday == 6 and gtfs_service.sunday):
-                date_service_dict[date].append(gtfs_service.service_id)
-            date += datetime.timedelta(days=1)
-
-    # add or remove special service days
-    for gtfs_service_change in gtfs.service_changes:
-        if gtfs_service_change.exception_type == SCExceptionType.ADDED:
-            if gtfs_service_change.service_id in date_service_dict[gtfs_service_change.date]:
-                continue
-            date_service_dict[gtfs_service_change.date].append(gtfs_service_change.service_id)
-        elif gtfs_service_change.exception_type == SCExceptionType.REMOVED:
-            if gtfs_service_change.service_id not in date_service_dict[gtfs_service_change.date]:
-                continue
-            date_service_dict[gtfs_service_change.date].remove(gtfs_service_change.service_id)
 
-    return date_service_dict
+def index_trip_stop_times(gtfs: GTFSArrays) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index the stop times per trip: the stop times of trip `t` are `indices[offsets[t]:offsets[t + 1]]`,
+    ordered by stop sequence.
+    :return: the stop time indices and the offsets per trip id
+    """
+    if gtfs.trip_stop_time_indices is None:
+        counts = np.bincount(gtfs.stop_time_trips, minlength=len(gtfs.trip_services))
+        gtfs.trip_stop_time_indices = np.lexsort((gtfs.stop_time_sequences, gtfs.stop_time_trips)).astype(np.int32)
+        gtfs.trip_stop_time_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return gtfs.trip_stop_time_indices, gtfs.trip_stop_time_offsets
 
 
-def generate_date_trip_dict(gtfs: GTFS) -> Dict[datetime.date, List[int]]:
+def generate_date_trip_dict(gtfs: GTFSArrays) -> Dict[datetime.date, List[int]]:
     """
     Generate a dictionary with dates as keys and valid trip id's as values.
     """
-    service_trip_dict = defaultdict(list)
-    for gtfs_trip in gtfs.trips:
-        service_trip_dict[gtfs_trip.service_id].append(gtfs_trip.trip_id)
-
+    calendar = index_service_calendar(gtfs)
     date_trip_dict = defaultdict(list)
-    for date, services in generate_date_service_dict(gtfs).items():
-        for service in services:
-            date_trip_dict[date].extend(service_trip_dict[service])
+    for day in range(calendar.days):
+        date = calendar.start + datetime.timedelta(days=day)
+        trips = calendar.trips(date, gtfs.trip_services)
+        if len(trips) > 0:
+            date_trip_dict[date] = trips.tolist()
     return date_trip_dict
 
 
-def generate_trip_stop_time_dict(gtfs: GTFS) -> Dict[int, List[int]]:
+def generate_trip_stop_time_dict(gtfs: GTFSArrays) -> Dict[int, np.ndarray]:
     """
-    Generate a dictionary with trip id's as keys and lists of stop time indices as values.
+    Generate a dictionary with trip id's as keys and arrays of stop time indices, ordered by stop sequence, as values.
     """
-    trip_stop_time = defaultdict(list)
-    for index, gtfs_stop_time in enumerate(gtfs.stop_times):
-        trip_stop_time[gtfs_stop_time.trip_id].append(index)
+    indices, offsets = index_trip_stop_times(gtfs)
+    return {trip: indices[offsets[trip]:offsets[trip + 1]] for trip in np.flatnonzero(np.diff(offsets)).tolist()}
 
-    for stop_times in trip_stop_time.values():
-        stop_times.sort(key=lambda i: gtfs.stop_times[i].stop_sequence)
-    return trip_stop_time
 
-
-def find_busiest_date(gtfs: GTFS) -> datetime.date:
+def find_busiest_date(gtfs: GTFSArrays) -> datetime.date:
     """
     Finds the busiest schedule date in the GTFS feed based on the number of stop times.
     """
-    trip_stop_times_count: Dict[int, int] = defaultdict(int)
-    for gtfs_stop_time in gtfs.stop_times:
-        trip_stop_times_count[gtfs_stop_time.trip_id] += 1
-
-    service_stop_times_count: Dict[int, int] = defaultdict(int)
-    for gtfs_trip in gtfs.trips:
-        service_stop_times_count[gtfs_trip.service_id] += trip_stop_times_count[gtfs_trip.trip_id]
-
-    date_service_dict = generate_date_service_dict(gtfs)
-    date_stop_times_count: Dict[datetime.date, int] = defaultdict(int)
-    for date, services in date_service_dict.items():
-        for service in services:
-            date_stop_times_count[date] += service_stop_times_count[service]
+    trip_stop_times_count = np.bincount(gtfs.stop_time_trips, minlength=len(gtfs.trip_services))
+    service_stop_times_count = np.bincount(
+        gtfs.trip_services, weights=trip_stop_times_count, minlength=len(gtfs.context['service_id_map']))
 
-    return max(date_stop_times_count, key=date_stop_times_count.get)
+    calendar = index_service_calendar(gtfs)
+    return calendar.start + datetime.timedelta(days=int(np.argmax(calendar.volume(service_stop_times_count))))
@@ -17,7 +17,7 @@ def reconstruct_journey(network: Network, journey: Journey) -> List[Union[Conn,
 
 def check_journey(reconstructed_journey, from_node_id, to_node_id, departure_time) -> Tuple[bool, bool, int]:
     logic = True
-    visited_nodes = [from_node_id]
+    visited_nodes = {from_node_id}
     current_node = from_node_id
     current_time = departure_time
     for part in reconstructed_journey:
@@ -44,6 +44,7 @@ def check_journey(reconstructed_journey, from_node_id, to_node_id, departure_tim
         if next_node in visited_nodes:
             print("Journey contains loop!", file=sys.stderr)
             logic = False
+        visited_nodes.add(next_node)
         current_node = next_node
 
     if current_node != to_node_id: